@@ -0,0 +1,111 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+import threading
+import time
+import unittest
+
+from virtManager import batchdelete
+
+
+class _FakeVM(object):
+    def __init__(self, name, events, active=True, persistent=True,
+                 fail_destroy=False):
+        self._name = name
+        self._events = events
+        self._active = active
+        self._persistent = persistent
+        self._fail_destroy = fail_destroy
+
+    def get_name(self):
+        return self._name
+    def is_active(self):
+        return self._active
+    def is_persistent(self):
+        return self._persistent
+
+    def destroy(self):
+        time.sleep(.01)
+        if self._fail_destroy:
+            raise RuntimeError("destroy failed")
+        self._events.append(("destroy", self._name))
+        self._active = False
+
+    def delete(self):
+        self._events.append(("undefine", self._name))
+
+
+class TestBatchDelete(unittest.TestCase):
+    """
+    Tests for deleting several VMs and their storage at once
+    """
+    def testOtherUsers(self):
+        inuse = {"/a": ["vm1", "vm2"], "/b": ["vm1", "other"]}
+        self.assertEqual(
+            batchdelete.get_other_users(inuse, "/a", ["vm1", "vm2"]), [])
+        self.assertEqual(
+            batchdelete.get_other_users(inuse, "/b", ["vm1", "vm2"]),
+            ["other"])
+        self.assertEqual(
+            batchdelete.get_other_users(inuse, "/c", ["vm1"]), [])
+
+    def testDeleteBatch(self):
+        events = []
+        lock = threading.Lock()
+        running = [0]
+        maxrunning = [0]
+
+        def _delete_path(path):
+            with lock:
+                running[0] += 1
+                maxrunning[0] = max(maxrunning[0], running[0])
+            time.sleep(.02)
+            with lock:
+                running[0] -= 1
+            if path == "/bad":
+                raise OSError("permission denied")
+            events.append(("path", path))
+
+        vms = [_FakeVM("vm%d" % i, events) for i in range(6)]
+        vms.append(_FakeVM("transient", events, persistent=False))
+        vms.append(_FakeVM("off", events, active=False))
+        paths = [("/disk%d" % i, [vm]) for i, vm in enumerate(vms)]
+        paths.append(("/shared", vms[:2]))
+        paths.append(("/bad", [vms[0]]))
+
+        batch = batchdelete.DeleteBatch(vms, paths, _delete_path, workers=3)
+        errors = batch.run()
+
+        self.assertEqual([e.target for e in errors], ["/bad"])
+        self.assertTrue("permission denied" in errors[0].error)
+        self.assertTrue(maxrunning[0] > 1)
+        self.assertTrue(maxrunning[0] <= 3)
+
+        kinds = [e[0] for e in events]
+        # Everything is stopped before any storage goes, and storage
+        # goes before any VM is undefined
+        self.assertEqual(kinds, sorted(kinds, key=["destroy", "path",
+                                                   "undefine"].index))
+        self.assertEqual(kinds.count("destroy"), 7)
+        self.assertEqual(kinds.count("path"), 9)
+        self.assertEqual(sorted([e[1] for e in events if e[0] == "undefine"]),
+                         sorted(["vm%d" % i for i in range(6)] + ["off"]))
+
+    def testDestroyFailure(self):
+        events = []
+        stuck = _FakeVM("stuck", events, fail_destroy=True)
+        ok = _FakeVM("ok", events)
+        paths = [("/stuck.img", [stuck]), ("/shared.img", [stuck, ok]),
+                 ("/ok.img", [ok])]
+
+        batch = batchdelete.DeleteBatch([stuck, ok], paths, lambda p:
+                                        events.append(("path", p)))
+        errors = batch.run()
+
+        # The stuck VM and all its storage are left alone
+        self.assertEqual(sorted([e.target for e in errors]),
+                         ["/shared.img", "/stuck.img", "stuck"])
+        self.assertEqual(events, [("destroy", "ok"), ("path", "/ok.img"),
+                                  ("undefine", "ok")])
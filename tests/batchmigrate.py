@@ -0,0 +1,206 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+import threading
+import time
+import unittest
+
+from virtManager import batchmigrate
+from virtManager.batchmigrate import MigrationBatch, MigrationJob
+
+
+class _SimulatedBackend(object):
+    """
+    Fake migrations that copy job.memory bytes in a few steps, and
+    record what the batch asked for
+    """
+    def __init__(self, steps=5, step_time=.02):
+        self._steps = steps
+        self._step_time = step_time
+        self._lock = threading.Lock()
+        self._copied = {}
+        self._aborted = set()
+        self._done = set()
+
+        self.started = []
+        self.running = 0
+        self.max_running = 0
+        self.bandwidths = {}
+        self.start_bandwidths = {}
+        self.max_total_bandwidth = 0
+
+    def _check_bandwidth(self):
+        total = sum([bw for name, bw in self.bandwidths.items()
+                     if name in self._copied and name not in self._done])
+        self.max_total_bandwidth = max(self.max_total_bandwidth, total)
+
+    def migrate(self, job, bandwidth):
+        with self._lock:
+            self.started.append(job.name)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            self._copied[job.name] = 0
+            self.bandwidths[job.name] = bandwidth
+            self.start_bandwidths[job.name] = bandwidth
+            self._check_bandwidth()
+
+        try:
+            for ignore in range(self._steps):
+                time.sleep(self._step_time)
+                with self._lock:
+                    if job.name in self._aborted:
+                        raise RuntimeError("migration aborted")
+                    self._copied[job.name] += job.memory // self._steps
+            if job.name.startswith("bad"):
+                raise RuntimeError("simulated failure")
+        finally:
+            with self._lock:
+                self.running -= 1
+                self._done.add(job.name)
+
+    def set_bandwidth(self, job, bandwidth):
+        with self._lock:
+            self.bandwidths[job.name] = bandwidth
+            self._check_bandwidth()
+
+    def get_progress(self, job):
+        with self._lock:
+            copied = self._copied.get(job.name)
+        if copied is None:
+            return None
+        return job.memory, job.memory - copied
+
+    def abort(self, job):
+        with self._lock:
+            self._aborted.add(job.name)
+
+
+class _FakeMeter(object):
+    def __init__(self):
+        self.size = None
+        self.text = None
+        self.updates = []
+        self.ended = None
+
+    def start(self, size, text):
+        self.size = size
+        self.text = text
+
+    def update(self, amount):
+        self.updates.append(amount)
+
+    def end(self, amount):
+        self.ended = amount
+
+
+def _make_jobs(specs):
+    return [MigrationJob(None, name, memory, dirty_rate)
+            for name, memory, dirty_rate in specs]
+
+
+class TestBatchMigrate(unittest.TestCase):
+    """
+    Tests for the batch migration scheduling against a simulated backend
+    """
+    def testOrderAndConcurrency(self):
+        jobs = _make_jobs([
+            ("vm-large", 4000, 5),
+            ("vm-small", 1000, 50),
+            ("vm-medium", 2000, None),
+            ("vm-tiny", 500, 20),
+            ("vm-huge", 8000, 1),
+        ])
+        backend = _SimulatedBackend()
+        meter = _FakeMeter()
+        batch = MigrationBatch(backend, jobs, parallel=2, bandwidth=100,
+                               poll_interval=.01)
+        ret = batch.run(meter=meter, text="Migrating")
+
+        # Smallest memory first, never more than 2 at once, and the
+        # running jobs never exceed the bandwidth budget
+        self.assertEqual(backend.started[:2], ["vm-tiny", "vm-small"])
+        self.assertEqual([j.name for j in ret],
+            ["vm-tiny", "vm-small", "vm-medium", "vm-large", "vm-huge"])
+        self.assertEqual(backend.max_running, 2)
+        self.assertTrue(backend.max_total_bandwidth <= 100)
+        self.assertEqual(backend.start_bandwidths["vm-tiny"], 100)
+        self.assertEqual(backend.start_bandwidths["vm-small"], 50)
+
+        self.assertTrue(all([j.state == j.STATE_DONE for j in ret]))
+        self.assertEqual(meter.size, 15500)
+        self.assertEqual(meter.ended, 15500)
+        self.assertTrue(meter.updates)
+        self.assertEqual(meter.updates, sorted(meter.updates))
+        self.assertTrue("5/5" in meter.text)
+
+    def testDirtyRateOrder(self):
+        jobs = _make_jobs([
+            ("vm-a", 4000, 5),
+            ("vm-b", 1000, 50),
+            ("vm-c", 2000, None),
+            ("vm-d", 500, 20),
+        ])
+        batch = MigrationBatch(_SimulatedBackend(), jobs,
+                               order=batchmigrate.ORDER_DIRTY_RATE)
+        self.assertEqual([j.name for j in batch.jobs],
+                         ["vm-a", "vm-d", "vm-b", "vm-c"])
+
+    def testFailure(self):
+        jobs = _make_jobs([
+            ("vm-1", 100, None),
+            ("bad-vm", 200, None),
+            ("vm-3", 300, None),
+        ])
+        backend = _SimulatedBackend()
+        batch = MigrationBatch(backend, jobs, parallel=1, poll_interval=.01)
+        ret = batch.run()
+
+        # A failed job doesn't stop the rest of the batch
+        self.assertEqual([j.state for j in ret],
+                         ["done", "failed", "done"])
+        self.assertTrue("simulated failure" in ret[1].error)
+        self.assertEqual(backend.start_bandwidths["vm-1"], 0)
+
+    def testSlowSetBandwidth(self):
+        class _SlowBackend(_SimulatedBackend):
+            def set_bandwidth(self, job, bandwidth):
+                time.sleep(.3)
+                _SimulatedBackend.set_bandwidth(self, job, bandwidth)
+
+        jobs = _make_jobs([("vm-%d" % i, 100 * (i + 1), None)
+                           for i in range(4)])
+        backend = _SlowBackend(steps=50)
+        batch = MigrationBatch(backend, jobs, parallel=2, bandwidth=100,
+                               poll_interval=.01)
+
+        # Starting vm-1 shrinks vm-0's share, cancel shouldn't have to
+        # wait for that backend call
+        canceltime = []
+        def _cancel():
+            start = time.time()
+            batch.cancel()
+            canceltime.append(time.time() - start)
+        t = threading.Timer(.1, _cancel)
+        t.start()
+        ret = batch.run()
+        t.join()
+
+        self.assertTrue(canceltime[0] < .2)
+        self.assertEqual(backend.started, ["vm-0"])
+        self.assertEqual([j.state for j in ret], ["cancelled"] * 4)
+
+    def testCancel(self):
+        jobs = _make_jobs([("vm-%d" % i, 100 * (i + 1), None)
+                           for i in range(4)])
+        backend = _SimulatedBackend(steps=50)
+        batch = MigrationBatch(backend, jobs, parallel=2, poll_interval=.01)
+
+        t = threading.Timer(.1, batch.cancel)
+        t.start()
+        ret = batch.run()
+        t.join()
+
+        self.assertEqual(backend.started, ["vm-0", "vm-1"])
+        self.assertEqual([j.state for j in ret], ["cancelled"] * 4)
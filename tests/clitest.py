@@ -80,6 +80,7 @@ test_files = {
     'ISO-NO-OS': iso_links[2],
     'TREEDIR': "%s/fakefedoratree" % XMLDIR,
     'COLLIDE': "/dev/default-pool/collidevol1.img",
+    'BATCH-MANIFEST': "%s/virt-install-batch-manifest" % XMLDIR,
 }
 
 
@@ -720,6 +721,12 @@ c.add_valid("--nodisks --pxe", grep="VM performance may suffer")  # os variant w
 c.add_invalid("--hvm --nodisks --pxe foobar")  # Positional arguments error
 c.add_invalid("--nodisks --pxe --name test")  # Colliding name
 c.add_compare("--cdrom %(EXISTIMG1)s --disk size=1 --disk %(EXISTIMG2)s,device=cdrom", "cdrom-double")  # ensure --disk device=cdrom is ordered after --cdrom, this is important for virtio-win installs with a driver ISO
+c.add_valid("--nodisks --pxe --count 3", grep="foobar-3")  # --count batch install
+c.add_valid("--nodisks --pxe --count 2 --batch-workers 1 --dry-run")  # --count batch dry run
+c.add_valid("--pxe --disk none --batch %(BATCH-MANIFEST)s", grep="batch-guest3")  # --batch install from manifest
+c.add_invalid("--nodisks --pxe --count 2 --print-xml")  # --print-xml isn't supported for batches
+c.add_invalid("--pxe --disk %(EXISTIMG1)s --count 2")  # batch guests colliding on the same disk
+c.add_invalid("--nodisks --pxe --count 2 --batch %(BATCH-MANIFEST)s")  # --count and --batch together
 
 
 #############################
@@ -915,6 +922,14 @@ c.add_compare("test --edit --boot network,cdrom", "edit-bootorder")
 c.add_compare("--confirm test --edit --cpu host-passthrough", "prompt-response")
 c.add_compare("--edit --print-diff --qemu-commandline clearxml=yes", "edit-clearxml-qemu-commandline", input_file=(XMLDIR + "/virtxml-qemu-commandline-clear.xml"))
 c.add_compare("--connect %(URI-KVM)s test-hyperv-uefi --edit --boot uefi", "hyperv-uefi-collision")
+c.add_valid("'test-state-*' --name-regex 'paused|crashed' --edit --print-diff --boot menu=on", grep="Original XML (test-state-crashed)")  # multiple domains via glob, only print the diff
+c.add_valid("test-state-paused test-state-crashed --edit --boot menu=on --workers 1", grep="defined")  # multiple domains, define the change
+c.add_valid("--all --state shutoff --edit --print-diff --boot menu=on", grep="test-state-shutoff")  # --all with a state filter
+c.add_invalid("--all --state bogus --edit --boot menu=on")  # unknown --state
+c.add_invalid("--all --name-regex ^nomatch$ --edit --boot menu=on")  # nothing matched
+c.add_invalid("'test-nomatch-*' --edit --boot menu=on")  # glob didn't match
+c.add_invalid("--all --confirm --edit --boot menu=on")  # --confirm isn't supported for multiple domains
+c.add_invalid("test-state-shutoff test-state-paused --edit 5 --tpm /dev/tpm", grep="2 of 2 domains failed")  # per domain failures are reported
 
 
 c = vixml.add_category("simple edit diff", "test-for-virtxml --edit --print-diff --define")
@@ -1055,6 +1070,7 @@ c.add_valid("-o test --auto-clone")  # Auto flag, no storage
 c.add_valid("-o test --file %(NEWCLONEIMG1)s --file %(NEWCLONEIMG2)s")  # Nodisk, but with spurious files passed
 c.add_valid("-o test --file %(NEWCLONEIMG1)s --file %(NEWCLONEIMG2)s --prompt")  # Working scenario w/ prompt shouldn't ask anything
 c.add_valid("--original-xml " + _CLONE_UNMANAGED + " --file %(NEWCLONEIMG1)s --file %(NEWCLONEIMG2)s")  # XML File with 2 disks
+c.add_valid("--original-xml " + _CLONE_UNMANAGED + " --file %(NEWCLONEIMG1)s --file %(NEWCLONEIMG2)s --parallel-copies 2")  # XML File with 2 disks, copied concurrently
 c.add_valid("--original-xml " + _CLONE_UNMANAGED + " --file virt-install --file %(EXISTIMG1)s --preserve")  # XML w/ disks, overwriting existing files with --preserve
 c.add_valid("--original-xml " + _CLONE_UNMANAGED + " --file %(NEWCLONEIMG1)s --file %(NEWCLONEIMG2)s --file %(NEWCLONEIMG3)s --force-copy=hdc")  # XML w/ disks, force copy a readonly target
 c.add_valid("--original-xml " + _CLONE_UNMANAGED + " --file %(NEWCLONEIMG1)s --file %(NEWCLONEIMG2)s --force-copy=fda")  # XML w/ disks, force copy a target with no media
@@ -1070,6 +1086,7 @@ c.add_invalid("--original-xml " + _CLONE_UNMANAGED + " --file virt-install --fil
 c.add_invalid("--original-xml " + _CLONE_UNMANAGED + " --file %(NEWCLONEIMG1)s --file %(NEWCLONEIMG2)s --force-copy=hdc")  # XML w/ disks, force copy but not enough disks passed
 c.add_invalid("--original-xml " + _CLONE_MANAGED + " --file /tmp/clonevol")  # XML w/ managed storage, specify unmanaged path (should fail)
 c.add_invalid("--original-xml " + _CLONE_NOEXIST + " --file %(EXISTIMG1)s")  # XML w/ non-existent storage, WITHOUT --preserve
+c.add_invalid("-o test --auto-clone --parallel-copies 0")  # Invalid concurrency
 c.add_valid("--original-xml " + _CLONE_MANAGED + " --auto-clone --force-copy fda")  # force copy empty floppy drive
 
 
@@ -167,3 +167,54 @@ class TestClone(unittest.TestCase):
 
     def testCloneChannelSource(self):
         self._clone("channel-source")
+
+    def testCloneLocalSparseCopy(self):
+        # pylint: disable=protected-access
+        from virtinst import diskbackend
+        from virtinst import progress
+
+        size = 64 * 1024 * 1024
+        chunks = [(0, b"start"), (5 * 1024 * 1024 + 123, b"middle"),
+                  (size - 3, b"end")]
+        with open(FILE1, "wb") as f:
+            f.truncate(size)
+            for offset, data in chunks:
+                f.seek(offset)
+                f.write(data)
+
+        for sparse in [True, False]:
+            os.unlink(FILE2)
+            meter = progress.BaseMeter()
+            meter.start(size=size)
+            src_fd = os.open(FILE1, os.O_RDONLY)
+            dst_fd = os.open(FILE2, os.O_WRONLY | os.O_CREAT, 0o640)
+            try:
+                diskbackend._copy_local_file(src_fd, dst_fd, sparse, meter)
+            finally:
+                os.close(src_fd)
+                os.close(dst_fd)
+
+            self.assertEqual(os.path.getsize(FILE2), size)
+            with open(FILE1, "rb") as f1, open(FILE2, "rb") as f2:
+                self.assertTrue(f1.read() == f2.read())
+            if sparse:
+                self.assertTrue(os.stat(FILE2).st_blocks * 512 < size // 2)
+
+    def testCloneStorageCreatorPartialGiB(self):
+        from virtinst import diskbackend
+        from virtinst import progress
+
+        # Not a whole number of GiB, like every NVRAM file
+        size = 3 * 1024 * 1024 + 17
+        with open(FILE1, "wb") as f:
+            f.write(os.urandom(size))
+        conn = utils.URIs.open_testdriver_cached()
+
+        for sparse in [True, False]:
+            os.unlink(FILE2)
+            creator = diskbackend.CloneStorageCreator(conn, FILE2, FILE1,
+                    float(size) / 1024 / 1024 / 1024, sparse)
+            creator.create(progress.BaseMeter())
+
+            with open(FILE1, "rb") as f1, open(FILE2, "rb") as f2:
+                self.assertTrue(f1.read() == f2.read())
@@ -0,0 +1,76 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from virtinst import support
+from virtinst.conncache import ConnectionCache
+
+
+_URI = "qemu+ssh://user@example.com/system"
+_STAMP = {"libvirt": 5000000, "daemon": 5000000, "hypervisor": 3001000}
+
+
+class TestConnCache(unittest.TestCase):
+    """
+    Tests for the on disk connection data cache
+    """
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._path = os.path.join(self._tmpdir, "cache", "conn.json")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def _make_cache(self, stamp=None):
+        return ConnectionCache(_URI, stamp or _STAMP, path=self._path)
+
+    def testRoundtrip(self):
+        domcapskey = ("/usr/bin/qemu-kvm", "x86_64", "pc", "kvm")
+        cache = self._make_cache()
+        self.assertEqual(cache.get_caps_xml(), None)
+        self.assertEqual(cache.get_support(support.SUPPORT_CONN_STREAM), None)
+
+        cache.set_caps_xml("<capabilities/>")
+        cache.set_domcaps_xml(domcapskey, "<domainCapabilities/>")
+        cache.set_support(support.SUPPORT_CONN_STREAM, True)
+        cache.set_support(support.SUPPORT_CONN_LISTALLDOMAINS, False)
+
+        cache = self._make_cache()
+        self.assertEqual(cache.get_caps_xml(), "<capabilities/>")
+        self.assertEqual(cache.get_domcaps_xml(domcapskey),
+                         "<domainCapabilities/>")
+        self.assertEqual(cache.get_domcaps_xml(domcapskey[:3] + ("xen",)),
+                         None)
+        self.assertEqual(cache.get_support(support.SUPPORT_CONN_STREAM), True)
+        self.assertEqual(
+                cache.get_support(support.SUPPORT_CONN_LISTALLDOMAINS), False)
+
+        cache.invalidate_caps()
+        cache = self._make_cache()
+        self.assertEqual(cache.get_caps_xml(), None)
+        self.assertEqual(cache.get_domcaps_xml(domcapskey), None)
+        self.assertEqual(cache.get_support(support.SUPPORT_CONN_STREAM), True)
+
+    def testVersionChange(self):
+        cache = self._make_cache()
+        cache.set_caps_xml("<capabilities/>")
+
+        stamp = _STAMP.copy()
+        stamp["hypervisor"] += 1
+        cache = self._make_cache(stamp)
+        self.assertEqual(cache.get_caps_xml(), None)
+
+    def testCorruptFile(self):
+        os.makedirs(os.path.dirname(self._path))
+        with open(self._path, "w") as f:
+            f.write("{not json")
+        cache = self._make_cache()
+        self.assertEqual(cache.get_caps_xml(), None)
+        cache.set_caps_xml("<capabilities/>")
+        self.assertEqual(self._make_cache().get_caps_xml(), "<capabilities/>")
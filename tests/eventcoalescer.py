@@ -0,0 +1,104 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+import threading
+import unittest
+
+from virtManager import eventcoalescer
+from virtManager.eventcoalescer import (EventCoalescer,
+        ACTION_POLL, ACTION_RECACHE, ACTION_REFRESH)
+
+
+class _ManualTimer(object):
+    """
+    schedule_cb that runs the scheduled function only when asked
+    """
+    def __init__(self):
+        self.scheduled = []
+        self.cancelled = 0
+
+    def __call__(self, delay, func):
+        self.scheduled.append(func)
+        return self
+
+    def fire(self):
+        func = self.scheduled.pop(0)
+        func()
+
+    def cancel(self):
+        self.cancelled += 1
+
+
+class TestEventCoalescer(unittest.TestCase):
+    """
+    Tests for batching bursts of libvirt events
+    """
+    def testCoalesce(self):
+        batches = []
+        timer = _ManualTimer()
+        coalescer = EventCoalescer(batches.append, schedule_cb=timer)
+
+        # 200 VMs starting, each sending a few events
+        for i in range(200):
+            for ignore in range(3):
+                coalescer.add("domain", "vm%d" % i, ACTION_RECACHE)
+        for ignore in range(50):
+            coalescer.add("pool", "nfs", ACTION_REFRESH)
+        coalescer.add("pool", "nfs", ACTION_RECACHE)
+        coalescer.add("nodedev", "usb_1", ACTION_POLL)
+
+        # Only one window is started for the whole burst
+        self.assertEqual(len(timer.scheduled), 1)
+        self.assertEqual(batches, [])
+        timer.fire()
+
+        self.assertEqual(len(batches), 1)
+        batch = batches[0]
+        self.assertEqual(len(batch["domain"]), 200)
+        self.assertEqual(batch["domain"]["vm7"], set([ACTION_RECACHE]))
+        self.assertEqual(batch["pool"]["nfs"],
+                         set([ACTION_REFRESH, ACTION_RECACHE]))
+        self.assertEqual(batch["nodedev"]["usb_1"], set([ACTION_POLL]))
+
+        # Events after the flush start a new window
+        coalescer.add("domain", "vm1", ACTION_RECACHE)
+        self.assertEqual(len(timer.scheduled), 1)
+        timer.fire()
+        self.assertEqual(batches[1], {"domain": {"vm1": set([ACTION_RECACHE])}})
+
+        coalescer.count_work("recache", 201)
+        coalescer.count_work("poll")
+        stats = coalescer.get_stats()
+        self.assertEqual(stats["received"],
+                         {"domain": 601, "pool": 51, "nodedev": 1})
+        self.assertEqual(stats["work"], {"recache": 201, "poll": 1})
+        self.assertEqual(stats["batches"], 2)
+
+    def testCancel(self):
+        batches = []
+        timer = _ManualTimer()
+        coalescer = EventCoalescer(batches.append, schedule_cb=timer)
+
+        coalescer.add("network", "default", ACTION_RECACHE)
+        coalescer.cancel()
+        self.assertEqual(timer.cancelled, 1)
+        timer.fire()
+        self.assertEqual(batches, [])
+        self.assertEqual(coalescer.get_stats()["batches"], 0)
+
+    def testTimer(self):
+        flushed = threading.Event()
+        batches = []
+
+        def _flush(pending):
+            batches.append(pending)
+            flushed.set()
+
+        coalescer = EventCoalescer(_flush, window=.01)
+        self.assertTrue(eventcoalescer.EVENT_WINDOW > 0)
+        coalescer.add("domain", "vm1", ACTION_RECACHE)
+        coalescer.add("domain", "vm1", ACTION_RECACHE)
+        self.assertTrue(flushed.wait(5))
+        self.assertEqual(batches, [{"domain": {"vm1": set([ACTION_RECACHE])}}])
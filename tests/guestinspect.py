@@ -0,0 +1,139 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+import os
+import shutil
+import sys
+import tempfile
+import types
+import unittest
+
+from virtManager import guestinspect
+
+
+class _FakeGuestFS(object):
+    launched = 0
+
+    def __init__(self, close_on_exit=True):
+        ignore = close_on_exit
+        self.mounts = []
+
+    def add_libvirt_dom(self, dom, readonly):
+        ignore = dom
+        ignore = readonly
+
+    def launch(self):
+        _FakeGuestFS.launched += 1
+
+    def inspect_os(self):
+        return ["/dev/sda2"]
+
+    def inspect_get_type(self, root):
+        return "linux"
+    def inspect_get_distro(self, root):
+        return "fedora"
+    def inspect_get_major_version(self, root):
+        return 30
+    def inspect_get_minor_version(self, root):
+        return 0
+    def inspect_get_hostname(self, root):
+        return "fakehost"
+    def inspect_get_product_name(self, root):
+        return "Fedora 30"
+    def inspect_get_product_variant(self, root):
+        return "Workstation"
+
+    def inspect_get_mountpoints(self, root):
+        return [("/boot", "/dev/sda1"), ("/", "/dev/sda2")]
+
+    def mount_ro(self, dev, mountpoint):
+        self.mounts.append((mountpoint, dev))
+
+    def inspect_get_icon(self, root, favicon, highquality):
+        return b"\x89PNGfake"
+
+    def inspect_list_applications(self, root):
+        return [{"app_name": "bash", "app_version": "5.0"}]
+
+    def close(self):
+        pass
+
+
+class TestGuestInspect(unittest.TestCase):
+    """
+    Tests for the toolkit independent inspection service bits
+    """
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._origguestfs = sys.modules.get("guestfs")
+        fakemod = types.ModuleType("guestfs")
+        fakemod.GuestFS = _FakeGuestFS
+        sys.modules["guestfs"] = fakemod
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+        if self._origguestfs:
+            sys.modules["guestfs"] = self._origguestfs
+        else:
+            sys.modules.pop("guestfs")
+
+    def _make_disk(self, name, data):
+        path = os.path.join(self._tmpdir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def testQueue(self):
+        q = guestinspect.InspectionQueue()
+        q.put("a", "vm-a", 3)
+        q.put("b", "vm-b", 3)
+        q.put("c", "vm-c", 3)
+        q.put("d", "control", 0)
+
+        # Queueing a pending key replaces the item, keeping the
+        # more urgent priority
+        q.put("a", "vm-a-refresh", 4)
+        q.prioritize("c", 2)
+        q.prioritize("missing", 0)
+        self.assertEqual(len(q), 4)
+
+        self.assertEqual([q.get() for ignore in range(4)],
+                         ["control", "vm-c", "vm-b", "vm-a-refresh"])
+        self.assertEqual(len(q), 0)
+
+    def testCache(self):
+        disk = self._make_disk("disk.img", b"foo")
+        stamp = guestinspect.get_disk_stamp([disk])
+        self.assertEqual(guestinspect.get_disk_stamp(["/dev/null"]), None)
+        self.assertEqual(guestinspect.get_disk_stamp(
+            [os.path.join(self._tmpdir, "missing")]), None)
+
+        cache = guestinspect.InspectionCache(
+                os.path.join(self._tmpdir, "cache"))
+        uuid = "12345678-1234-1234-1234-123456789012"
+        self.assertEqual(cache.get(uuid, stamp), None)
+
+        data = guestinspect.inspect_domain(None, "test:vm")
+        self.assertEqual(_FakeGuestFS.launched, 1)
+        self.assertEqual(data["distro"], "fedora")
+        self.assertEqual(data["major_version"], 30)
+        self.assertEqual(data["icon"], b"\x89PNGfake")
+        cache.set(uuid, stamp, data)
+
+        # A fresh cache instance picks up the stored results
+        cache = guestinspect.InspectionCache(
+                os.path.join(self._tmpdir, "cache"))
+        self.assertEqual(cache.get(uuid, stamp), data)
+
+        # Changing the disk image invalidates the entry
+        disk = self._make_disk("disk.img", b"foobar")
+        newstamp = guestinspect.get_disk_stamp([disk])
+        self.assertEqual(cache.get(uuid, newstamp), None)
+
+        # Errors are never cached
+        cache.set(uuid, newstamp,
+                  guestinspect.inspection_error("appliance failed"))
+        self.assertEqual(cache.get(uuid, newstamp), None)
+        self.assertEqual(cache.get(uuid, stamp), None)
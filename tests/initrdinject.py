@@ -0,0 +1,88 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+from virtinst import initrdinject
+
+
+_INJECTDIR = os.path.join(os.getcwd(), "tests/inject-data")
+
+
+def _parse_newc(data):
+    """
+    Parse a newc cpio archive, return a list of (name, mode, contents)
+    """
+    ret = []
+    offset = 0
+    while True:
+        header = data[offset:offset + 110]
+        assert header[:6] == b"070701"
+        fields = [int(header[6 + (i * 8):14 + (i * 8)], 16)
+                  for i in range(13)]
+        mode = fields[1]
+        filesize = fields[6]
+        namesize = fields[11]
+
+        offset += 110
+        name = data[offset:offset + namesize - 1].decode("utf-8")
+        offset += namesize
+        offset += (4 - (offset % 4)) % 4
+        if name == "TRAILER!!!":
+            break
+
+        contents = data[offset:offset + filesize]
+        offset += filesize
+        offset += (4 - (offset % 4)) % 4
+        ret.append((name, mode, contents))
+
+    assert offset % 4 == 0
+    assert not data[offset:].strip(b"\0")
+    assert len(data) % 512 == 0
+    return ret
+
+
+class TestInitrdInject(unittest.TestCase):
+    """
+    Tests for the in process initrd cpio writer
+    """
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._initrd = os.path.join(self._tmpdir, "initrd.img")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def testInject(self):
+        origdata = b"fake initrd contents"
+        with open(self._initrd, "wb") as f:
+            f.write(origdata)
+
+        injections = [os.path.join(_INJECTDIR, name) for name in
+                      sorted(os.listdir(_INJECTDIR))]
+        initrdinject.perform_initrd_injections(self._initrd, injections)
+
+        with open(self._initrd, "rb") as f:
+            data = f.read()
+        self.assertTrue(data.startswith(origdata))
+        entries = _parse_newc(gzip.decompress(data[len(origdata):]))
+
+        self.assertEqual([e[0] for e in entries],
+                         [os.path.basename(p) for p in injections])
+        for (name, mode, contents), path in zip(entries, injections):
+            with open(path, "rb") as f:
+                self.assertEqual(contents, f.read(), name)
+            self.assertEqual(mode & 0o170000, 0o100000)
+            self.assertEqual(mode & 0o7777, os.stat(path).st_mode & 0o7777)
+
+    def testNoInjections(self):
+        with open(self._initrd, "wb") as f:
+            f.write(b"foo")
+        initrdinject.perform_initrd_injections(self._initrd, [])
+        self.assertEqual(os.path.getsize(self._initrd), 3)
@@ -0,0 +1,95 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+import json
+import os
+import tempfile
+import threading
+import types
+import unittest
+
+import libvirt
+
+from virtManager import module_trace
+
+
+class _FakeStream(object):
+    def recv(self, nbytes):
+        return b"x" * nbytes
+
+    def send(self, data):
+        return len(data)
+
+    def fail(self):
+        raise RuntimeError("fake failure")
+
+
+class TestModuleTrace(unittest.TestCase):
+    """
+    Tests for the libvirt API profiler
+    """
+    def tearDown(self):
+        module_trace.unwrap_all()
+
+    def _get_apis(self):
+        return module_trace.get_profiler().get_report()["apis"]
+
+    def testProfileLibvirt(self):
+        origopen = libvirt.open
+        module_trace.wrap_module(libvirt, mainloop=False, regex=None,
+                                 trace=False, profile=True)
+        conn = libvirt.open("test:///default")
+        doms = conn.listAllDomains(0)
+        for dom in doms:
+            dom.XMLDesc(0)
+
+        t = threading.Thread(target=conn.getCapabilities)
+        t.start()
+        t.join()
+
+        apis = self._get_apis()
+        listall = apis["virConnect.listAllDomains"]
+        self.assertEqual(listall["calls"], 1)
+        self.assertEqual(listall["main_thread_calls"], 1)
+        self.assertEqual(sum(listall["histogram"].values()), 1)
+        self.assertTrue(list(listall["callers"])[0].startswith(
+            "moduletrace.py:"))
+        self.assertEqual(apis["virDomain.XMLDesc"]["calls"], len(doms))
+        self.assertEqual(apis["virConnect.getCapabilities"]["worker_calls"],
+                         1)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "profile.json")
+            module_trace.get_profiler().dump(path)
+            with open(path) as f:
+                report = json.load(f)
+        self.assertEqual(report["apis"]["virConnect.listAllDomains"],
+                         listall)
+
+        conn.close()
+        module_trace.unwrap_all()
+        self.assertTrue(libvirt.open is origopen)
+        self.assertEqual(module_trace.get_profiler(), None)
+
+    def testStreamBytes(self):
+        fakemod = types.ModuleType("fakelibvirt")
+        fakemod.virStream = _FakeStream
+        origrecv = _FakeStream.__dict__["recv"]
+        module_trace.wrap_module(fakemod, mainloop=False, regex=None,
+                                 trace=False, profile=True)
+
+        stream = fakemod.virStream()
+        stream.recv(10)
+        stream.recv(5)
+        stream.send(b"abc")
+        self.assertRaises(RuntimeError, stream.fail)
+
+        apis = self._get_apis()
+        self.assertEqual(apis["_FakeStream.recv"]["bytes"], 15)
+        self.assertEqual(apis["_FakeStream.send"]["bytes"], 3)
+        self.assertEqual(apis["_FakeStream.fail"]["errors"], 1)
+
+        module_trace.unwrap_all()
+        self.assertTrue(_FakeStream.__dict__["recv"] is origrecv)
@@ -10,6 +10,7 @@ import unittest
 
 from virtinst import Guest
 from virtinst import NodeDevice
+from virtinst import NodeDeviceIndex
 from virtinst import DeviceHostdev
 
 from tests import utils
@@ -283,3 +284,42 @@ class TestNodeDev(unittest.TestCase):
         # pass to a guest.
         self.assertRaises(ValueError,
                           self._testNode2DeviceCompare, nodename, devfile)
+
+    def testNodeDevIndex(self):
+        # Index lookups should agree with scanning every device
+        devs = self.conn.fetch_all_nodedevs()
+        index = NodeDeviceIndex(devs)
+        self.assertEqual(len(index), len(devs))
+
+        for dev in devs:
+            self.assertTrue(index.lookup_name(dev.name) is dev)
+        self.assertEqual(index.lookup_name("idontexist"), None)
+
+        def _names(nodedevs):
+            return sorted([d.name for d in nodedevs])
+
+        for devtype in set([d.device_type for d in devs]):
+            self.assertEqual(_names(index.filter(devtype)),
+                _names([d for d in devs if d.device_type == devtype]))
+        self.assertEqual(_names(index.filter("pci", "virt_functions")),
+                         ["pci_8086_10fb"])
+
+        usbdevs = index.find_by_ids("0x1D6B", "0x0002", "usb_device")
+        self.assertEqual(_names(usbdevs), _names([d for d in devs
+            if d.device_type == "usb_device" and
+            d.vendor_id == "0x1d6b" and d.product_id == "0x0002"]))
+
+        pcidev = index.lookup_name("pci_1180_592")
+        self.assertEqual(index.find_by_pci_address(
+            pcidev.domain, pcidev.bus, pcidev.slot, pcidev.function),
+            [pcidev])
+
+        # Removing and replacing devices keeps every table consistent
+        index.remove("pci_1180_592")
+        self.assertEqual(index.lookup_name("pci_1180_592"), None)
+        self.assertEqual(index.find_by_pci_address(
+            pcidev.domain, pcidev.bus, pcidev.slot, pcidev.function), [])
+        self.assertTrue("pci_1180_592" not in _names(index.filter("pci")))
+        index.add(pcidev)
+        index.add(pcidev)
+        self.assertEqual(len(index), len(devs))
@@ -3,10 +3,13 @@
 # This work is licensed under the GNU GPLv2 or later.
 # See the COPYING file in the top-level directory.
 
+import os
+import tempfile
 import unittest
 
 from virtinst import Guest
 from virtinst import OSDB
+from virtinst import osdict
 from virtinst import urldetect
 
 from tests import utils
@@ -24,6 +27,32 @@ class TestOSDB(unittest.TestCase):
                 "should never be extended, since it is only for back "
                 "compat with pre-libosinfo osdict.py"))
 
+    def test_osdict_index(self):
+        # pylint: disable=protected-access
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        os.unlink(path)
+        try:
+            # First lookup generates the index, the second reads it
+            osdict._OSDB(path).lookup_os("generic")
+            assert os.path.exists(path)
+            osdb = osdict._OSDB(path)
+
+            for name in ["generic", "fedora21", "fedora26", "winxp",
+                         "msdos6.22"]:
+                orig = OSDB.lookup_os(name)
+                indexed = osdb.lookup_os(name)
+                assert orig.get_index_data() == indexed.get_index_data()
+                assert orig.eol == indexed.eol
+                assert indexed is osdb.lookup_os_by_full_id(orig.full_id)
+            assert not osdb.lookup_os("idontexist")
+
+            winxp = osdb.lookup_os("winxp")
+            assert winxp.get_handle().get_id() == winxp.full_id
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+
     def test_recommended_resources(self):
         conn = utils.URIs.open_testdefault_cached()
         guest = Guest(conn)
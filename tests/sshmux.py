@@ -0,0 +1,101 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from virtManager import sshmux
+
+
+# Stand in for 'ssh -M': bind the control socket and wait to be killed
+_FAKE_SSH = """#!%(python)s
+import os, signal, socket, sys, time
+args = sys.argv[1:]
+opts = dict(args[i + 1].split("=", 1) for i, a in enumerate(args)
+            if a == "-o")
+if args[-1] == "badhost":
+    sys.stderr.write("Permission denied (publickey).\\n")
+    sys.exit(255)
+with open(%(logfile)r, "a") as f:
+    f.write(" ".join(args) + "\\n")
+path = opts["ControlPath"]
+sock = socket.socket(socket.AF_UNIX)
+sock.bind(path)
+def _term(*args):
+    os.unlink(path)
+    sys.exit(0)
+signal.signal(signal.SIGTERM, _term)
+while True:
+    time.sleep(1)
+"""
+
+
+class TestSSHMux(unittest.TestCase):
+    """
+    Tests for the shared ssh ControlMaster handling
+    """
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp()
+        self._logfile = os.path.join(self._tmpdir, "ssh.log")
+        self._sshcmd = os.path.join(self._tmpdir, "fake-ssh")
+        with open(self._sshcmd, "w") as f:
+            f.write(_FAKE_SSH % {"python": sys.executable,
+                                 "logfile": self._logfile})
+        os.chmod(self._sshcmd, 0o755)
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def _make_master(self, host):
+        return sshmux.SSHControlMaster(host, 2222, "root",
+                sshcmd=self._sshcmd, idle_timeout=.2, start_timeout=10)
+
+    def _count_starts(self):
+        if not os.path.exists(self._logfile):
+            return 0
+        with open(self._logfile) as f:
+            return len(f.readlines())
+
+    def testSharedMaster(self):
+        master = self._make_master("example.com")
+        self.assertTrue(master.acquire())
+        self.assertTrue(master.acquire())
+        self.assertTrue(master.is_running())
+        self.assertEqual(self._count_starts(), 1)
+        self.assertTrue("ControlPath=%s" % master.path in
+                        master.get_client_args())
+
+        # Still in use, so the idle timeout doesn't apply
+        master.release()
+        time.sleep(.4)
+        self.assertTrue(master.is_running())
+
+        # Unused for the idle timeout, so it's shut down
+        master.release()
+        self.assertTrue(master.is_running())
+        time.sleep(.4)
+        self.assertFalse(master.is_running())
+        self.assertFalse(os.path.exists(master.path))
+
+        # And restarted on demand
+        self.assertTrue(master.acquire())
+        self.assertEqual(self._count_starts(), 2)
+        master.close()
+        self.assertFalse(master.is_running())
+
+    def testFailedMaster(self):
+        master = self._make_master("badhost")
+        self.assertFalse(master.acquire())
+        self.assertTrue("Permission denied" in master.get_err_output())
+
+        # Failure is remembered until all users are gone
+        self.assertFalse(master.acquire())
+        master.release()
+        master.release()
+        self.assertFalse(master.is_running())
@@ -0,0 +1,241 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+import gc
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import unittest
+
+
+def _report(name, seconds, extra=""):
+    sys.stdout.write("\n%-40s %8.3fs %s" % (name, seconds, extra))
+    sys.stdout.flush()
+
+
+def _importtime(args):
+    """
+    Run a command line tool with 'python -X importtime'. Return the list
+    of imported module names, and the total import time in seconds
+    """
+    proc = subprocess.Popen([sys.executable, "-X", "importtime"] + args,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True)
+    ignore, err = proc.communicate()
+
+    modules = []
+    total = 0
+    for line in err.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        ignore, cumulative, modname = line.split(":", 1)[1].split("|")
+        modules.append(modname.strip())
+        if not modname.startswith("  "):
+            # Top level import, nested imports are indented
+            total += int(cumulative)
+    return modules, total / 1000000.0
+
+
+class _BenchConn(object):
+    """
+    Just enough of vmmConnection for vmmStorageVolume and vmmDomain
+    to fetch and parse their XML
+    """
+    using_domain_events = True
+
+    def __init__(self, backend):
+        self._backend = backend
+
+    def get_backend(self):
+        return self._backend
+
+
+def _traced_size():
+    gc.collect()
+    return tracemalloc.get_traced_memory()[0]
+
+
+class PerfTests(unittest.TestCase):
+    """
+    Performance benchmarks. These are not run by 'setup.py test', use
+    'setup.py test_perf'. Timings are printed, and a test only fails
+    if something is grossly slower than expected.
+    """
+    def setUp(self):
+        self._tmpdir = tempfile.mkdtemp(prefix="virtinst-perf")
+
+    def tearDown(self):
+        shutil.rmtree(self._tmpdir)
+
+    def testCloneLocalSparse(self):
+        # pylint: disable=protected-access
+        from virtinst import diskbackend
+        from virtinst import progress
+
+        # 100GiB image with a few MiB of scattered data
+        size = 100 * 1024 * 1024 * 1024
+        src = os.path.join(self._tmpdir, "src.img")
+        dst = os.path.join(self._tmpdir, "dst.img")
+        with open(src, "wb") as f:
+            f.truncate(size)
+            for idx in range(100):
+                f.seek(idx * (size // 100))
+                f.write(os.urandom(64 * 1024))
+
+        meter = progress.BaseMeter()
+        meter.start(size=size)
+        src_fd = os.open(src, os.O_RDONLY)
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT, 0o640)
+        try:
+            start = time.time()
+            diskbackend._copy_local_file(src_fd, dst_fd, True, meter)
+            elapsed = time.time() - start
+        finally:
+            os.close(src_fd)
+            os.close(dst_fd)
+
+        allocated = os.stat(dst).st_blocks * 512
+        _report("clone sparse 100GiB image", elapsed,
+                "(%d KiB allocated)" % (allocated // 1024))
+        self.assertTrue(allocated < 100 * 1024 * 1024)
+        self.assertTrue(elapsed < 30)
+
+    def testGuestParse(self):
+        import virtinst
+        from tests import utils
+
+        conn = utils.URIs.open_testdriver_cached()
+        xml = open("tests/cli-test-xml/compare/"
+                   "virt-install-many-devices.xml").read()
+
+        # Bulk up the device list to mimic a large domain
+        head, devices = xml.split("<devices>", 1)
+        devices, tail = devices.split("</devices>", 1)
+        bigxml = head + "<devices>" + (devices * 20) + "</devices>" + tail
+
+        count = 200
+        start = time.time()
+        for ignore in range(count):
+            guest = virtinst.Guest(conn, parsexml=bigxml)
+            dummy = guest.name
+        elapsed = time.time() - start
+        _report("parse %d large guests, read name" % count, elapsed)
+
+        start = time.time()
+        guest = virtinst.Guest(conn, parsexml=bigxml)
+        ndisks = len(guest.devices.disk)
+        bigout = guest.get_xml()
+        _report("parse large guest, full get_xml", time.time() - start,
+                "(%d disks)" % ndisks)
+        self.assertTrue(ndisks > 20)
+        self.assertTrue(bigout)
+        self.assertTrue(elapsed < 30)
+
+    def testCLIImportTime(self):
+        # Modules that only need to be loaded once real work starts.
+        # Pulling any of these in for --version/--help is a regression
+        heavy = ["virtinst.guest", "virtinst.osdict", "virtinst.installer",
+                 "virtinst.cloner", "virtinst.unattended",
+                 "virtinst.urlfetcher"]
+
+        for args in [["./virt-install", "--version"],
+                     ["./virt-clone", "--version"],
+                     ["./virt-xml", "--help"],
+                     ["./virt-convert", "--version"]]:
+            modules, total = _importtime(args)
+            _report("import %s" % " ".join(args), total,
+                    "(%d modules)" % len(modules))
+            self.assertTrue("virtinst.cli" in modules)
+            self.assertEqual([m for m in heavy if m in modules], [])
+
+    def _checkObjectMemory(self, label, objs, summary_cb):
+        """
+        Parse the XML of every object in @objs, release it, and report
+        the memory used per object for both. summary_cb(obj) should
+        only read values that don't need the XML
+        """
+        # pylint: disable=protected-access
+        count = len(objs)
+        tracemalloc.start()
+        try:
+            base = _traced_size()
+            for obj in objs:
+                obj.get_xmlobj()
+            loaded = _traced_size() - base
+
+            start = time.time()
+            released = len([o for o in objs if o.release_xml(0)])
+            elapsed = time.time() - start
+            compact = _traced_size() - base
+
+            for obj in objs:
+                summary_cb(obj)
+            self.assertEqual(
+                len([o for o in objs if o.is_xml_released()]), count)
+            summary = _traced_size() - base
+        finally:
+            tracemalloc.stop()
+
+        _report("%d %s with parsed XML" % (count, label), 0,
+                "(%d bytes/object)" % (loaded // count))
+        _report("%d %s, XML released" % (count, label), elapsed,
+                "(%d bytes/object)" % (compact // count))
+        self.assertEqual(released, count)
+        self.assertTrue(compact < loaded)
+        self.assertTrue(summary <= compact * 1.1)
+
+    def testObjectMemory(self):
+        # pylint: disable=protected-access
+        from virtManager.domain import vmmDomain
+        from virtManager.storagepool import vmmStorageVolume
+        from tests import utils
+
+        # Wrap the testdriver objects over and over to mimic a connection
+        # with thousands of them. tracemalloc only sees the python heap,
+        # not libxml2's own allocations, so the real savings are larger
+        conn = utils.URIs.open_testdriver_cached()
+        vols = []
+        for pool in conn.listAllStoragePools(0):
+            if pool.isActive():
+                vols += pool.listAllVolumes(0)
+        doms = conn.listAllDomains(0)
+        benchconn = _BenchConn(conn)
+
+        def _vol_summary(obj):
+            obj.get_capacity()
+            obj.get_target_path()
+            scanobj = obj.get_xmlobj_for_scan()
+            dummy = scanobj.target_path, scanobj.backing_store, scanobj.type
+
+        def _dom_summary(obj):
+            # What DeviceDisk.get_paths_in_use_map reads
+            scanobj = obj.get_xmlobj_for_scan()
+            dummy = scanobj.name, scanobj.os.kernel
+            dummy = [d.path for d in scanobj.devices.disk]
+
+        vmmvols = [vmmStorageVolume(benchconn, vols[idx % len(vols)],
+                                    "vol%d" % idx)
+                   for idx in range(3000)]
+        self._checkObjectMemory("volumes", vmmvols, _vol_summary)
+        vmmdoms = [vmmDomain(benchconn, doms[idx % len(doms)], "vm%d" % idx)
+                   for idx in range(500)]
+        self._checkObjectMemory("domains", vmmdoms, _dom_summary)
+
+        # The scan stand in matches the real XML
+        obj = vmmdoms[0]
+        scanobj = obj.get_xmlobj_for_scan()
+        self.assertTrue(obj.is_xml_released())
+        self.assertEqual([d.path for d in scanobj.devices.disk],
+                         [d.path for d in obj.get_xmlobj().devices.disk])
+
+        # And the XML is parsed again on demand
+        obj = vmmvols[0]
+        self.assertTrue(obj.get_xmlobj().name)
+        self.assertFalse(obj.is_xml_released())
+        self.assertEqual(obj.get_capacity(), obj._xmlobj.capacity)
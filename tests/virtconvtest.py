@@ -5,10 +5,14 @@
 
 import io
 import os
+import shutil
+import tarfile
+import tempfile
 import unittest
 
 from virtinst import Installer
 from virtconv import VirtConverter
+from virtconv import archive
 
 from tests import utils
 
@@ -78,3 +82,41 @@ class TestVirtConv(unittest.TestCase):
         self._compare("ovf_input/test1.ovf", disk_format="qcow2")
         self._compare("vmx_input/test1.vmx", disk_format="raw")
         self._compare("ovf_input/test_gzip.ovf", disk_format="raw")
+
+    def testArchiveMultiExtentVMDK(self):
+        tmpdir = tempfile.mkdtemp(prefix="virtconv-test")
+        try:
+            descriptor = (b"# Disk DescriptorFile\nversion=1\n"
+                          b"createType=\"twoGbMaxExtentFlat\"\n"
+                          b"RW 8 FLAT \"disk-f001.vmdk\" 0\n"
+                          b"RW 8 FLAT \"disk-f002.vmdk\" 0\n")
+            files = [("vm/disk-f001.vmdk", b"\1" * 4096),
+                     ("vm/disk.vmdk", descriptor),
+                     ("vm/disk-f002.vmdk", b"\2" * 4096),
+                     ("vm/other.bin", b"\3" * 4096)]
+            srcdir = os.path.join(tmpdir, "src")
+            os.makedirs(os.path.join(srcdir, "vm"))
+            tarpath = os.path.join(tmpdir, "test.tar.gz")
+            with tarfile.open(tarpath, "w:gz") as tar:
+                for name, data in files:
+                    path = os.path.join(srcdir, name)
+                    with open(path, "wb") as f:
+                        f.write(data)
+                    tar.add(path, name)
+
+            destdir = os.path.join(tmpdir, "dest")
+            arc = archive.open_archive(tarpath)
+            arc.extract_small(destdir, limit=1024)
+
+            # The descriptor comes with all its extents, even the one
+            # stored before it, but other large members stay put
+            self.assertEqual(sorted(os.listdir(os.path.join(destdir, "vm"))),
+                             ["disk-f001.vmdk", "disk-f002.vmdk",
+                              "disk.vmdk"])
+            with open(os.path.join(destdir, "vm/disk-f002.vmdk"), "rb") as f:
+                self.assertEqual(f.read(), b"\2" * 4096)
+            self.assertEqual(arc.get_members(), sorted(
+                [name for name, ignore in files]))
+            self.assertEqual(arc.get_data_offset("vm/other.bin"), None)
+        finally:
+            shutil.rmtree(tmpdir)
@@ -117,6 +117,19 @@ class TestXMLMisc(unittest.TestCase):
             disk.generate_target(["sda", "sdg", "sdi"], 0))
         self.assertEqual("sdh", disk.generate_target(["sda", "sdg"], 1))
 
+    def testPathsInUseMap(self):
+        # The batched map should agree with per-path lookups
+        conn = utils.URIs.open_testdriver_cached()
+        inuse = DeviceDisk.get_paths_in_use_map(conn)
+        self.assertTrue(inuse.get("/dev/default-pool/collidevol1.img"))
+
+        paths = set(inuse.keys())
+        paths.update([vol.target_path for vol in conn.fetch_all_vols()])
+        for path in paths:
+            self.assertEqual(
+                sorted(DeviceDisk.path_in_use_by(conn, path)),
+                sorted(inuse.get(path, [])))
+
     def testQuickTreeinfo(self):
         # Simple sanity test to make sure detect_distro works. test-urls
         # does much more exhaustive testing but it's only run occasionally
@@ -1498,3 +1498,20 @@ class XMLParseTest(unittest.TestCase):
         guest = virtinst.Guest(self.conn, parsexml=open(infile).read())
 
         utils.diff_compare(guest.get_xml(), outfile)
+
+    def testLazyChildParse(self):
+        # Child objects are only parsed on first access, make sure XML
+        # changes made before that don't confuse things
+        # pylint: disable=protected-access
+        infile = "tests/xmlparse-xml/change-disk-in.xml"
+        guest = virtinst.Guest(self.conn, parsexml=open(infile).read())
+        self.assertEqual(guest.name, "TestGuest")
+        self.assertTrue("devices" not in guest._propstore)
+
+        disk = guest.devices.disk[1]
+        self.assertTrue("seclabels" not in disk._propstore)
+        guest.remove_device(guest.devices.disk[0])
+        self.assertEqual(disk.get_xml_idx(), 0)
+        self.assertEqual([s.model for s in disk.seclabels],
+                         ["selinux", "dac"])
+        self.assertEqual(guest.devices.disk[0].seclabels[0].relabel, False)
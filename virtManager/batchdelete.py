@@ -0,0 +1,170 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+"""
+Toolkit independent engine for deleting a set of VMs and their storage
+with a bounded pool of worker threads.
+"""
+
+import concurrent.futures
+import logging
+import threading
+import traceback
+
+
+DELETE_WORKERS = 4
+
+
+def get_other_users(inuse, path, vmnames):
+    """
+    Return the names of VMs using @path that aren't in @vmnames
+
+    :param inuse: Map from DeviceDisk.get_paths_in_use_map
+    """
+    return [name for name in inuse.get(path, []) if name not in vmnames]
+
+
+class DeleteError(object):
+    """
+    A single failure from a DeleteBatch
+
+    :param target: Name of the VM or storage path that failed
+    """
+    def __init__(self, target, error, details):
+        self.target = target
+        self.error = error
+        self.details = details
+
+    def __repr__(self):
+        return "<DeleteError %s: %s>" % (self.target, self.error)
+
+
+class DeleteBatch(object):
+    """
+    Delete @vms and the storage paths in @paths. The work is done in
+    three phases, each spread over the worker pool: power off the
+    running VMs, delete the storage, and undefine the persistent VMs.
+    Storage is only removed once every batch VM using it is stopped,
+    and a VM that fails to stop has its storage and config left alone.
+
+    The VM objects need is_active, is_persistent, destroy, delete and
+    get_name methods.
+
+    :param paths: List of (path, [vms using it]) to delete
+    :param delete_path_cb: Called with a path to delete it. Raises an
+        exception on failure
+    """
+    def __init__(self, vms, paths, delete_path_cb, workers=DELETE_WORKERS):
+        self._vms = vms
+        self._paths = paths
+        self._delete_path_cb = delete_path_cb
+        self._workers = max(1, workers)
+
+        self._lock = threading.Lock()
+        self._meter = None
+        self._text = None
+        self._finished = 0
+        self._total = 0
+
+    def _step_done(self):
+        with self._lock:
+            self._finished += 1
+            if not self._meter:
+                return
+            if self._text:
+                self._meter.text = "%s (%d/%d)" % (
+                    self._text, self._finished, self._total)
+            self._meter.update(self._finished)
+
+    def _run_parallel(self, func, items, get_target):
+        """
+        Run func(item) for every item on the worker pool. Returns the
+        list of items that failed, and a DeleteError for each
+        """
+        failed = []
+        errors = []
+        if not items:
+            return failed, errors
+
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(self._workers, len(items))) as pool:
+            futures = dict((pool.submit(func, item), item) for item in items)
+            for future in concurrent.futures.as_completed(futures):
+                item = futures[future]
+                e = future.exception()
+                if e:
+                    target = get_target(item)
+                    logging.debug("Error deleting %s: %s", target, e)
+                    failed.append(item)
+                    errors.append(DeleteError(target, str(e), "".join(
+                        traceback.format_exception(type(e), e,
+                                                   e.__traceback__))))
+                self._step_done()
+        return failed, errors
+
+    def _destroy(self, vm):
+        logging.debug("Forcing VM '%s' power off.", vm.get_name())
+        vm.destroy()
+
+    def _delete_path(self, pathinfo):
+        path = pathinfo[0]
+        logging.debug("Deleting path: %s", path)
+        self._delete_path_cb(path)
+
+    def _undefine(self, vm):
+        logging.debug("Removing VM '%s'", vm.get_name())
+        vm.delete()
+
+    def run(self, meter=None, text=None):
+        """
+        Run the batch, blocking until it's done
+
+        :returns: List of DeleteError, empty if everything succeeded
+        """
+        # Check these up front, transient VMs disappear once stopped
+        active = [vm for vm in self._vms if vm.is_active()]
+        persistent = [vm for vm in self._vms if vm.is_persistent()]
+
+        self._meter = meter
+        self._text = text
+        self._total = len(active) + len(self._paths) + len(persistent)
+        if meter:
+            meter.start(size=self._total, text=text)
+
+        def _vm_name(vm):
+            return vm.get_name()
+
+        def _path_name(pathinfo):
+            return pathinfo[0]
+
+        stuck, errors = self._run_parallel(self._destroy, active, _vm_name)
+
+        paths = []
+        for path, users in self._paths:
+            blocking = [vm.get_name() for vm in users if vm in stuck]
+            if blocking:
+                errors.append(DeleteError(path,
+                    _("Not deleted, in use by '%s' which failed to "
+                      "stop") % ", ".join(blocking), ""))
+                self._step_done()
+                continue
+            paths.append((path, users))
+        ignore, patherrors = self._run_parallel(
+            self._delete_path, paths, _path_name)
+        errors += patherrors
+
+        undefine = []
+        for vm in persistent:
+            if vm in stuck:
+                self._step_done()
+                continue
+            undefine.append(vm)
+        ignore, vmerrors = self._run_parallel(
+            self._undefine, undefine, _vm_name)
+        errors += vmerrors
+
+        if meter:
+            meter.end(self._finished)
+        return errors
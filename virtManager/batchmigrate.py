@@ -0,0 +1,342 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+"""
+Toolkit independent engine for migrating a set of VMs to one
+destination, a few at a time, sharing a bandwidth budget.
+"""
+
+import logging
+import threading
+import traceback
+
+
+# Migrate the VMs with the least memory first, so the most VMs are off
+# the source host soonest
+ORDER_MEMORY = "memory"
+# Migrate the VMs dirtying the least memory first. Busy VMs go last,
+# when fewer jobs are left to share the bandwidth budget with
+ORDER_DIRTY_RATE = "dirty-rate"
+
+
+class MigrationJob(object):
+    """
+    State of a single VM's migration in a MigrationBatch
+
+    :param vm: Backend specific VM handle
+    :param memory: VM memory size in bytes, used for ordering and as
+        the progress estimate until the real job size is known
+    :param dirty_rate: Memory dirty rate in MiB/s if known, or None
+    """
+    STATE_QUEUED = "queued"
+    STATE_RUNNING = "running"
+    STATE_DONE = "done"
+    STATE_FAILED = "failed"
+    STATE_CANCELLED = "cancelled"
+
+    def __init__(self, vm, name, memory, dirty_rate=None):
+        self.vm = vm
+        self.name = name
+        self.memory = memory
+        self.dirty_rate = dirty_rate
+
+        self.state = self.STATE_QUEUED
+        self.error = None
+        self.details = None
+        self.bandwidth = None
+        self.data_total = None
+        self.data_remaining = None
+
+    def __repr__(self):
+        return "<MigrationJob %s state=%s>" % (self.name, self.state)
+
+    def is_finished(self):
+        return self.state in [self.STATE_DONE, self.STATE_FAILED,
+                              self.STATE_CANCELLED]
+
+    def get_fraction(self):
+        """
+        Fraction of this job that is complete, 0.0 to 1.0
+        """
+        if self.state == self.STATE_DONE:
+            return 1.0
+        if self.state != self.STATE_RUNNING or not self.data_total:
+            return 0.0
+        remaining = min(self.data_remaining or 0, self.data_total)
+        return float(self.data_total - remaining) / self.data_total
+
+
+class LibvirtMigrateBackend(object):
+    """
+    MigrationBatch backend migrating vmmDomain objects with libvirt
+    """
+    def __init__(self, destconn, uri, tunnel, unsafe, temporary):
+        self._destconn = destconn
+        self._uri = uri
+        self._tunnel = tunnel
+        self._unsafe = unsafe
+        self._temporary = temporary
+
+    def migrate(self, job, bandwidth):
+        job.vm.migrate(self._destconn, self._uri, self._tunnel,
+                       self._unsafe, self._temporary, bandwidth=bandwidth)
+
+    def set_bandwidth(self, job, bandwidth):
+        job.vm.set_migrate_bandwidth(bandwidth)
+
+    def get_progress(self, job):
+        if not job.vm.getjobinfo_supported:
+            return None
+        jobinfo = job.vm.job_info()
+        data_total = jobinfo[3]
+        data_remaining = jobinfo[5]
+        # data_total is 0 if the job hasn't started yet
+        if not data_total:
+            return None
+        return data_total, data_remaining
+
+    def abort(self, job):
+        job.vm.abort_job()
+
+
+class MigrationBatch(object):
+    """
+    Migrate every job in @jobs through @backend, running at most
+    @parallel migrations at once.
+
+    The backend needs these methods:
+
+        migrate(job, bandwidth): Migrate job.vm, blocking until done.
+            Raises an exception on failure
+        set_bandwidth(job, bandwidth): Change a running job's bandwidth
+        get_progress(job): Return (data_total, data_remaining) in bytes
+            for a running job, or None if unknown
+        abort(job): Abort a running job
+
+    Bandwidths are in MiB/s, with 0 meaning unlimited.
+
+    :param bandwidth: Total bandwidth budget, split evenly between the
+        running jobs, 0 for unlimited
+    :param order: ORDER_MEMORY or ORDER_DIRTY_RATE
+    """
+    def __init__(self, backend, jobs, parallel=2, bandwidth=0,
+                 order=ORDER_MEMORY, poll_interval=.5):
+        self._backend = backend
+        self._parallel = max(1, parallel)
+        self._bandwidth = bandwidth or 0
+        self._poll_interval = poll_interval
+
+        self.jobs = self._sort_jobs(jobs, order)
+        self._cond = threading.Condition()
+        self._running = []
+        self._cancelled = False
+
+        # Serializes backend set_bandwidth calls, and tracks the
+        # bandwidth each running job was last given
+        self._bandwidth_lock = threading.Lock()
+        self._applied_bandwidth = {}
+
+    @staticmethod
+    def _sort_jobs(jobs, order):
+        if order == ORDER_DIRTY_RATE:
+            # Unknown dirty rates go last
+            def _key(job):
+                return (job.dirty_rate is None, job.dirty_rate or 0,
+                        job.memory)
+        else:
+            def _key(job):
+                return job.memory
+        return sorted(jobs, key=_key)
+
+    def _split_bandwidth(self, count):
+        if not self._bandwidth or not count:
+            return 0
+        return max(1, self._bandwidth // count)
+
+    def _rebalance(self):
+        """
+        Give every running job an even share of the bandwidth budget.
+        Called with the lock held, _apply_bandwidth() tells the backend
+        """
+        bandwidth = self._split_bandwidth(len(self._running))
+        for job in self._running:
+            job.bandwidth = bandwidth
+        return self._running[:]
+
+    def _apply_bandwidth(self, jobs):
+        """
+        Pass the current bandwidth shares of @jobs to the backend. Called
+        without the lock held, since it's an RPC to the source host. The
+        separate lock keeps a stale update from landing after a newer one
+        """
+        with self._bandwidth_lock:
+            for job in jobs:
+                bandwidth = job.bandwidth
+                # Jobs not started yet are skipped, they get their
+                # bandwidth through migrate()
+                if (job.state != job.STATE_RUNNING or
+                    job not in self._applied_bandwidth or
+                    self._applied_bandwidth[job] == bandwidth):
+                    continue
+                self._applied_bandwidth[job] = bandwidth
+                try:
+                    self._backend.set_bandwidth(job, bandwidth)
+                except Exception as e:
+                    logging.debug("Error setting migration bandwidth for "
+                                  "%s: %s", job.name, e)
+
+    def _run_job(self, job, bandwidth):
+        try:
+            self._backend.migrate(job, bandwidth)
+            state = job.STATE_DONE
+        except Exception as e:
+            job.error = str(e)
+            job.details = "".join(traceback.format_exc())
+            state = job.STATE_FAILED
+            if self._cancelled:
+                state = job.STATE_CANCELLED
+            logging.debug("Migrating %s failed: %s", job.name, e)
+
+        with self._cond:
+            job.state = state
+            self._running.remove(job)
+            running = self._rebalance()
+            self._cond.notify_all()
+        self._apply_bandwidth(running)
+
+    def _can_start_job(self, queue):
+        return bool(queue and not self._cancelled and
+                    len(self._running) < self._parallel)
+
+    def _queue_job(self, queue):
+        """
+        Move the next queued job to the running list and split the
+        budget again. Called with the lock held, the job is started
+        by _start_job()
+        """
+        job = queue.pop(0)
+        job.state = job.STATE_RUNNING
+        self._running.append(job)
+        self._rebalance()
+        return job
+
+    def _start_job(self, job):
+        # Shrink the running jobs' shares before the new job starts,
+        # so the budget is never exceeded
+        with self._cond:
+            others = [j for j in self._running if j is not job]
+        self._apply_bandwidth(others)
+
+        with self._bandwidth_lock:
+            bandwidth = job.bandwidth
+            self._applied_bandwidth[job] = bandwidth
+        with self._cond:
+            if self._cancelled:
+                # cancel() didn't see it running yet
+                job.state = job.STATE_CANCELLED
+                self._running.remove(job)
+                self._cond.notify_all()
+                return
+
+        logging.debug("Starting migration of %s bandwidth=%s",
+                      job.name, bandwidth)
+        t = threading.Thread(target=self._run_job, args=(job, bandwidth),
+                             name="migrate %s" % job.name)
+        t.daemon = True
+        t.start()
+
+    def _poll_progress(self, jobs):
+        for job in jobs:
+            try:
+                progress = self._backend.get_progress(job)
+            except Exception as e:
+                logging.debug("Error polling migration progress for "
+                              "%s: %s", job.name, e)
+                continue
+            if progress:
+                job.data_total, job.data_remaining = progress
+
+    def get_progress(self):
+        """
+        Return (completed, total) for the whole batch, in units of the
+        jobs' memory size
+        """
+        total = sum([job.memory for job in self.jobs])
+        done = sum([job.memory * job.get_fraction() for job in self.jobs])
+        return done, total
+
+    def get_status_text(self):
+        finished = len([j for j in self.jobs if j.is_finished()])
+        running = ["%s %d%%" % (job.name, job.get_fraction() * 100)
+                   for job in self._running]
+        text = "%d/%d" % (finished, len(self.jobs))
+        if running:
+            text += ": " + ", ".join(running)
+        return text
+
+    def cancel(self):
+        """
+        Abort the running jobs and don't start any queued ones
+        """
+        with self._cond:
+            self._cancelled = True
+            running = self._running[:]
+            self._cond.notify_all()
+
+        for job in running:
+            try:
+                self._backend.abort(job)
+            except Exception as e:
+                logging.debug("Error aborting migration of %s: %s",
+                              job.name, e)
+
+    def run(self, meter=None, text=None):
+        """
+        Run the batch, blocking until every job has finished. Progress
+        for the whole batch is reported through @meter.
+
+        :returns: The list of jobs, in the order they were started
+        """
+        queue = self.jobs[:]
+        done, total = self.get_progress()
+        if meter:
+            meter.start(size=total, text=text)
+
+        while True:
+            job = None
+            with self._cond:
+                if self._can_start_job(queue):
+                    job = self._queue_job(queue)
+                elif not self._running and (self._cancelled or not queue):
+                    break
+
+            # Don't hold the lock over backend calls, they can be slow
+            if job:
+                self._start_job(job)
+                continue
+
+            with self._cond:
+                if not self._can_start_job(queue):
+                    self._cond.wait(self._poll_interval)
+                running = self._running[:]
+
+            self._poll_progress(running)
+            if meter:
+                self._update_meter(meter, text)
+
+        for job in queue:
+            job.state = job.STATE_CANCELLED
+
+        if meter:
+            done = self._update_meter(meter, text)
+            meter.end(done)
+        return self.jobs
+
+    def _update_meter(self, meter, text):
+        done, ignore = self.get_progress()
+        if text:
+            meter.text = "%s %s" % (text, self.get_status_text())
+        meter.update(done)
+        return done
@@ -260,6 +260,7 @@ class vmmCloneVM(vmmGObjectUI):
 
         self.populate_storage_lists()
         self.populate_network_list()
+        self.widget("clone-parallel-copies").set_value(1)
 
         return
 
@@ -586,6 +587,8 @@ class vmmCloneVM(vmmGObjectUI):
         no_storage = not bool(len(self.target_list))
         self.widget("clone-storage-box").set_visible(not no_storage)
         self.widget("clone-no-storage-pass").set_visible(no_storage)
+        self.widget("clone-parallel-copies-box").set_visible(
+            len(self.target_list) > 1)
 
         skip_targets = []
         new_disks = []
@@ -787,6 +790,7 @@ class vmmCloneVM(vmmGObjectUI):
         cd.skip_target = skip_targets
         cd.setup_original()
         cd.clone_paths = new_paths
+        cd.concurrency = self.widget("clone-parallel-copies").get_value()
 
         if warn_str:
             res = self.err.ok_cancel(
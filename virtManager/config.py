@@ -279,6 +279,8 @@ class vmmConfig(object):
         return self.conf.get("/vmlist-fields/disk-usage")
     def is_vmlist_network_traffic_visible(self):
         return self.conf.get("/vmlist-fields/network-traffic")
+    def is_vmlist_thumbnail_visible(self):
+        return self.conf.get("/vmlist-fields/thumbnail")
 
     def set_vmlist_guest_cpu_usage_visible(self, state):
         self.conf.set("/vmlist-fields/cpu-usage", state)
@@ -290,6 +292,8 @@ class vmmConfig(object):
         self.conf.set("/vmlist-fields/disk-usage", state)
     def set_vmlist_network_traffic_visible(self, state):
         self.conf.set("/vmlist-fields/network-traffic", state)
+    def set_vmlist_thumbnail_visible(self, state):
+        self.conf.set("/vmlist-fields/thumbnail", state)
 
     def on_vmlist_guest_cpu_usage_visible_changed(self, cb):
         return self.conf.notify_add("/vmlist-fields/cpu-usage", cb)
@@ -301,6 +305,8 @@ class vmmConfig(object):
         return self.conf.notify_add("/vmlist-fields/disk-usage", cb)
     def on_vmlist_network_traffic_visible_changed(self, cb):
         return self.conf.notify_add("/vmlist-fields/network-traffic", cb)
+    def on_vmlist_thumbnail_visible_changed(self, cb):
+        return self.conf.notify_add("/vmlist-fields/thumbnail", cb)
 
     # Keys preferences
     def get_keys_combination(self):
@@ -372,6 +378,12 @@ class vmmConfig(object):
     def set_libguestfs_inspect_vms(self, val):
         self.conf.set("/enable-libguestfs-vm-inspection", val)
 
+    # Dropping parsed XML of idle objects
+    def get_memory_efficiency(self):
+        return self.conf.get("/memory-efficiency")
+    def set_memory_efficiency(self, val):
+        self.conf.set("/memory-efficiency", val)
+
 
     # Stats history and interval length
     def get_stats_history_length(self):
@@ -386,6 +398,17 @@ class vmmConfig(object):
     def on_stats_update_interval_changed(self, cb):
         return self.conf.notify_add("/stats/update-interval", cb)
 
+    # Console thumbnail capture interval
+    def get_thumbnail_update_interval(self):
+        interval = self.conf.get("/stats/thumbnail-interval")
+        if interval < 2:
+            return 2
+        return interval
+    def set_thumbnail_update_interval(self, interval):
+        self.conf.set("/stats/thumbnail-interval", interval)
+    def on_thumbnail_update_interval_changed(self, cb):
+        return self.conf.notify_add("/stats/thumbnail-interval", cb)
+
 
     # Disable/Enable different stats polling
     def get_stats_enable_cpu_poll(self):
@@ -8,6 +8,8 @@ import collections
 import logging
 import os
 import re
+import subprocess
+import threading
 import time
 
 from gi.repository import GLib
@@ -20,6 +22,20 @@ from .baseclass import vmmGObjectUI
 from . import uiutil
 
 
+# Only show one credentials dialog at a time, no matter how many
+# connections are being opened
+_creds_lock = threading.Lock()
+
+# How long to wait for a host to answer the non-interactive ssh probe
+SSH_PROBE_TIMEOUT = 10
+
+# ssh errors meaning a login would have prompted the user. Anything
+# else, like an unreachable host, won't prompt either
+_SSH_AUTH_ERRORS = re.compile(
+    r"Permission denied|Host key verification failed|"
+    r"No more authentication methods")
+
+
 def do_we_have_session():
     pid = os.getpid()
     try:
@@ -130,14 +146,75 @@ def creds_dialog(creds, cbdata):
             ret = -1
         retipc.append(ret)
 
-    GLib.idle_add(wrapper, creds, cbdata)
+    with _creds_lock:
+        GLib.idle_add(wrapper, creds, cbdata)
 
-    while not retipc:
-        time.sleep(.1)
+        while not retipc:
+            time.sleep(.1)
 
     return retipc[0]
 
 
+def _ssh_needs_interactive_auth(backend):
+    """
+    Check if an ssh login to the connection's host would prompt the
+    user, ie. it fails without one only because of authentication.
+    A host that is down or doesn't answer won't prompt anybody
+    """
+    argv = ["ssh", "-o", "BatchMode=yes",
+            "-o", "ConnectTimeout=%d" % SSH_PROBE_TIMEOUT]
+    if backend.get_uri_port():
+        argv += ["-p", str(backend.get_uri_port())]
+    if backend.get_uri_username():
+        argv += ["-l", backend.get_uri_username()]
+    argv += [backend.get_uri_hostname(), "true"]
+
+    proc = None
+    try:
+        proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                close_fds=True)
+        ignore, err = proc.communicate(timeout=SSH_PROBE_TIMEOUT * 2)
+    except Exception as e:
+        logging.debug("ssh probe of %s failed: %s",
+                      backend.get_uri_hostname(), e)
+        if proc and proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        return False
+
+    if proc.returncode == 0:
+        return False
+
+    err = err.decode(errors="replace").strip()
+    logging.debug("ssh probe of %s returned %s: %s",
+                  backend.get_uri_hostname(), proc.returncode, err)
+    return bool(_SSH_AUTH_ERRORS.search(err))
+
+
+def might_need_interactive_auth(conn):
+    """
+    Best effort guess if opening @conn will prompt the user, via polkit
+    or ssh-askpass. Used to serialize those opens, so prompts don't pile
+    up on top of each other. libvirt credential dialogs are serialized
+    by creds_dialog regardless.
+
+    For ssh URIs this does a non-interactive login, so it can block
+    for up to SSH_PROBE_TIMEOUT seconds.
+    """
+    backend = conn.get_backend()
+    if backend.is_test():
+        return False
+
+    if not conn.is_remote():
+        # polkit only applies to privileged local connections
+        return not backend.is_session_uri() and os.getuid() != 0
+
+    if backend.get_uri_transport() == "ssh":
+        return _ssh_needs_interactive_auth(backend)
+    return False
+
+
 def connect_error(conn, errmsg, tb, warnconsole):
     """
     Format connection error message
@@ -4,8 +4,10 @@
 # This work is licensed under the GNU GPLv2 or later.
 # See the COPYING file in the top-level directory.
 
+import contextlib
 import logging
 import os
+import queue
 import threading
 import time
 import traceback
@@ -17,6 +19,7 @@ from virtinst import pollhelpers
 from virtinst import util
 
 from . import connectauth
+from . import eventcoalescer
 from .baseclass import vmmGObject
 from .domain import vmmDomain
 from .interface import vmmInterface
@@ -31,6 +34,122 @@ from .storagepool import vmmStoragePool
 # Can be enabled with virt-manager --test-no-events
 FORCE_DISABLE_EVENTS = False
 
+# Max threads per connection fetching the initial state of new objects
+_INIT_WORKERS = 4
+
+# In memory efficiency mode, how long an object's parsed XML can go
+# unused before it's released, and how often we check, in seconds
+_XML_RELEASE_AGE = 60
+_XML_RELEASE_INTERVAL = 30
+
+# Object types for the EventCoalescer
+_EVENT_DOMAIN = "domain"
+_EVENT_NETWORK = "network"
+_EVENT_POOL = "pool"
+_EVENT_NODEDEV = "nodedev"
+
+
+class _ConnectTimeline(object):
+    """
+    Records how long each phase of opening a connection took, and how
+    long initializing each type of object took, for debugging slow
+    connects. Object timings are recorded from worker threads.
+    """
+    def __init__(self):
+        self._start = time.time()
+        self._lock = threading.Lock()
+        self._phases = []
+        self._objects = {}
+
+    def _offset(self):
+        return time.time() - self._start
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start = self._offset()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._phases.append((name, start, self._offset() - start))
+
+    def record_object(self, class_name, elapsed):
+        with self._lock:
+            stats = self._objects.setdefault(class_name, {
+                "count": 0, "total": 0.0, "max": 0.0,
+                "first": None, "last": None})
+            now = self._offset()
+            stats["count"] += 1
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+            if stats["first"] is None:
+                stats["first"] = now
+            stats["last"] = now
+
+    def get_data(self):
+        """
+        Return a dict with a list of (phase name, start offset, duration)
+        and a dict of per object type stats. Times are in seconds.
+        """
+        with self._lock:
+            return {
+                "phases": self._phases[:],
+                "objects": dict((k, v.copy()) for k, v in
+                                self._objects.items()),
+            }
+
+    def format(self):
+        data = self.get_data()
+        lines = []
+        for name, start, duration in data["phases"]:
+            lines.append("  %-20s start=%.3fs duration=%.3fs" %
+                         (name, start, duration))
+        for class_name, stats in sorted(data["objects"].items()):
+            lines.append("  %-20s count=%d total=%.3fs max=%.3fs "
+                         "first=%.3fs last=%.3fs" %
+                         (class_name, stats["count"], stats["total"],
+                          stats["max"], stats["first"], stats["last"]))
+        return "\n".join(lines)
+
+
+class _InitQueue(object):
+    """
+    Small pool of daemonized worker threads fetching the initial state
+    of new objects. Daemon threads, so an init call stuck on a dead
+    connection can't keep the app from exiting
+
+    :param start_thread_cb: vmmGObject._start_thread of the owner
+    """
+    def __init__(self, start_thread_cb, name, workers):
+        self._queue = queue.Queue()
+        self._workers = workers
+        self._closed = False
+        for idx in range(workers):
+            start_thread_cb(self._worker, "%s %d" % (name, idx))
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None or self._closed:
+                return
+            func, args = item
+            try:
+                func(*args)
+            except Exception as e:
+                logging.debug("Object init failed: %s", e, exc_info=True)
+
+    def submit(self, func, *args):
+        self._queue.put((func, args))
+
+    def close(self):
+        """
+        Stop the workers, dropping everything still queued. Calls
+        already running finish in the background
+        """
+        self._closed = True
+        for ignore in range(self._workers):
+            self._queue.put(None)
+
 
 class _ObjectList(vmmGObject):
     """
@@ -183,6 +302,9 @@ class vmmConnection(vmmGObject):
 
         self._init_object_count = None
         self._init_object_event = None
+        self._init_queue = None
+        self._init_timeline = None
+        self._connect_timeline = None
 
         self._network_capable = None
         self._storage_capable = None
@@ -197,14 +319,26 @@ class vmmConnection(vmmGObject):
         self._storage_pool_cb_ids = []
         self.using_node_device_events = False
         self._node_device_cb_ids = []
+        self._event_coalescer = eventcoalescer.EventCoalescer(
+            self._handle_events)
+        # Map of event object type to (lookup function, tick poll arg)
+        self._event_handlers = {
+            _EVENT_DOMAIN: (self.get_vm, "pollvm"),
+            _EVENT_NETWORK: (self.get_net, "pollnet"),
+            _EVENT_POOL: (self.get_pool, "pollpool"),
+            _EVENT_NODEDEV: (self.get_nodedev, "pollnodedev"),
+        }
 
         self._xml_flags = {}
 
         self._objects = _ObjectList()
+        # NodeDeviceIndex of the nodedev XML, built on first use
+        self._nodedev_index = None
         self.statsmanager = vmmStatsManager()
 
         self._stats = []
         self._hostinfo = None
+        self._last_xml_release = 0
 
         self.add_gsettings_handle(
             self._on_config_pretty_name_changed(
@@ -274,22 +408,25 @@ class vmmConnection(vmmGObject):
             time.sleep(.1)
 
     def _init_virtconn(self):
+        # Released XML is only summarized for these scans, see
+        # vmmLibvirtObject.get_xmlobj_for_scan
         self._backend.cb_fetch_all_domains = (
-            lambda: [obj.get_xmlobj(refresh_if_nec=False)
+            lambda: [obj.get_xmlobj_for_scan()
                      for obj in self.list_vms()])
         self._backend.cb_fetch_all_pools = (
-            lambda: [obj.get_xmlobj(refresh_if_nec=False)
+            lambda: [obj.get_xmlobj_for_scan()
                      for obj in self.list_pools()])
         self._backend.cb_fetch_all_nodedevs = (
             lambda: [obj.get_xmlobj(refresh_if_nec=False)
                      for obj in self.list_nodedevs()])
+        self._backend.cb_get_nodedev_index = self._get_nodedev_index
 
         def fetch_all_vols():
             ret = []
             for pool in self.list_pools():
                 for vol in pool.get_volumes():
                     try:
-                        ret.append(vol.get_xmlobj(refresh_if_nec=False))
+                        ret.append(vol.get_xmlobj_for_scan())
                     except Exception as e:
                         logging.debug("Fetching volume XML failed: %s", e)
             return ret
@@ -543,14 +680,9 @@ class vmmConnection(vmmGObject):
 
     def get_vol_by_path(self, path):
         for pool in self.list_pools():
-            for vol in pool.get_volumes():
-                try:
-                    if vol.get_target_path() == path:
-                        return vol
-                except Exception as e:
-                    # Errors can happen if the volume disappeared, bug 1092739
-                    logging.debug("Error looking up volume from path=%s: %s",
-                        path, e)
+            vol = pool.get_volume_by_path(path)
+            if vol:
+                return vol
         return None
 
 
@@ -572,6 +704,15 @@ class vmmConnection(vmmGObject):
     def is_connecting(self):
         return self._state == self._STATE_CONNECTING
 
+    def get_connect_timeline(self):
+        """
+        Return timing data for the last open() attempt, in the format
+        of _ConnectTimeline.get_data(), or None
+        """
+        if not self._connect_timeline:
+            return None
+        return self._connect_timeline.get_data()
+
     def get_state_text(self):
         if self.is_disconnected():
             return _("Disconnected")
@@ -617,38 +758,48 @@ class vmmConnection(vmmGObject):
     # nodedev helper functions #
     ############################
 
-    def filter_nodedevs(self, devtype=None, devcap=None):
-        retdevs = []
-        for dev in self.list_nodedevs():
-            try:
-                xmlobj = dev.get_xmlobj()
-            except libvirt.libvirtError as e:
-                # Libvirt nodedev XML fetching can be busted
-                # https://bugzilla.redhat.com/show_bug.cgi?id=1225771
-                if e.get_error_code() != libvirt.VIR_ERR_NO_NODE_DEVICE:
-                    logging.debug("Error fetching nodedev XML", exc_info=True)
-                continue
-
-            if devtype and xmlobj.device_type != devtype:
-                continue
-
-            if devcap:
-                if (not hasattr(xmlobj, "capability_type") or
-                    xmlobj.capability_type != devcap):
-                    continue
+    def _index_nodedev(self, dev):
+        try:
+            xmlobj = dev.get_xmlobj()
+        except libvirt.libvirtError as e:
+            # Libvirt nodedev XML fetching can be busted
+            # https://bugzilla.redhat.com/show_bug.cgi?id=1225771
+            if e.get_error_code() != libvirt.VIR_ERR_NO_NODE_DEVICE:
+                logging.debug("Error fetching nodedev XML", exc_info=True)
+            self._nodedev_index.remove(dev.get_connkey())
+            return
+        self._nodedev_index.add(xmlobj)
 
-            retdevs.append(dev)
+    def _get_nodedev_index(self):
+        """
+        Return the NodeDeviceIndex for our nodedevs. It's kept up to date
+        as nodedevs come and go and their XML changes
+        """
+        if self._nodedev_index is None:
+            self._nodedev_index = virtinst.NodeDeviceIndex()
+            for dev in self.list_nodedevs():
+                self._index_nodedev(dev)
+        return self._nodedev_index
+
+    def _nodedev_index_changed(self, dev, removed=False):
+        if self._nodedev_index is None:
+            return
+        if removed:
+            self._nodedev_index.remove(dev.get_connkey())
+        else:
+            self._index_nodedev(dev)
 
+    def filter_nodedevs(self, devtype=None, devcap=None):
+        retdevs = []
+        for xmlobj in self._get_nodedev_index().filter(devtype, devcap):
+            dev = self.get_nodedev(xmlobj.name)
+            if dev:
+                retdevs.append(dev)
         return retdevs
 
     def get_nodedev_count(self, devtype, vendor, product):
-        count = 0
-        devs = self.filter_nodedevs(devtype)
-
-        for dev in devs:
-            if (vendor == dev.xmlobj.vendor_id and
-                product == dev.xmlobj.product_id):
-                count += 1
+        count = len(self._get_nodedev_index().find_by_ids(
+            vendor, product, devtype))
 
         logging.debug("There are %d node devices with "
                       "vendorId: %s, productId: %s",
@@ -716,10 +867,66 @@ class vmmConnection(vmmGObject):
     # Domain event handling #
     #########################
 
-    # Our strategy here isn't the most efficient: since we need to keep the
-    # poll helpers around for compat with old libvirt, switching to a fully
-    # event driven setup is hard, so we end up doing more polling than
-    # necessary on most events.
+    # Events are collected by an EventCoalescer and handled in batches,
+    # so a burst of events for the same object is a single refresh, and
+    # events for objects we don't know about are a single poll per type.
+
+    def _queue_event(self, objtype, name, action):
+        if self._event_coalescer:
+            self._event_coalescer.add(objtype, name, action)
+
+    def _handle_events(self, pending):
+        """
+        Called from the EventCoalescer timer thread with a batch of
+        events. Object lookups are thread safe, the actual refreshes
+        are done from the main loop.
+        """
+        coalescer = self._event_coalescer
+        handlers = self._event_handlers
+        if not coalescer or self._closing or not self._backend.is_open():
+            return
+
+        pollargs = {}
+        for objtype, objects in pending.items():
+            getter, pollarg = handlers[objtype]
+            for name, actions in objects.items():
+                obj = getter(name)
+                if eventcoalescer.ACTION_POLL in actions:
+                    pollargs[pollarg] = True
+                elif not obj and actions != set(
+                        [eventcoalescer.ACTION_REFRESH]):
+                    pollargs[pollarg] = True
+                if not obj:
+                    continue
+
+                if eventcoalescer.ACTION_REMOVE in actions:
+                    if obj.is_nodedev():
+                        self.idle_add(self._nodedev_index_changed, obj, True)
+                    continue
+                if eventcoalescer.ACTION_RECACHE in actions:
+                    coalescer.count_work("recache")
+                    self.idle_add(self._recache_from_event, obj)
+                if eventcoalescer.ACTION_REFRESH in actions:
+                    coalescer.count_work("refresh")
+                    self.idle_add(obj.refresh_pool_cache_from_event_loop)
+
+        if pollargs:
+            coalescer.count_work("poll", len(pollargs))
+            self.schedule_priority_tick(force=True, **pollargs)
+
+    def _recache_from_event(self, obj):
+        obj.recache_from_event_loop()
+        if obj.is_nodedev():
+            self._nodedev_index_changed(obj)
+
+    def get_event_stats(self):
+        """
+        Return the EventCoalescer counters of libvirt events received
+        and the refreshes and polls they turned into
+        """
+        if not self._event_coalescer:
+            return None
+        return self._event_coalescer.get_stats()
 
     def _domain_xml_misc_event(self, conn, domain, *args):
         # Just trigger a domain XML refresh for hotplug type events
@@ -730,11 +937,10 @@ class vmmConnection(vmmGObject):
         name = domain.name()
         logging.debug("domain xmlmisc event: domain=%s event=%s args=%s",
                 name, eventstr, args)
-        obj = self.get_vm(name)
-        if not obj:
+        if not self.get_vm(name):
             return
 
-        self.idle_add(obj.recache_from_event_loop)
+        self._queue_event(_EVENT_DOMAIN, name, eventcoalescer.ACTION_RECACHE)
 
     def _domain_lifecycle_event(self, conn, domain, state, reason, userdata):
         ignore = conn
@@ -744,12 +950,7 @@ class vmmConnection(vmmGObject):
         logging.debug("domain lifecycle event: domain=%s %s", name,
                 LibvirtEnumMap.domain_lifecycle_str(state, reason))
 
-        obj = self.get_vm(name)
-
-        if obj:
-            self.idle_add(obj.recache_from_event_loop)
-        else:
-            self.schedule_priority_tick(pollvm=True, force=True)
+        self._queue_event(_EVENT_DOMAIN, name, eventcoalescer.ACTION_RECACHE)
 
     def _domain_agent_lifecycle_event(self, conn, domain, state, reason, userdata):
         ignore = conn
@@ -759,12 +960,7 @@ class vmmConnection(vmmGObject):
         logging.debug("domain agent lifecycle event: domain=%s %s", name,
                 LibvirtEnumMap.domain_agent_lifecycle_str(state, reason))
 
-        obj = self.get_vm(name)
-
-        if obj:
-            self.idle_add(obj.recache_from_event_loop)
-        else:
-            self.schedule_priority_tick(pollvm=True, force=True)
+        self._queue_event(_EVENT_DOMAIN, name, eventcoalescer.ACTION_RECACHE)
 
     def _network_lifecycle_event(self, conn, network, state, reason, userdata):
         ignore = conn
@@ -773,12 +969,8 @@ class vmmConnection(vmmGObject):
         name = network.name()
         logging.debug("network lifecycle event: network=%s %s",
                 name, LibvirtEnumMap.network_lifecycle_str(state, reason))
-        obj = self.get_net(name)
 
-        if obj:
-            self.idle_add(obj.recache_from_event_loop)
-        else:
-            self.schedule_priority_tick(pollnet=True, force=True)
+        self._queue_event(_EVENT_NETWORK, name, eventcoalescer.ACTION_RECACHE)
 
     def _storage_pool_lifecycle_event(self, conn, pool,
                                       state, reason, userdata):
@@ -789,12 +981,7 @@ class vmmConnection(vmmGObject):
         logging.debug("storage pool lifecycle event: pool=%s %s",
             name, LibvirtEnumMap.storage_lifecycle_str(state, reason))
 
-        obj = self.get_pool(name)
-
-        if obj:
-            self.idle_add(obj.recache_from_event_loop)
-        else:
-            self.schedule_priority_tick(pollpool=True, force=True)
+        self._queue_event(_EVENT_POOL, name, eventcoalescer.ACTION_RECACHE)
 
     def _storage_pool_refresh_event(self, conn, pool, userdata):
         ignore = conn
@@ -803,12 +990,7 @@ class vmmConnection(vmmGObject):
         name = pool.name()
         logging.debug("storage pool refresh event: pool=%s", name)
 
-        obj = self.get_pool(name)
-
-        if not obj:
-            return
-
-        self.idle_add(obj.refresh_pool_cache_from_event_loop)
+        self._queue_event(_EVENT_POOL, name, eventcoalescer.ACTION_REFRESH)
 
     def _node_device_lifecycle_event(self, conn, dev,
                                      state, reason, userdata):
@@ -819,7 +1001,13 @@ class vmmConnection(vmmGObject):
         logging.debug("node device lifecycle event: nodedev=%s %s",
             name, LibvirtEnumMap.nodedev_lifecycle_str(state, reason))
 
-        self.schedule_priority_tick(pollnodedev=True, force=True)
+        # Deleted devices are dropped from the index when the batch is
+        # handled, the object itself goes on the next tick
+        deleted = getattr(libvirt, "VIR_NODE_DEVICE_EVENT_DELETED", 1)
+        if state == deleted:
+            self._queue_event(_EVENT_NODEDEV, name,
+                              eventcoalescer.ACTION_REMOVE)
+        self._queue_event(_EVENT_NODEDEV, name, eventcoalescer.ACTION_POLL)
 
     def _node_device_update_event(self, conn, dev, userdata):
         ignore = conn
@@ -828,10 +1016,11 @@ class vmmConnection(vmmGObject):
         name = dev.name()
         logging.debug("node device update event: nodedev=%s", name)
 
-        obj = self.get_nodedev(name)
+        if not self.get_nodedev(name):
+            return
 
-        if obj:
-            self.idle_add(obj.recache_from_event_loop)
+        self._queue_event(_EVENT_NODEDEV, name,
+                          eventcoalescer.ACTION_RECACHE)
 
     def _add_conn_events(self):
         if not self.check_support(
@@ -959,10 +1148,19 @@ class vmmConnection(vmmGObject):
             self._storage_pool_cb_ids = []
             self._node_device_cb_ids = []
 
+        if self._event_coalescer:
+            self._event_coalescer.cancel()
+            stats = self._event_coalescer.get_stats()
+            if stats["received"]:
+                logging.debug("conn=%s event stats: %s",
+                              self.get_uri(), stats)
         self._stats = []
 
         if self._init_object_event:
             self._init_object_event.clear()
+        if self._init_queue:
+            self._init_queue.close()
+            self._init_queue = None
 
         for obj in self._objects.all_objects():
             self._objects.remove(obj)
@@ -973,6 +1171,7 @@ class vmmConnection(vmmGObject):
                 logging.debug("Failed to cleanup %s: %s", obj, e)
         self._objects.cleanup()
         self._objects = _ObjectList()
+        self._nodedev_index = None
 
         closeret = self._backend.close()
         if closeret == 1 and self.config.test_leak_debug:
@@ -986,9 +1185,12 @@ class vmmConnection(vmmGObject):
         self.close()
 
         self._objects = None
+        self._event_coalescer = None
+        self._event_handlers = None
         self._backend.cb_fetch_all_domains = None
         self._backend.cb_fetch_all_pools = None
         self._backend.cb_fetch_all_nodedevs = None
+        self._backend.cb_get_nodedev_index = None
         self._backend.cb_fetch_all_vols = None
         self._backend.cb_cache_new_pool = None
 
@@ -997,6 +1199,7 @@ class vmmConnection(vmmGObject):
             return
 
         self._change_state(self._STATE_CONNECTING)
+        self._connect_timeline = _ConnectTimeline()
 
         logging.debug("Scheduling background open thread for %s",
                       self.get_uri())
@@ -1038,22 +1241,27 @@ class vmmConnection(vmmGObject):
         return False, ConnectError
 
     def _populate_initial_state(self):
-        logging.debug("libvirt version=%s",
-                      self._backend.local_libvirt_version())
-        logging.debug("daemon version=%s",
-                      self._backend.daemon_version())
-        logging.debug("conn version=%s", self._backend.conn_version())
-        logging.debug("%s capabilities:\n%s",
-                      self.get_uri(), self.caps.get_xml())
+        timeline = self._connect_timeline
+
+        with timeline.phase("capabilities"):
+            logging.debug("libvirt version=%s",
+                          self._backend.local_libvirt_version())
+            logging.debug("daemon version=%s",
+                          self._backend.daemon_version())
+            logging.debug("conn version=%s", self._backend.conn_version())
+            logging.debug("%s capabilities:\n%s",
+                          self.get_uri(), self.caps.get_xml())
 
         # Try to create the default storage pool
         # We want this before events setup to save some needless polling
-        try:
-            virtinst.StoragePool.build_default_pool(self.get_backend())
-        except Exception as e:
-            logging.debug("Building default pool failed: %s", str(e))
+        with timeline.phase("default pool"):
+            try:
+                virtinst.StoragePool.build_default_pool(self.get_backend())
+            except Exception as e:
+                logging.debug("Building default pool failed: %s", str(e))
 
-        self._add_conn_events()
+        with timeline.phase("events"):
+            self._add_conn_events()
 
         try:
             self._backend.setKeepAlive(20, 1)
@@ -1071,22 +1279,29 @@ class vmmConnection(vmmGObject):
 
         self._init_object_event = threading.Event()
         self._init_object_count = 0
+        self._init_timeline = timeline
 
-        self.schedule_priority_tick(stats_update=True,
-            pollvm=True, pollnet=True,
-            pollpool=True, polliface=True,
-            pollnodedev=True, force=True, initial_poll=True)
+        with timeline.phase("objects"):
+            self.schedule_priority_tick(stats_update=True,
+                pollvm=True, pollnet=True,
+                pollpool=True, polliface=True,
+                pollnodedev=True, force=True, initial_poll=True)
 
-        self._init_object_event.wait()
+            self._init_object_event.wait()
         self._init_object_event = None
         self._init_object_count = None
+        self._init_timeline = None
 
     def _open_thread(self):
         ConnectError = None
+        timeline = self._connect_timeline
         try:
-            is_active, ConnectError = self._do_open()
+            with timeline.phase("open"):
+                is_active, ConnectError = self._do_open()
             if is_active:
                 self._populate_initial_state()
+                logging.debug("conn=%s connect timeline:\n%s",
+                              self.get_uri(), timeline.format())
 
             self.idle_add(self._change_state, is_active and
                 self._STATE_ACTIVE or self._STATE_DISCONNECTED)
@@ -1137,6 +1352,8 @@ class vmmConnection(vmmGObject):
                 continue
 
             logging.debug("%s=%s removed", class_name, name)
+            if obj.is_nodedev():
+                self._nodedev_index_changed(obj, removed=True)
             self._remove_object_signal(obj)
             obj.cleanup()
 
@@ -1176,6 +1393,7 @@ class vmmConnection(vmmGObject):
             elif obj.is_interface():
                 self.emit("interface-added", obj.get_connkey())
             elif obj.is_nodedev():
+                self._nodedev_index_changed(obj)
                 self.emit("nodedev-added", obj.get_connkey())
         finally:
             if self._init_object_event:
@@ -1244,9 +1462,10 @@ class vmmConnection(vmmGObject):
         new_ifaces = _process_objects(self._update_interfaces(polliface))
         new_nodedevs = _process_objects(self._update_nodedevs(pollnodedev))
 
-        # Kick off one thread per object type to handle the initial
-        # XML fetching. Going any more fine grained then this probably
-        # won't be that useful due to libvirt's locking structure.
+        # Hand the initial XML fetching off to a small pool of worker
+        # threads, so a slow object doesn't hold up every other object
+        # of its type. Each object is reported to the UI as soon as it's
+        # ready. VMs go first since they are what users are waiting on.
         #
         # Would prefer to start refreshing some objects before all polling
         # is complete, but we need init_object_count to be fully accurate
@@ -1257,21 +1476,37 @@ class vmmConnection(vmmGObject):
             # is never called and the event is never set, so let's do it here
             self._init_object_event.set()
 
-        for newlist in [new_vms, new_nets, new_pools,
+        for newlist in [new_vms, new_pools, new_nets,
                 new_ifaces, new_nodedevs]:
-            if not newlist:
-                continue
+            for obj in newlist:
+                self._get_init_queue().submit(
+                    self._init_new_object, obj, self._init_timeline)
 
-            def cb(lst):
-                for obj in lst:
-                    obj.connect_once("initialized", self._new_object_cb)
-                    obj.init_libvirt_state()
+        return gone_objects, preexisting_objects
 
-            self._start_thread(cb,
-                "refreshing xml for new %s" % newlist[0].class_name(),
-                args=(newlist,))
+    def _get_init_queue(self):
+        if not self._init_queue:
+            self._init_queue = _InitQueue(self._start_thread,
+                "init %s" % self.get_uri(), _INIT_WORKERS)
+        return self._init_queue
 
-        return gone_objects, preexisting_objects
+    def schedule_object_init(self, objs):
+        """
+        Fetch the initial state of @objs in the background init threads.
+        Used for child objects like storage volumes, which aren't reported
+        through the new object signals.
+        """
+        for obj in objs:
+            self._get_init_queue().submit(obj.init_libvirt_state)
+
+    def _init_new_object(self, obj, timeline):
+        if self._closing:
+            return
+        start = time.time()
+        obj.connect_once("initialized", self._new_object_cb)
+        obj.init_libvirt_state()
+        if timeline:
+            timeline.record_object(obj.class_name(), time.time() - start)
 
     def _tick(self, stats_update=False,
              pollvm=False, pollnet=False,
@@ -1347,6 +1582,27 @@ class vmmConnection(vmmGObject):
                 [o for o in preexisting_objects if o.reports_stats()])
             self.idle_emit("resources-sampled")
 
+        if (self.config.get_memory_efficiency() and
+            time.time() - self._last_xml_release >= _XML_RELEASE_INTERVAL):
+            self._last_xml_release = time.time()
+            self.idle_add(self._release_idle_xml)
+
+    def _release_idle_xml(self):
+        """
+        Memory efficiency mode: drop the parsed XML of objects that
+        haven't been looked at recently. It's parsed again on demand
+        """
+        if self._closing or not self._backend.is_open():
+            return
+
+        objs = self.list_vms() + self.list_nets() + self.list_pools()
+        for pool in self.list_pools():
+            objs += pool.get_cached_volumes()
+        released = [o for o in objs if o.release_xml(_XML_RELEASE_AGE)]
+        if released:
+            logging.debug("conn=%s released XML of %d/%d idle objects",
+                          self.get_uri(), len(released), len(objs))
+
     def _recalculate_stats(self, vms):
         if not self._backend.is_open():
             return
@@ -18,6 +18,7 @@ from virtinst import util
 
 from .asyncjob import vmmAsyncJob
 from .baseclass import vmmGObjectUI
+from . import batchdelete
 from . import uiutil
 
 STORAGE_ROW_CONFIRM = 0
@@ -33,6 +34,10 @@ STORAGE_ROW_TOOLTIP = 7
 class vmmDeleteDialog(vmmGObjectUI):
     @classmethod
     def show_instance(cls, parentobj, vm):
+        """
+        :param vm: A vmmDomain, or a list of vmmDomains on the same
+            connection to delete together
+        """
         try:
             if not cls._instance:
                 cls._instance = vmmDeleteDialog()
@@ -44,6 +49,8 @@ class vmmDeleteDialog(vmmGObjectUI):
     def __init__(self):
         vmmGObjectUI.__init__(self, "delete.ui", "vmm-delete")
         self.vm = None
+        self._vms = []
+        self._deleting = False
 
         self.builder.connect_signals({
             "on_vmm_delete_delete_event": self.close,
@@ -64,7 +71,7 @@ class vmmDeleteDialog(vmmGObjectUI):
 
     def show(self, parent, vm):
         logging.debug("Showing delete wizard")
-        self._set_vm(vm)
+        self._set_vms(isinstance(vm, list) and vm or [vm])
         self.reset_state()
         self.topwin.set_transient_for(parent)
         self.topwin.present()
@@ -72,35 +79,53 @@ class vmmDeleteDialog(vmmGObjectUI):
     def close(self, ignore1=None, ignore2=None):
         logging.debug("Closing delete wizard")
         self.topwin.hide()
-        self._set_vm(None)
+        self._set_vms([])
         return 1
 
     def _cleanup(self):
         pass
 
     def _vm_removed(self, _conn, connkey):
-        if self.vm.get_connkey() == connkey:
+        if self._deleting:
+            # Our own job is removing the VMs, don't rebuild the dialog
+            # for each one. _finish_cb closes it when the job is done
+            return
+        vms = [vm for vm in self._vms if vm.get_connkey() != connkey]
+        if len(vms) == len(self._vms):
+            return
+        if not vms:
             self.close()
+            return
+        self._set_vms(vms)
+        self.reset_state()
 
-    def _set_vm(self, newvm):
+    def _set_vms(self, newvms):
         oldvm = self.vm
         if oldvm:
             oldvm.conn.disconnect_by_obj(self)
-        if newvm:
-            newvm.conn.connect("vm-removed", self._vm_removed)
-        self.vm = newvm
+        if newvms:
+            newvms[0].conn.connect("vm-removed", self._vm_removed)
+        self._vms = newvms
+        self.vm = newvms and newvms[0] or None
+
+    def _is_batch(self):
+        return len(self._vms) > 1
 
     def reset_state(self):
         # Set VM name in title'
-        title_str = ("<span size='large' color='white'>%s '%s'</span>" %
-                     (_("Delete"), util.xml_escape(self.vm.get_name())))
+        if self._is_batch():
+            title = _("Delete %d virtual machines") % len(self._vms)
+        else:
+            title = "%s '%s'" % (_("Delete"), self.vm.get_name())
+        title_str = ("<span size='large' color='white'>%s</span>" %
+                     util.xml_escape(title))
         self.widget("header-label").set_markup(title_str)
 
         self.topwin.resize(1, 1)
         self.widget("delete-cancel").grab_focus()
 
         # Show warning message if VM is running
-        vm_active = self.vm.is_active()
+        vm_active = any([vm.is_active() for vm in self._vms])
         uiutil.set_grid_row_visible(
             self.widget("delete-warn-running-vm-box"), vm_active)
 
@@ -109,7 +134,7 @@ class vmmDeleteDialog(vmmGObjectUI):
         self.widget("delete-remove-storage").toggled()
 
         populate_storage_list(self.widget("delete-storage-list"),
-                              self.vm, self.vm.conn)
+                              self._vms, self.vm.conn)
 
     def toggle_remove_storage(self, src):
         dodel = src.get_active()
@@ -129,6 +154,7 @@ class vmmDeleteDialog(vmmGObjectUI):
         return paths
 
     def _finish_cb(self, error, details):
+        self._deleting = False
         self.reset_finish_cursor()
 
         if error is not None:
@@ -152,16 +178,51 @@ class vmmDeleteDialog(vmmGObjectUI):
 
         self.set_finish_cursor()
 
-        title = _("Deleting virtual machine '%s'") % self.vm.get_name()
+        if self._is_batch():
+            title = (_("Deleting %d virtual machines") % len(self._vms))
+        else:
+            title = _("Deleting virtual machine '%s'") % self.vm.get_name()
         text = title
         if devs:
             text = title + _(" and selected storage (this may take a while)")
 
-        progWin = vmmAsyncJob(self._async_delete, [self.vm, devs],
-                              self._finish_cb, [],
-                              title, text, self.topwin)
+        if self._is_batch():
+            pathmap = get_path_users(self.widget("delete-storage-list"),
+                                     self._vms)
+            progWin = vmmAsyncJob(self._async_delete_batch,
+                                  [self._vms[:], [(path, pathmap[path])
+                                                  for path in devs]],
+                                  self._finish_cb, [],
+                                  title, text, self.topwin)
+        else:
+            progWin = vmmAsyncJob(self._async_delete, [self.vm, devs],
+                                  self._finish_cb, [],
+                                  title, text, self.topwin)
+        self._deleting = True
         progWin.run()
-        self._set_vm(None)
+
+    def _async_delete_batch(self, asyncjob, vms, paths):
+        conn = vms[0].conn
+        backend = conn.get_backend()
+        meter = asyncjob.get_meter()
+
+        def _delete_path(path):
+            self._async_delete_path(backend, path, meter)
+
+        batch = batchdelete.DeleteBatch(vms, paths, _delete_path)
+        errors = batch.run(meter=meter, text=_("Deleting"))
+        conn.schedule_priority_tick(pollvm=True)
+        if not errors:
+            return
+
+        error = (_("Errors encountered while deleting %(count)d virtual "
+                   "machines:\n%(errors)s") %
+                 {"count": len(vms),
+                  "errors": "\n".join(["%s: %s" % (e.target, e.error)
+                                       for e in errors])})
+        details = "\n\n".join(["%s\n%s" % (e.target, e.details or e.error)
+                                for e in errors])
+        asyncjob.set_error(error, details)
 
     def _async_delete(self, asyncjob, vm, paths):
         storage_errors = []
@@ -233,10 +294,7 @@ class vmmDeleteDialog(vmmGObjectUI):
             os.unlink(path)
 
 
-def populate_storage_list(storage_list, vm, conn):
-    model = storage_list.get_model()
-    model.clear()
-
+def _get_vm_diskdata(vm):
     diskdata = [(d.target, d.path, d.read_only, d.shareable,
                  d.device in ["cdrom", "floppy"]) for
                 d in vm.xmlobj.devices.disk]
@@ -244,10 +302,54 @@ def populate_storage_list(storage_list, vm, conn):
     diskdata.append(("kernel", vm.get_xmlobj().os.kernel, True, False, True))
     diskdata.append(("initrd", vm.get_xmlobj().os.initrd, True, False, True))
     diskdata.append(("dtb", vm.get_xmlobj().os.dtb, True, False, True))
+    return [d for d in diskdata if d[1]]
+
+
+def get_path_users(storage_list, vms):
+    """
+    Map each path in the storage list to the VMs in @vms using it
+    """
+    ret = {}
+    for row in storage_list.get_model():
+        ret[row[STORAGE_ROW_PATH]] = []
+    for vm in vms:
+        for diskinfo in _get_vm_diskdata(vm):
+            if diskinfo[1] in ret and vm not in ret[diskinfo[1]]:
+                ret[diskinfo[1]].append(vm)
+    return ret
+
+
+def populate_storage_list(storage_list, vms, conn):
+    model = storage_list.get_model()
+    model.clear()
+
+    # Scan every VM's disks once for the whole batch, rather than once
+    # per path
+    vmnames = [vm.get_name() for vm in vms]
+    try:
+        inuse = virtinst.DeviceDisk.get_paths_in_use_map(conn.get_backend())
+    except Exception as e:
+        logging.exception("Failed checking disk conflict: %s", str(e))
+        inuse = {}
+
+    diskdata = []
+    seen = {}
+    for vm in vms:
+        for target, path, ro, shared, is_media in _get_vm_diskdata(vm):
+            if len(vms) > 1:
+                target = "%s (%s)" % (target, vm.get_name())
+            if path in seen:
+                # Shared between batch VMs, merge the row
+                idx = seen[path]
+                oldtarget, ignore, oldro, oldshared, oldmedia = diskdata[idx]
+                diskdata[idx] = ("%s, %s" % (oldtarget, target), path,
+                                 ro or oldro, shared or oldshared,
+                                 is_media or oldmedia)
+                continue
+            seen[path] = len(diskdata)
+            diskdata.append((target, path, ro, shared, is_media))
 
     for target, path, ro, shared, is_media in diskdata:
-        if not path:
-            continue
 
         # There are a few pieces here
         # 1) Can we even delete the storage? If not, make the checkbox
@@ -265,8 +367,9 @@ def populate_storage_list(storage_list, vm, conn):
         can_del, delinfo = can_delete(conn, vol, path)
 
         if can_del:
-            default, definfo = do_we_default(conn, vm.get_name(), vol,
-                                             path, ro, shared, is_media)
+            others = batchdelete.get_other_users(inuse, path, vmnames)
+            default, definfo = do_we_default(vol, path, ro, shared,
+                                             is_media, others)
 
         info = None
         if not can_del:
@@ -364,8 +467,12 @@ def can_delete(conn, vol, path):
     return (ret, msg)
 
 
-def do_we_default(conn, vm_name, vol, path, ro, shared, is_media):
-    """ Returns (do we delete by default?, info string if not)"""
+def do_we_default(vol, path, ro, shared, is_media, other_users):
+    """
+    Returns (do we delete by default?, info string if not)
+
+    :param other_users: Names of VMs outside the deletion using @path
+    """
     info = ""
 
     def append_str(str1, str2, delim="\n"):
@@ -387,17 +494,11 @@ def do_we_default(conn, vm_name, vol, path, ro, shared, is_media):
     if not info and is_media:
         info = append_str(info, _("Storage is a media device."))
 
-    try:
-        names = virtinst.DeviceDisk.path_in_use_by(conn.get_backend(), path)
-
-        if len(names) > 1:
-            namestr = ""
-            names.remove(vm_name)
-            for name in names:
-                namestr = append_str(namestr, name, delim="\n- ")
-            info = append_str(info, _("Storage is in use by the following "
-                                      "virtual machines:\n- %s " % namestr))
-    except Exception as e:
-        logging.exception("Failed checking disk conflict: %s", str(e))
+    if other_users:
+        namestr = ""
+        for name in other_users:
+            namestr = append_str(namestr, name, delim="\n- ")
+        info = append_str(info, _("Storage is in use by the following "
+                                  "virtual machines:\n- %s " % namestr))
 
     return (not info, info)
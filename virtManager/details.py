@@ -17,6 +17,7 @@ from virtinst import util
 
 from . import vmmenu
 from . import uiutil
+from . import screenshots
 from .addhardware import vmmAddHardware
 from .addstorage import vmmAddStorage
 from .baseclass import vmmGObjectUI
@@ -1542,17 +1543,7 @@ class vmmDetails(vmmGObjectUI):
             'tEXt::Generator Version': self.config.get_appversion(),
         }
 
-        ret = image.save_to_bufferv(
-            'png', list(metadata.keys()), list(metadata.values())
-        )
-        # On Fedora 19, ret is (bool, str)
-        # Someday the bindings might be fixed to just return the str, try
-        # and future proof it a bit
-        if isinstance(ret, tuple) and len(ret) >= 2:
-            ret = ret[1]
-        # F24 rawhide, ret[1] is a named tuple with a 'buffer' element...
-        if hasattr(ret, "buffer"):
-            ret = ret.buffer
+        ret = screenshots.pixbuf_to_png(image, metadata)
 
         import datetime
         now = str(datetime.datetime.now()).split(".")[0].replace(" ", "_")
@@ -3139,48 +3130,10 @@ class vmmDetails(vmmGObjectUI):
         hw_list = self.widget("hw-list")
         hw_list_model = hw_list.get_model()
 
-        currentDevices = []
-
-        def dev_cmp(origdev, newdev):
-            if isinstance(origdev, str):
-                return False
-
-            if origdev == newdev:
-                return True
-
-            return origdev.get_xml_id() == newdev.get_xml_id()
-
-        def add_hw_list_option(idx, name, page_id, info, icon_name):
-            hw_list_model.insert(idx, [name, icon_name,
-                                       Gtk.IconSize.LARGE_TOOLBAR,
-                                       page_id, info])
+        newdevs = []
 
         def update_hwlist(hwtype, dev):
-            """
-            See if passed hw is already in list, and if so, update info.
-            If not in list, add it!
-            """
-            label = _label_for_device(dev)
-            icon = _icon_for_device(dev)
-
-            currentDevices.append(dev)
-
-            insertAt = 0
-            for row in hw_list_model:
-                rowdev = row[HW_LIST_COL_DEVICE]
-                if dev_cmp(rowdev, dev):
-                    # Update existing HW info
-                    row[HW_LIST_COL_DEVICE] = dev
-                    row[HW_LIST_COL_LABEL] = label
-                    row[HW_LIST_COL_ICON_NAME] = icon
-                    return
-
-                if row[HW_LIST_COL_TYPE] <= hwtype:
-                    insertAt += 1
-
-            # Add the new HW row
-            add_hw_list_option(insertAt, label, hwtype, dev, icon)
-
+            newdevs.append((hwtype, dev))
 
         consoles = self.vm.xmlobj.devices.console
         serials = self.vm.xmlobj.devices.serial
@@ -3240,17 +3193,52 @@ class vmmDetails(vmmGObjectUI):
         for dev in self.vm.xmlobj.devices.vsock:
             update_hwlist(HW_LIST_TYPE_VSOCK, dev)
 
-        devs = list(range(len(hw_list_model)))
-        devs.reverse()
-        for i in devs:
-            _iter = hw_list_model.iter_nth_child(None, i)
-            olddev = hw_list_model[i][HW_LIST_COL_DEVICE]
+        self._reconcile_hw_list(hw_list_model, newdevs)
+
+    def _reconcile_hw_list(self, hw_list_model, newdevs):
+        """
+        Sync the device rows in the hw list with @newdevs, a list of
+        (hwtype, dev) tuples. Rows are matched up by device XML id, so
+        existing rows are updated in place rather than rebuilt, and
+        the selection is preserved.
+        """
+        # Sorting is stable, so devices keep their XML order within a type
+        newdevs.sort(key=lambda t: t[0])
+        newkeys = set(dev.get_xml_id() for ignore, dev in newdevs)
+
+        staticcount = 0
+        oldrows = {}
+        for row in list(hw_list_model):
+            olddev = row[HW_LIST_COL_DEVICE]
+            if isinstance(olddev, str):
+                staticcount += 1
+                continue
+
+            key = olddev.get_xml_id()
+            if key in newkeys and key not in oldrows:
+                oldrows[key] = row.iter
+            else:
+                hw_list_model.remove(row.iter)
+
+        for idx, (hwtype, dev) in enumerate(newdevs):
+            pos = staticcount + idx
+            label = _label_for_device(dev)
+            icon = _icon_for_device(dev)
 
-            # Existing device, don't remove it
-            if isinstance(olddev, str) or olddev in currentDevices:
+            _iter = oldrows.get(dev.get_xml_id())
+            if _iter is None:
+                hw_list_model.insert(pos, [label, icon,
+                                           Gtk.IconSize.LARGE_TOOLBAR,
+                                           hwtype, dev])
                 continue
 
-            hw_list_model.remove(_iter)
+            hw_list_model.set(_iter,
+                              [HW_LIST_COL_LABEL, HW_LIST_COL_ICON_NAME,
+                               HW_LIST_COL_TYPE, HW_LIST_COL_DEVICE],
+                              [label, icon, hwtype, dev])
+            if hw_list_model.get_path(_iter)[0] != pos:
+                hw_list_model.move_before(_iter,
+                        hw_list_model.iter_nth_child(None, pos))
 
     def _make_boot_rows(self):
         if not self.vm.can_use_device_boot_order():
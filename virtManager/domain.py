@@ -84,11 +84,19 @@ class vmmInspectionData(object):
 class vmmDomainSnapshot(vmmLibvirtObject):
     """
     Class wrapping a virDomainSnapshot object
+
+    The XML is only fetched when something needs it, see is_xml_loaded.
+    Until then the state, external and current values come from the
+    summary set by vmmDomain.load_snapshot_summary, if available.
     """
     def __init__(self, conn, backend):
         vmmLibvirtObject.__init__(self, conn, backend, backend.getName(),
                                   DomainSnapshot)
 
+        self._summary_state = None
+        self._summary_external = None
+        self._summary_current = None
+
 
     ##########################
     # Required class methods #
@@ -121,19 +129,48 @@ class vmmDomainSnapshot(vmmLibvirtObject):
         ignore = force
         self._backend.delete()
 
+    def is_xml_loaded(self):
+        return self._xmlobj is not None
+
+    def set_summary(self, state, external, current):
+        """
+        Set values from a cheap listing, used until the XML is loaded.
+        None means unknown.
+        """
+        self._summary_state = state
+        self._summary_external = external
+        self._summary_current = current
+
+    def get_description(self):
+        """
+        The description, or None if the XML isn't loaded yet
+        """
+        if not self.is_xml_loaded():
+            return None
+        return self.get_xmlobj().description
+
+    def _get_state(self):
+        if self._summary_state and not self.is_xml_loaded():
+            return self._summary_state
+        return self.get_xmlobj().state
+
     def run_status(self):
-        status = DomainSnapshot.state_str_to_int(self.get_xmlobj().state)
+        status = DomainSnapshot.state_str_to_int(self._get_state())
         return LibvirtEnumMap.pretty_run_status(status, False)
     def run_status_icon_name(self):
-        status = DomainSnapshot.state_str_to_int(self.get_xmlobj().state)
+        status = DomainSnapshot.state_str_to_int(self._get_state())
         if status not in LibvirtEnumMap.VM_STATUS_ICONS:
             logging.debug("Unknown status %d, using NOSTATE", status)
             status = libvirt.VIR_DOMAIN_NOSTATE
         return LibvirtEnumMap.VM_STATUS_ICONS[status]
 
     def is_current(self):
+        if self._summary_current is not None:
+            return self._summary_current
         return self._backend.isCurrent()
     def is_external(self):
+        if self._summary_external is not None and not self.is_xml_loaded():
+            return self._summary_external
         if self.get_xmlobj().memory_type == "external":
             return True
         for disk in self.get_xmlobj().disks:
@@ -152,6 +189,7 @@ class vmmDomain(vmmLibvirtObject):
         "inspection-changed": (vmmLibvirtObject.RUN_FIRST, None, []),
         "pre-startup": (vmmLibvirtObject.RUN_FIRST, None, [object]),
     }
+    _XML_SUMMARY_FIELDS = ["name", "title", "description"]
 
     def __init__(self, conn, backend, key):
         vmmLibvirtObject.__init__(self, conn, backend, key, Guest)
@@ -163,6 +201,7 @@ class vmmDomain(vmmLibvirtObject):
         self._uuid = None
         self._has_managed_save = None
         self._snapshot_list = None
+        self._snapshot_summary_loaded = False
         self._autostart = None
         self._domain_caps = None
         self._status_reason = None
@@ -331,6 +370,36 @@ class vmmDomain(vmmLibvirtObject):
     # Internal XML handling API #
     #############################
 
+    def _build_xml_summary(self, xmlobj):
+        # Also keep what virtinst reads when scanning every VM, like
+        # DeviceDisk.get_paths_in_use_map and Interface.is_conflict_net
+        summary = vmmLibvirtObject._build_xml_summary(self, xmlobj)
+        osobj = xmlobj.os
+        summary["os"] = self._summarize_xml(lambda x: x.os, {
+            "kernel": osobj.kernel,
+            "initrd": osobj.initrd,
+            "dtb": osobj.dtb,
+        })
+
+        disks = []
+        for idx, disk in enumerate(xmlobj.devices.disk):
+            disks.append(self._summarize_xml(
+                lambda x, idx=idx: x.devices.disk[idx], {
+                    "path": disk.path,
+                    "shareable": disk.shareable,
+                    "read_only": disk.read_only,
+                }))
+        nics = []
+        for idx, nic in enumerate(xmlobj.devices.interface):
+            nics.append(self._summarize_xml(
+                lambda x, idx=idx: x.devices.interface[idx],
+                {"macaddr": nic.macaddr}))
+        summary["devices"] = self._summarize_xml(lambda x: x.devices, {
+            "disk": disks,
+            "interface": nics,
+        })
+        return summary
+
     def _invalidate_xml(self):
         vmmLibvirtObject._invalidate_xml(self)
         self._id = None
@@ -1009,6 +1078,47 @@ class vmmDomain(vmmLibvirtObject):
         return self._backend.jobInfo()
     def abort_job(self):
         self._backend.abortJob()
+    def set_migrate_bandwidth(self, bandwidth):
+        self._backend.migrateSetMaxSpeed(bandwidth, 0)
+
+    def start_dirty_rate_calc(self, seconds):
+        """
+        Start measuring the memory dirty rate over @seconds, the result
+        is read with get_dirty_rate. Returns False if it can't be done
+        """
+        if not hasattr(self._backend, "startDirtyRateCalc"):
+            return False
+        try:
+            self._backend.startDirtyRateCalc(seconds, 0)
+        except Exception as e:
+            logging.debug("Error starting dirty rate calc for %s: %s",
+                          self.get_name(), e)
+            return False
+        return True
+
+    def get_dirty_rate(self):
+        """
+        Return the memory dirty rate in MiB/s measured by the last
+        start_dirty_rate_calc, or None if there's no finished measurement
+        """
+        statflag = getattr(libvirt, "VIR_DOMAIN_STATS_DIRTYRATE", None)
+        if not statflag:
+            return None
+        try:
+            ret = self.conn.get_backend().domainListGetStats(
+                [self._backend], statflag)
+        except Exception as e:
+            logging.debug("Error fetching dirty rate for %s: %s",
+                          self.get_name(), e)
+            return None
+        if not ret:
+            return None
+
+        stats = ret[0][1]
+        measured = getattr(libvirt, "VIR_DOMAIN_DIRTYRATE_MEASURED", 2)
+        if stats.get("dirtyrate.calc_status") != measured:
+            return None
+        return stats.get("dirtyrate.megabytes_per_second")
 
     def open_console(self, devname, stream, flags=0):
         return self._backend.openConsole(devname, stream, flags)
@@ -1027,15 +1137,73 @@ class vmmDomain(vmmLibvirtObject):
         return self._backend.openGraphicsFD(0, flags)
 
     def list_snapshots(self):
+        """
+        Return a vmmDomainSnapshot for every snapshot. Only the names
+        are fetched here, the XML is loaded on demand.
+        """
         if self._snapshot_list is None:
             newlist = []
             for rawsnap in self._backend.listAllSnapshots():
-                obj = vmmDomainSnapshot(self.conn, rawsnap)
-                obj.init_libvirt_state()
-                newlist.append(obj)
+                newlist.append(vmmDomainSnapshot(self.conn, rawsnap))
             self._snapshot_list = newlist
+            self._snapshot_summary_loaded = False
         return self._snapshot_list[:]
 
+    def _list_snapshot_names(self, flagname):
+        flag = getattr(libvirt, flagname, None)
+        if flag is None:
+            raise RuntimeError("libvirt doesn't support %s" % flagname)
+        return set([rawsnap.getName() for rawsnap in
+                    self._backend.listAllSnapshots(flag)])
+
+    def load_snapshot_summary(self):
+        """
+        Classify every snapshot with a few filtered list calls, so the
+        snapshot list can be shown without fetching each snapshot's
+        XML. The number of API calls doesn't depend on the number of
+        snapshots.
+        """
+        snaps = self.list_snapshots()
+        if self._snapshot_summary_loaded:
+            return
+
+        states = None
+        try:
+            states = {}
+            for flagname, state in [
+                    ("VIR_DOMAIN_SNAPSHOT_LIST_ACTIVE", "running"),
+                    ("VIR_DOMAIN_SNAPSHOT_LIST_INACTIVE", "shutoff"),
+                    ("VIR_DOMAIN_SNAPSHOT_LIST_DISK_ONLY", "disk-snapshot")]:
+                for name in self._list_snapshot_names(flagname):
+                    states[name] = state
+        except Exception as e:
+            logging.debug("Error listing snapshots by state: %s", e)
+            states = None
+
+        external = None
+        try:
+            external = self._list_snapshot_names(
+                "VIR_DOMAIN_SNAPSHOT_LIST_EXTERNAL")
+        except Exception as e:
+            logging.debug("Error listing external snapshots: %s", e)
+
+        current = None
+        try:
+            current = ""
+            if self._backend.hasCurrentSnapshot(0):
+                current = self._backend.snapshotCurrent(0).getName()
+        except Exception as e:
+            logging.debug("Error looking up current snapshot: %s", e)
+            current = None
+
+        for snap in snaps:
+            name = snap.get_name()
+            snap.set_summary(
+                states.get(name) if states is not None else None,
+                (name in external) if external is not None else None,
+                (name == current) if current is not None else None)
+        self._snapshot_summary_loaded = True
+
     @vmmLibvirtObject.lifecycle_action
     def revert_to_snapshot(self, snap):
         self._backend.revertToSnapshot(snap.get_backend())
@@ -1176,9 +1344,9 @@ class vmmDomain(vmmLibvirtObject):
         return self.get_name()
 
     def get_title(self):
-        return self.get_xmlobj().title
+        return self._get_xml_field("title")
     def get_description(self):
-        return self.get_xmlobj().description
+        return self._get_xml_field("description")
 
     def get_memory(self):
         return int(self.get_xmlobj().memory)
@@ -1346,7 +1514,8 @@ class vmmDomain(vmmLibvirtObject):
 
 
     def migrate(self, destconn, dest_uri=None,
-            tunnel=False, unsafe=False, temporary=False, meter=None):
+            tunnel=False, unsafe=False, temporary=False, meter=None,
+            bandwidth=None):
         self._install_abort = True
 
         flags = 0
@@ -1365,8 +1534,8 @@ class vmmDomain(vmmLibvirtObject):
 
         libvirt_destconn = destconn.get_backend().get_conn_for_api_arg()
         logging.debug("Migrating: conn=%s flags=%s uri=%s tunnel=%s "
-            "unsafe=%s temporary=%s",
-            destconn, flags, dest_uri, tunnel, unsafe, temporary)
+            "unsafe=%s temporary=%s bandwidth=%s",
+            destconn, flags, dest_uri, tunnel, unsafe, temporary, bandwidth)
 
         if meter:
             start_job_progress_thread(self, meter, _("Migrating domain"))
@@ -1374,6 +1543,8 @@ class vmmDomain(vmmLibvirtObject):
         params = {}
         if dest_uri and not tunnel:
             params[libvirt.VIR_MIGRATE_PARAM_URI] = dest_uri
+        if bandwidth:
+            params[libvirt.VIR_MIGRATE_PARAM_BANDWIDTH] = bandwidth
 
         if tunnel:
             self._backend.migrateToURI3(dest_uri, params, flags)
@@ -1514,6 +1685,11 @@ class vmmDomain(vmmLibvirtObject):
             return self.config.get_console_resizeguest()
         return ret
 
+    def get_serial_log(self):
+        return self.config.get_pervm(self.get_uuid(), "/serial-log")
+    def set_serial_log(self, value):
+        self.config.set_pervm(self.get_uuid(), "/serial-log", value)
+
     def set_details_window_size(self, w, h):
         self.config.set_pervm(self.get_uuid(), "/vm-window-size", (w, h))
     def get_details_window_size(self):
@@ -14,6 +14,7 @@ from gi.repository import Gio
 from gi.repository import GLib
 from gi.repository import Gtk
 
+from . import connectauth
 from .baseclass import vmmGObject
 from .connect import vmmConnect
 from .connmanager import vmmConnectionManager
@@ -23,6 +24,15 @@ from .systray import vmmSystray
 (PRIO_HIGH,
  PRIO_LOW) = range(1, 3)
 
+# Max autostart connections opened at once
+_AUTOSTART_MAX_PARALLEL = 8
+# How long autostart waits on a non-interactive connection before
+# moving on to the next one
+_AUTOSTART_TIMEOUT = 30
+# Same for a connection that might be prompting the user, which is
+# more patient but still won't hold up the others forever
+_AUTOSTART_INTERACTIVE_TIMEOUT = 180
+
 
 def _show_startup_error(fn):
     """
@@ -228,48 +238,80 @@ class vmmEngine(vmmGObject):
             conn.open()
         self.idle_add(idle_connect)
 
-    def _autostart_conns(self):
+    def _autostart_open(self, uri, slots, authlock):
         """
-        We serialize conn autostart, so polkit/ssh-askpass doesn't spam
+        Open one autostart connection. Connections that might prompt the
+        user are opened one at a time through @authlock, everything else
+        runs in parallel, limited by @slots.
         """
-        if self._exiting:
+        conn = self._connobjs.get(uri)
+        if not conn or self._exiting:
             return
 
-        connections_queue = queue.Queue()
-        auto_conns = [conn.get_uri() for conn in self._connobjs.values() if
-                      conn.get_autoconnect()]
-
-        def add_next_to_queue():
-            if not auto_conns:
-                connections_queue.put(None)
-            else:
-                connections_queue.put(auto_conns.pop(0))
+        with slots:
+            interactive = connectauth.might_need_interactive_auth(conn)
 
-        def conn_open_completed(_conn, ConnectError):
+        done = threading.Event()
+        handles = []
+        def _open_completed(_conn, ConnectError):
             # Explicitly ignore connection errors, we've done that
             # for a while and it can be noisy
             if ConnectError is not None:
                 logging.debug("Autostart connection error: %s",
                               ConnectError.details)
-            add_next_to_queue()
-
-        def handle_queue():
-            while True:
-                uri = connections_queue.get()
-                if uri is None:
-                    return
-                if self._exiting:
-                    return
-                if uri not in self._connobjs:
-                    add_next_to_queue()
-                    continue
-
-                conn = self._connobjs[uri]
-                conn.connect_once("open-completed", conn_open_completed)
-                self.idle_add(conn.open)
-
-        add_next_to_queue()
-        self._start_thread(handle_queue, "Conn autostart thread")
+            done.set()
+
+        def _start_open():
+            # conn.open() is a no-op without 'open-completed' if the
+            # conn isn't disconnected, like when the user already opened
+            # it. This runs in the main loop, so the state can't change
+            # between the check and the open()
+            if self._exiting or not conn.is_disconnected():
+                logging.debug("Autostart conn=%s is already open or "
+                              "connecting, skipping", uri)
+                done.set()
+                return
+            handles.append(
+                conn.connect_once("open-completed", _open_completed))
+            conn.open()
+
+        def _stop_waiting():
+            if handles and not done.is_set():
+                conn.disconnect(handles[0])
+
+        with (interactive and authlock or slots):
+            if self._exiting:
+                return
+            logging.debug("Autostarting conn=%s interactive=%s",
+                          uri, interactive)
+            self.idle_add(_start_open)
+
+            # Give the user time to type a password
+            timeout = _AUTOSTART_TIMEOUT
+            if interactive:
+                timeout = _AUTOSTART_INTERACTIVE_TIMEOUT
+            if not done.wait(timeout):
+                logging.debug("Autostart conn=%s still connecting after "
+                              "%s seconds, not waiting for it", uri, timeout)
+                self.idle_add(_stop_waiting)
+
+    def _autostart_conns(self):
+        """
+        Open autoconnect URIs in parallel, but serialize the ones that
+        might need interactive auth, so polkit/ssh-askpass doesn't spam
+        """
+        if self._exiting:
+            return
+
+        auto_conns = [conn.get_uri() for conn in self._connobjs.values() if
+                      conn.get_autoconnect()]
+        slots = threading.BoundedSemaphore(_AUTOSTART_MAX_PARALLEL)
+        authlock = threading.Lock()
+
+        for uri in auto_conns:
+            self._start_thread(self._autostart_open,
+                               "Conn autostart %s" % uri,
+                               args=(uri, slots, authlock))
 
 
     ############################
@@ -0,0 +1,118 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+"""
+Toolkit independent batching of bursty libvirt object events, so a
+storm of events turns into one refresh per affected object.
+"""
+
+import logging
+import threading
+
+
+# How long to collect events before handling them, in seconds. The
+# window starts with the first event and isn't extended by later ones,
+# so a steady stream of events is still handled every EVENT_WINDOW
+EVENT_WINDOW = .2
+
+# Refresh the object's status and XML
+ACTION_RECACHE = "recache"
+# Refresh a storage pool's volume list
+ACTION_REFRESH = "refresh"
+# Poll the object list, the object may have been added or removed
+ACTION_POLL = "poll"
+# The object is gone
+ACTION_REMOVE = "remove"
+
+
+def _threading_timer(delay, func):
+    t = threading.Timer(delay, func)
+    t.daemon = True
+    t.start()
+    return t
+
+
+class EventCoalescer(object):
+    """
+    Collect (objtype, name, action) events for a short window, then
+    pass them to @flush_cb as {objtype: {name: set(actions)}}, with
+    duplicates collapsed. flush_cb is called from the timer thread.
+
+    Counters of events received and work performed are kept for
+    debugging, the flush_cb owner reports its work with count_work.
+
+    :param schedule_cb: Called as schedule_cb(delay, func) to run func
+        after delay seconds, returning an object with a cancel() method.
+        Defaults to a threading.Timer
+    """
+    def __init__(self, flush_cb, window=EVENT_WINDOW, schedule_cb=None):
+        self._flush_cb = flush_cb
+        self._window = window
+        self._schedule_cb = schedule_cb or _threading_timer
+
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+
+        self._received = {}
+        self._work = {}
+        self._batches = 0
+
+    def add(self, objtype, name, action):
+        """
+        Record an event, starting a new window if none is pending
+        """
+        with self._lock:
+            self._received[objtype] = self._received.get(objtype, 0) + 1
+            actions = self._pending.setdefault(
+                objtype, {}).setdefault(name, set())
+            actions.add(action)
+            if self._timer is None:
+                self._timer = self._schedule_cb(self._window, self.flush)
+
+    def flush(self):
+        """
+        Hand off every pending event now
+        """
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._timer = None
+            if pending:
+                self._batches += 1
+        if not pending:
+            return
+
+        logging.debug("Handling coalesced events: %s", ", ".join(
+            ["%s=%d" % (objtype, len(objects)) for objtype, objects in
+             sorted(pending.items())]))
+        self._flush_cb(pending)
+
+    def cancel(self):
+        """
+        Drop any pending events
+        """
+        with self._lock:
+            timer = self._timer
+            self._pending = {}
+            self._timer = None
+        if timer:
+            timer.cancel()
+
+    def count_work(self, kind, count=1):
+        with self._lock:
+            self._work[kind] = self._work.get(kind, 0) + count
+
+    def get_stats(self):
+        """
+        Return a dict of events received per object type, work
+        performed per kind, and the number of batches handled
+        """
+        with self._lock:
+            return {
+                "received": self._received.copy(),
+                "work": self._work.copy(),
+                "batches": self._batches,
+            }
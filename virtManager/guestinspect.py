@@ -0,0 +1,289 @@
+# Copyright (C) 2011, 2013, 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+"""
+Toolkit independent pieces of the libguestfs inspection service: the
+job queue, the on disk result cache, and the inspection itself.
+"""
+
+import base64
+import heapq
+import itertools
+import json
+import logging
+import os
+import stat
+import tempfile
+import threading
+
+from virtinst import util
+
+
+# Bump this if the format of the cache files changes
+_CACHE_VERSION = 1
+
+DATA_FIELDS = ["os_type", "distro", "major_version", "minor_version",
+               "hostname", "product_name", "product_variant", "icon",
+               "applications", "errorstr"]
+
+
+def get_disk_stamp(paths):
+    """
+    Return a JSON friendly list of (path, size, mtime) for the passed
+    disk image paths, or None if any of them is not a regular file we
+    can stat, in which case changes can't be detected and results
+    shouldn't be cached.
+    """
+    ret = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(st.st_mode):
+            return None
+        ret.append([path, st.st_size, st.st_mtime_ns])
+    return ret
+
+
+class InspectionCache(object):
+    """
+    On disk cache of inspection results, one file per VM UUID. Each entry
+    records the disk stamp it was generated from, and is only used if the
+    VM's disk images haven't changed since.
+
+    :param path: Optional path to the cache directory
+    """
+    def __init__(self, path=None):
+        self._dir = path or os.path.join(util.get_cache_dir(), "inspection")
+
+    def _path(self, uuid):
+        return os.path.join(self._dir, uuid + ".json")
+
+    def get(self, uuid, stamp):
+        """
+        Return the cached data dict for @uuid, or None
+        """
+        path = self._path(uuid)
+        if stamp is None or not os.path.exists(path):
+            return None
+
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except Exception as e:
+            logging.debug("Error reading inspection cache %s: %s", path, e)
+            return None
+
+        if (entry.get("version") != _CACHE_VERSION or
+            entry.get("stamp") != stamp):
+            return None
+
+        data = entry["data"]
+        if data.get("icon") is not None:
+            data["icon"] = base64.b64decode(data["icon"])
+        return data
+
+    def set(self, uuid, stamp, data):
+        """
+        Store the data dict for @uuid. Errors are never cached, since
+        they are usually transient.
+        """
+        if stamp is None or data.get("errorstr"):
+            self.remove(uuid)
+            return
+
+        data = data.copy()
+        if data.get("icon") is not None:
+            data["icon"] = base64.b64encode(data["icon"]).decode("ascii")
+        entry = {"version": _CACHE_VERSION, "stamp": stamp, "data": data}
+
+        try:
+            if not os.path.exists(self._dir):
+                os.makedirs(self._dir, 0o700)
+            fd, tmppath = tempfile.mkstemp(dir=self._dir, prefix=".inspect")
+            with os.fdopen(fd, "w") as f:
+                json.dump(entry, f)
+            os.rename(tmppath, self._path(uuid))
+        except Exception as e:
+            logging.debug("Error writing inspection cache for %s: %s",
+                    uuid, e)
+
+    def remove(self, uuid):
+        try:
+            os.unlink(self._path(uuid))
+        except OSError:
+            pass
+
+
+class InspectionQueue(object):
+    """
+    Thread safe priority queue of jobs, lowest priority value first.
+    Every job has a key: queueing a key that is already pending replaces
+    the pending item, and keeps the most urgent of the two priorities.
+    """
+    def __init__(self):
+        self._heap = []
+        self._pending = {}
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+
+    def _push(self, key, item, priority):
+        seq = next(self._counter)
+        self._pending[key] = (priority, seq, item)
+        heapq.heappush(self._heap, (priority, seq, key))
+        self._cond.notify()
+
+    def put(self, key, item, priority):
+        with self._cond:
+            cur = self._pending.get(key)
+            if cur is not None:
+                priority = min(priority, cur[0])
+            self._push(key, item, priority)
+
+    def prioritize(self, key, priority):
+        """
+        Raise the priority of @key if it is still pending
+        """
+        with self._cond:
+            cur = self._pending.get(key)
+            if cur is not None and priority < cur[0]:
+                self._push(key, cur[2], priority)
+
+    def get(self):
+        """
+        Block until a job is available, and return its item
+        """
+        with self._cond:
+            while True:
+                while not self._heap:
+                    self._cond.wait()
+                ignore, seq, key = heapq.heappop(self._heap)
+                cur = self._pending.get(key)
+                if cur is None or cur[1] != seq:
+                    # Superseded by a later put() or prioritize()
+                    continue
+                del self._pending[key]
+                return cur[2]
+
+    def clear(self):
+        with self._cond:
+            self._heap = []
+            self._pending = {}
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending)
+
+
+def inspection_error(errorstr):
+    return {"errorstr": errorstr}
+
+
+def inspect_domain(backend, prettyvm):
+    """
+    Launch a libguestfs appliance for the virDomain @backend, and return
+    a dict of inspection results with keys from DATA_FIELDS
+    """
+    import guestfs  # pylint: disable=import-error
+
+    g = guestfs.GuestFS(close_on_exit=False)
+    try:
+        g.add_libvirt_dom(backend, readonly=1)
+        g.launch()
+    except Exception as e:
+        logging.debug("%s: Error launching libguestfs appliance: %s",
+                prettyvm, str(e))
+        return inspection_error(
+                _("Error launching libguestfs appliance: %s") % str(e))
+
+    logging.debug("%s: inspection appliance connected", prettyvm)
+
+    # Inspect the operating system.
+    roots = g.inspect_os()
+    if len(roots) == 0:
+        logging.debug("%s: no operating systems found", prettyvm)
+        return inspection_error(_("Inspection found no operating systems."))
+
+    # Arbitrarily pick the first root device.
+    root = roots[0]
+
+    # Inspection results.
+    os_type = g.inspect_get_type(root)  # eg. "linux"
+    distro = g.inspect_get_distro(root)  # eg. "fedora"
+    major_version = g.inspect_get_major_version(root)  # eg. 14
+    minor_version = g.inspect_get_minor_version(root)  # eg. 0
+    hostname = g.inspect_get_hostname(root)  # string
+    product_name = g.inspect_get_product_name(root)  # string
+    product_variant = g.inspect_get_product_variant(root)  # string
+
+    # For inspect_list_applications and inspect_get_icon we
+    # require that the guest filesystems are mounted.  However
+    # don't fail if this is not possible (I'm looking at you,
+    # FreeBSD).
+    filesystems_mounted = False
+    try:
+        # Mount up the disks, like guestfish --ro -i.
+
+        # Sort keys by length, shortest first, so that we end up
+        # mounting the filesystems in the correct order.
+        mps = list(g.inspect_get_mountpoints(root))
+        mps.sort(key=lambda mp_dev: len(mp_dev[0]))
+        for mp_dev in mps:
+            try:
+                g.mount_ro(mp_dev[1], mp_dev[0])
+            except Exception:
+                logging.exception("%s: exception mounting %s on %s "
+                                  "(ignored)",
+                                  prettyvm, mp_dev[1], mp_dev[0])
+
+        filesystems_mounted = True
+    except Exception:
+        logging.exception("%s: exception while mounting disks (ignored)",
+                          prettyvm)
+
+    icon = None
+    apps = None
+    if filesystems_mounted:
+        # string containing PNG data
+        icon = g.inspect_get_icon(root, favicon=0, highquality=1)
+        if icon is None or len(icon) == 0:
+            # no high quality icon, try a low quality one
+            icon = g.inspect_get_icon(root, favicon=0, highquality=0)
+            if icon is None or len(icon) == 0:
+                icon = None
+
+        # Inspection applications.
+        try:
+            apps = g.inspect_list_applications(root)
+        except Exception:
+            logging.exception("%s: exception while listing apps (ignored)",
+                              prettyvm)
+
+    # Force the libguestfs handle to close right now.
+    g.close()
+    del g
+
+    # Log what we found.
+    logging.debug("%s: detected operating system: %s %s %d.%d (%s)",
+                  prettyvm, os_type, distro, major_version, minor_version,
+                  product_name)
+    logging.debug("hostname: %s", hostname)
+    if icon:
+        logging.debug("icon: %d bytes", len(icon))
+    if apps:
+        logging.debug("# apps: %d", len(apps))
+
+    return {
+        "os_type": str(os_type),
+        "distro": str(distro),
+        "major_version": int(major_version),
+        "minor_version": int(minor_version),
+        "hostname": str(hostname),
+        "product_name": str(product_name),
+        "product_variant": str(product_variant),
+        "icon": icon,
+        "applications": list(apps or []),
+    }
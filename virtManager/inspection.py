@@ -3,22 +3,36 @@
 # This work is licensed under the GNU GPLv2 or later.
 # See the COPYING file in the top-level directory.
 
-import functools
 import logging
-import queue
 import threading
 
 from .baseclass import vmmGObject
 from .connmanager import vmmConnectionManager
 from .domain import vmmInspectionData
+from . import guestinspect
 
 
-def _inspection_error(_errstr):
+# Every worker runs its own libguestfs appliance, so keep this small
+_MAX_WORKERS = 2
+
+# Job priorities, lowest goes first
+(_PRIO_CONTROL,
+ _PRIO_REFRESH,
+ _PRIO_VISIBLE,
+ _PRIO_DEFAULT) = range(4)
+
+
+def _data_from_dict(datadict):
     data = vmmInspectionData()
-    data.errorstr = _errstr
+    for field in guestinspect.DATA_FIELDS:
+        setattr(data, field, datadict.get(field))
     return data
 
 
+def _inspection_error(_errstr):
+    return _data_from_dict(guestinspect.inspection_error(_errstr))
+
+
 class vmmInspection(vmmGObject):
     _libguestfs_installed = None
 
@@ -50,11 +64,15 @@ class vmmInspection(vmmGObject):
         vmmGObject.__init__(self)
         self._cleanup_on_app_close()
 
-        self._thread = None
+        self._threads = []
 
-        self._q = queue.Queue()
+        self._q = guestinspect.InspectionQueue()
         self._conns = {}
         self._cached_data = {}
+        self._lock = threading.Lock()
+        self._disk_cache = None
+        if not self.config.test_first_run:
+            self._disk_cache = guestinspect.InspectionCache()
 
         val = self.config.get_libguestfs_inspect_vms()
         logging.debug("libguestfs gsetting enabled=%s", str(val))
@@ -71,17 +89,17 @@ class vmmInspection(vmmGObject):
 
     def _cleanup(self):
         self._stop()
-        self._q = queue.Queue()
+        self._q.clear()
         self._conns = {}
         self._cached_data = {}
 
     def _conn_added(self, _src, conn):
         obj = ("conn_added", conn)
-        self._q.put(obj)
+        self._q.put(object(), obj, _PRIO_CONTROL)
 
     def _conn_removed(self, _src, uri):
         obj = ("conn_removed", uri)
-        self._q.put(obj)
+        self._q.put(object(), obj, _PRIO_CONTROL)
 
     # Called by the main thread whenever a VM is added to vmlist.
     def _vm_added(self, conn, connkey):
@@ -91,25 +109,38 @@ class vmmInspection(vmmGObject):
             return
 
         obj = ("vm_added", conn.get_uri(), connkey)
-        self._q.put(obj)
+        self._q.put(("vm", conn.get_uri(), connkey), obj, _PRIO_DEFAULT)
 
     def vm_refresh(self, vm):
         logging.debug("Refresh requested for vm=%s", vm.get_name())
         obj = ("vm_refresh", vm.conn.get_uri(), vm.get_name(), vm.get_uuid())
-        self._q.put(obj)
+        self._q.put(("vm", vm.conn.get_uri(), vm.get_connkey()),
+                    obj, _PRIO_REFRESH)
+
+    def vms_visible(self, vms):
+        """
+        Move any pending inspection of @vms ahead of the rest of the
+        queue. Called by the manager for the rows that are on screen.
+        """
+        for vm in vms:
+            self._q.prioritize(("vm", vm.conn.get_uri(), vm.get_connkey()),
+                               _PRIO_VISIBLE)
 
     def _start(self):
-        self._thread = threading.Thread(
-                name="inspection thread", target=self._run)
-        self._thread.daemon = True
-        self._thread.start()
+        for idx in range(_MAX_WORKERS):
+            thread = threading.Thread(
+                    name="inspection thread %d" % idx, target=self._run)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
 
     def _stop(self):
-        if self._thread is None:
+        if not self._threads:
             return
 
-        self._q.put(None)
-        self._thread = None
+        for ignore in self._threads:
+            self._q.put(object(), None, -1)
+        self._threads = []
 
     def _run(self):
         # Process everything on the queue.  If the queue is empty when
@@ -120,7 +151,6 @@ class vmmInspection(vmmGObject):
                 logging.debug("libguestfs queue obj=None, exiting thread")
                 return
             self._process_queue_item(obj)
-            self._q.task_done()
 
     def _process_queue_item(self, obj):
         cmd = obj[0]
@@ -137,7 +167,7 @@ class vmmInspection(vmmGObject):
 
         elif cmd == "conn_removed":
             uri = obj[1]
-            self._conns.pop(uri)
+            self._conns.pop(uri, None)
 
         elif cmd == "vm_added" or cmd == "vm_refresh":
             uri = obj[1]
@@ -154,155 +184,71 @@ class vmmInspection(vmmGObject):
             if cmd == "vm_refresh":
                 vmuuid = obj[3]
                 # When refreshing the inspection data of a VM,
-                # all we need is to remove it from the "seen" cache,
+                # all we need is to remove it from the "seen" caches,
                 # as the data itself will be replaced once the new
                 # results are available.
-                self._cached_data.pop(vmuuid, None)
+                with self._lock:
+                    self._cached_data.pop(vmuuid, None)
+                if self._disk_cache:
+                    self._disk_cache.remove(vmuuid)
 
             self._process_vm(conn, vm)
 
+    def _get_disk_stamp(self, vm):
+        paths = [disk.path for disk in vm.xmlobj.devices.disk if disk.path]
+        return guestinspect.get_disk_stamp(paths)
+
     def _process_vm(self, conn, vm):
         # Try processing a single VM, keeping into account whether it was
         # visited already, and whether there are cached data for it.
         def _set_vm_inspection_data(_data):
             vm.inspection = _data
             vm.inspection_data_updated()
-            self._cached_data[vm.get_uuid()] = _data
+            with self._lock:
+                self._cached_data[vm.get_uuid()] = _data
 
         prettyvm = conn.get_uri() + ":" + vm.get_name()
         vmuuid = vm.get_uuid()
-        if vmuuid in self._cached_data:
+        with self._lock:
             data = self._cached_data.get(vmuuid)
+        if data:
             if vm.inspection != data:
                 logging.debug("Found cached data for %s", prettyvm)
                 _set_vm_inspection_data(data)
             return
 
+        stamp = None
+        if self._disk_cache and not conn.is_remote():
+            stamp = self._get_disk_stamp(vm)
+            datadict = self._disk_cache.get(vmuuid, stamp)
+            if datadict:
+                logging.debug("Found on disk cached data for %s", prettyvm)
+                _set_vm_inspection_data(_data_from_dict(datadict))
+                return
+
         try:
-            data = self._inspect_vm(conn, vm)
+            datadict = self._inspect_vm(conn, vm)
+            if datadict is None:
+                return
         except Exception as e:
-            data = _inspection_error(_("Error inspection VM: %s") % str(e))
+            datadict = guestinspect.inspection_error(
+                    _("Error inspection VM: %s") % str(e))
             logging.exception("%s: exception while processing", prettyvm)
 
-        _set_vm_inspection_data(data)
+        if self._disk_cache:
+            self._disk_cache.set(vmuuid, stamp, datadict)
+        _set_vm_inspection_data(_data_from_dict(datadict))
 
     def _inspect_vm(self, conn, vm):
-        if self._thread is None:
-            return
+        if not self._threads:
+            return None
 
         if conn.is_remote():
-            return _inspection_error(
+            return guestinspect.inspection_error(
                     _("Cannot inspect VM on remote connection"))
         if conn.is_test():
-            return _inspection_error("Cannot inspect VM on test connection")
+            return guestinspect.inspection_error(
+                    "Cannot inspect VM on test connection")
 
-        import guestfs  # pylint: disable=import-error
-
-        g = guestfs.GuestFS(close_on_exit=False)
         prettyvm = conn.get_uri() + ":" + vm.get_name()
-        try:
-            g.add_libvirt_dom(vm.get_backend(), readonly=1)
-            g.launch()
-        except Exception as e:
-            logging.debug("%s: Error launching libguestfs appliance: %s",
-                    prettyvm, str(e))
-            return _inspection_error(
-                    _("Error launching libguestfs appliance: %s") % str(e))
-
-        logging.debug("%s: inspection appliance connected", prettyvm)
-
-        # Inspect the operating system.
-        roots = g.inspect_os()
-        if len(roots) == 0:
-            logging.debug("%s: no operating systems found", prettyvm)
-            return _inspection_error(
-                    _("Inspection found no operating systems."))
-
-        # Arbitrarily pick the first root device.
-        root = roots[0]
-
-        # Inspection results.
-        os_type = g.inspect_get_type(root)  # eg. "linux"
-        distro = g.inspect_get_distro(root)  # eg. "fedora"
-        major_version = g.inspect_get_major_version(root)  # eg. 14
-        minor_version = g.inspect_get_minor_version(root)  # eg. 0
-        hostname = g.inspect_get_hostname(root)  # string
-        product_name = g.inspect_get_product_name(root)  # string
-        product_variant = g.inspect_get_product_variant(root)  # string
-
-        # For inspect_list_applications and inspect_get_icon we
-        # require that the guest filesystems are mounted.  However
-        # don't fail if this is not possible (I'm looking at you,
-        # FreeBSD).
-        filesystems_mounted = False
-        try:
-            # Mount up the disks, like guestfish --ro -i.
-
-            # Sort keys by length, shortest first, so that we end up
-            # mounting the filesystems in the correct order.
-            mps = list(g.inspect_get_mountpoints(root))
-            def compare(a, b):
-                if len(a[0]) > len(b[0]):
-                    return 1
-                elif len(a[0]) == len(b[0]):
-                    return 0
-                else:
-                    return -1
-
-            mps.sort(key=functools.cmp_to_key(compare))
-            for mp_dev in mps:
-                try:
-                    g.mount_ro(mp_dev[1], mp_dev[0])
-                except Exception:
-                    logging.exception("%s: exception mounting %s on %s "
-                                      "(ignored)",
-                                      prettyvm, mp_dev[1], mp_dev[0])
-
-            filesystems_mounted = True
-        except Exception:
-            logging.exception("%s: exception while mounting disks (ignored)",
-                              prettyvm)
-
-        icon = None
-        apps = None
-        if filesystems_mounted:
-            # string containing PNG data
-            icon = g.inspect_get_icon(root, favicon=0, highquality=1)
-            if icon is None or len(icon) == 0:
-                # no high quality icon, try a low quality one
-                icon = g.inspect_get_icon(root, favicon=0, highquality=0)
-                if icon is None or len(icon) == 0:
-                    icon = None
-
-            # Inspection applications.
-            try:
-                apps = g.inspect_list_applications(root)
-            except Exception:
-                logging.exception("%s: exception while listing apps (ignored)",
-                                  prettyvm)
-
-        # Force the libguestfs handle to close right now.
-        del g
-
-        # Log what we found.
-        logging.debug("%s: detected operating system: %s %s %d.%d (%s)",
-                      prettyvm, os_type, distro, major_version, minor_version,
-                      product_name)
-        logging.debug("hostname: %s", hostname)
-        if icon:
-            logging.debug("icon: %d bytes", len(icon))
-        if apps:
-            logging.debug("# apps: %d", len(apps))
-
-        data = vmmInspectionData()
-        data.os_type = str(os_type)
-        data.distro = str(distro)
-        data.major_version = int(major_version)
-        data.minor_version = int(minor_version)
-        data.hostname = str(hostname)
-        data.product_name = str(product_name)
-        data.product_variant = str(product_variant)
-        data.icon = icon
-        data.applications = list(apps or [])
-
-        return data
+        return guestinspect.inspect_domain(vm.get_backend(), prettyvm)
@@ -5,10 +5,28 @@
 # See the COPYING file in the top-level directory.
 
 import logging
+import time
 
 from .baseclass import vmmGObject
 
 
+class _XMLSummary(object):
+    """
+    Stand in for a released XML object, holding only the summary
+    values. Reading any other property re-parses the XML and reads
+    it from fallback_cb()
+    """
+    def __init__(self, fallback_cb, values):
+        self._fallback_cb = fallback_cb
+        self.__dict__.update(values)
+
+    def __getattr__(self, attr):
+        # Only called for attributes that aren't in the summary
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        return getattr(self._fallback_cb(), attr)
+
+
 class vmmLibvirtObject(vmmGObject):
     __gsignals__ = {
         "state-changed": (vmmGObject.RUN_FIRST, None, []),
@@ -18,6 +36,10 @@ class vmmLibvirtObject(vmmGObject):
     _STATUS_ACTIVE = 1
     _STATUS_INACTIVE = 2
 
+    # XML properties kept by release_xml(), so common getters don't
+    # need to re-parse the XML. Set by the child classes
+    _XML_SUMMARY_FIELDS = []
+
     def __init__(self, conn, backend, key, parseclass):
         vmmGObject.__init__(self)
         self._conn = conn
@@ -32,6 +54,9 @@ class vmmLibvirtObject(vmmGObject):
         self._xmlobj = None
         self._xmlobj_to_define = None
         self._is_xml_valid = False
+        self._xml_summary = None
+        self._xml_released = False
+        self._xml_last_used = 0
 
         # These should be set by the child classes if necessary
         self._inactive_xml_flags = 0
@@ -158,6 +183,10 @@ class vmmLibvirtObject(vmmGObject):
         return False
     def _get_backend_status(self):
         raise NotImplementedError()
+    def _can_release_xml(self):
+        # Only objects that are refreshed by events are safe to
+        # release, otherwise the tick loop re-parses them anyways
+        return self._using_events()
 
     def _define(self, xml):
         ignore = xml
@@ -305,12 +334,18 @@ class vmmLibvirtObject(vmmGObject):
         origxml = None
         if self._xmlobj:
             origxml = self._xmlobj.get_xml()
+        if self._xml_released:
+            # We are re-parsing after release_xml(), any change since
+            # then already came with its own event
+            nosignal = True
 
         self._invalidate_xml()
         active_xml = self._XMLDesc(self._active_xml_flags)
         self._xmlobj = self._parseclass(self.conn.get_backend(),
             parsexml=active_xml)
         self._is_xml_valid = True
+        self._xml_released = False
+        self._xml_last_used = time.time()
 
         if not nosignal and origxml != active_xml:
             self.idle_emit("state-changed")
@@ -337,6 +372,7 @@ class vmmLibvirtObject(vmmGObject):
             return self._parseclass(self.conn.get_backend(),
                 parsexml=inactive_xml)
 
+        self._xml_last_used = time.time()
         if (self._xmlobj is None or
             (refresh_if_nec and not self._is_xml_valid)):
             self.ensure_latest_xml()
@@ -347,6 +383,67 @@ class vmmLibvirtObject(vmmGObject):
     def xmlobj(self):
         return self.get_xmlobj()
 
+    def is_xml_released(self):
+        return self._xml_released
+
+    def release_xml(self, max_age):
+        """
+        Drop the parsed XML if it hasn't been used for @max_age seconds,
+        keeping only the _XML_SUMMARY_FIELDS values. The XML is fetched
+        and parsed again on the next get_xmlobj() call.
+
+        :returns: True if the XML was released
+        """
+        xmlobj = self._xmlobj
+        if (xmlobj is None or
+            not self._is_xml_valid or
+            not self._can_release_xml() or
+            time.time() - self._xml_last_used < max_age):
+            return False
+
+        self._xml_summary = self._build_xml_summary(xmlobj)
+        self._xml_released = True
+        self._xmlobj = None
+        return True
+
+    def get_xmlobj_for_scan(self):
+        """
+        Like get_xmlobj(refresh_if_nec=False), but if the XML was
+        released return a stand in serving the summary values, so
+        scans over every object like conn.fetch_all_vols() don't
+        re-parse all of them
+        """
+        summary = self._xml_summary
+        if not self._xml_released or summary is None:
+            return self.get_xmlobj(refresh_if_nec=False)
+        return self._summarize_xml(lambda xmlobj: xmlobj, summary)
+
+    def _build_xml_summary(self, xmlobj):
+        """
+        Return the dict of values release_xml() keeps. Subclasses can
+        add values that aren't plain XML properties, see _summarize_xml
+        """
+        return dict((field, getattr(xmlobj, field))
+                    for field in self._XML_SUMMARY_FIELDS)
+
+    def _summarize_xml(self, getter, values):
+        """
+        Return a stand in for getter(xmlobj) holding @values. Anything
+        else is read from getter() on the re-parsed XML
+        """
+        return _XMLSummary(
+            lambda: getter(self.get_xmlobj(refresh_if_nec=False)), values)
+
+    def _get_xml_field(self, field):
+        """
+        Return the XML property @field, without re-parsing the XML if
+        it was released and the value is in the summary
+        """
+        summary = self._xml_summary
+        if self._xml_released and summary and field in summary:
+            return summary[field]
+        return getattr(self.get_xmlobj(), field)
+
 
     #########################
     # Internal XML routines #
@@ -358,6 +455,7 @@ class vmmLibvirtObject(vmmGObject):
         to invalidate any specific caches of their own
         """
         self._name = None
+        self._xml_summary = None
 
         # While for events we do want to clear cached XML values like
         # _name, the XML is never invalid.
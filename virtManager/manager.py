@@ -21,6 +21,8 @@ from .baseclass import vmmGObjectUI
 from .connmanager import vmmConnectionManager
 from .engine import vmmEngine
 from .graphwidgets import CellRendererSparkline
+from .inspection import vmmInspection
+from .screenshots import vmmScreenshotService
 
 # Number of data points for performance graphs
 GRAPH_LEN = 40
@@ -36,7 +38,8 @@ ROW_IS_CONN_CONNECTED,
 ROW_IS_VM,
 ROW_IS_VM_RUNNING,
 ROW_COLOR,
-ROW_INSPECTION_OS_ICON) = range(11)
+ROW_INSPECTION_OS_ICON,
+ROW_THUMBNAIL) = range(12)
 
 # Columns in the tree view
 (COL_NAME,
@@ -114,6 +117,8 @@ class vmmManager(vmmGObjectUI):
             self.toggle_stats_visible_disk,
             "on_menu_view_network_traffic_activate":
             self.toggle_stats_visible_network,
+            "on_menu_view_thumbnail_activate":
+            self.toggle_thumbnail_visible,
 
             "on_vm_manager_delete_event": self.close,
             "on_vmm_manager_configure_event": self.window_resized,
@@ -146,7 +151,10 @@ class vmmManager(vmmGObjectUI):
         self.memcol = None
         self.guestcpucol = None
         self.hostcpucol = None
+        self.thumbcol = None
         self.spacer_txt = None
+        self._visible_vms_queued = False
+        self._thumbnail_vms = []
         self.init_vmlist()
 
         self.init_stats()
@@ -157,6 +165,13 @@ class vmmManager(vmmGObjectUI):
         self.widget("vm-list").get_selection().connect(
             "changed", self.update_current_selection)
 
+        self.widget("vm-list").connect("row-expanded",
+            self._queue_visible_vms_update)
+        self.widget("vm-list").get_vadjustment().connect("value-changed",
+            self._queue_visible_vms_update)
+        vmmScreenshotService.get_instance().connect(
+            "screenshot-updated", self.vm_screenshot_updated)
+
         self.max_disk_rate = 10.0
         self.max_net_rate = 10.0
 
@@ -190,6 +205,7 @@ class vmmManager(vmmGObjectUI):
             self.prev_position = None
 
         vmmEngine.get_instance().increment_window_counter()
+        self._queue_visible_vms_update()
 
     def close(self, src_ignore=None, src2_ignore=None):
         if not self.is_visible():
@@ -198,6 +214,7 @@ class vmmManager(vmmGObjectUI):
         logging.debug("Closing manager")
         self.prev_position = self.topwin.get_position()
         self.topwin.hide()
+        self._set_thumbnail_vms([])
         vmmEngine.get_instance().decrement_window_counter()
 
         return 1
@@ -209,6 +226,9 @@ class vmmManager(vmmGObjectUI):
         self.memcol = None
         self.hostcpucol = None
         self.netcol = None
+        self.thumbcol = None
+        self._thumbnail_vms = []
+        vmmScreenshotService.get_instance().disconnect_by_obj(self)
 
         self.shutdownmenu.destroy()
         self.shutdownmenu = None
@@ -248,6 +268,9 @@ class vmmManager(vmmGObjectUI):
         self.add_gsettings_handle(
             self.config.on_vmlist_network_traffic_visible_changed(
                                 self.toggle_network_traffic_visible_widget))
+        self.add_gsettings_handle(
+            self.config.on_vmlist_thumbnail_visible_changed(
+                                self.toggle_thumbnail_visible_widget))
 
         # Register callbacks with the global stats enable/disable values
         # that disable the associated vmlist widgets if reporting is disabled
@@ -269,6 +292,7 @@ class vmmManager(vmmGObjectUI):
         self.toggle_memory_usage_visible_widget()
         self.toggle_disk_io_visible_widget()
         self.toggle_network_traffic_visible_widget()
+        self.toggle_thumbnail_visible_widget()
 
 
     def init_toolbar(self):
@@ -303,6 +327,9 @@ class vmmManager(vmmGObjectUI):
         add_to_menu("disconnect", Gtk.STOCK_DISCONNECT, None,
                       self.close_conn)
         self.connmenu.add(Gtk.SeparatorMenuItem())
+        add_to_menu("migrate", _("_Migrate All Running VMs..."), None,
+                    self.migrate_conn_vms)
+        self.connmenu.add(Gtk.SeparatorMenuItem())
         add_to_menu("delete", Gtk.STOCK_DELETE, None, self.do_delete)
         self.connmenu.add(Gtk.SeparatorMenuItem())
         add_to_menu("details", _("D_etails"), None, self.show_host)
@@ -324,11 +351,14 @@ class vmmManager(vmmGObjectUI):
         rowtypes.insert(ROW_IS_VM_RUNNING, bool)  # if VM is running
         rowtypes.insert(ROW_COLOR, str)  # row markup color string
         rowtypes.insert(ROW_INSPECTION_OS_ICON, GdkPixbuf.Pixbuf)  # OS icon
+        rowtypes.insert(ROW_THUMBNAIL, GdkPixbuf.Pixbuf)  # console thumbnail
 
         model = Gtk.TreeStore(*rowtypes)
         vmlist.set_model(model)
         vmlist.set_tooltip_column(ROW_HINT)
         vmlist.set_headers_visible(True)
+        # Multiple VMs can be selected for bulk delete
+        vmlist.get_selection().set_mode(Gtk.SelectionMode.MULTIPLE)
         vmlist.set_level_indentation(
                 -(_style_get_prop(vmlist, "expander-size") + 3))
 
@@ -362,6 +392,14 @@ class vmmManager(vmmGObjectUI):
         self.spacer_txt.set_property("visible", False)
         nameCol.pack_end(self.spacer_txt, False)
 
+        self.thumbcol = Gtk.TreeViewColumn(_("Console"))
+        thumbnail = Gtk.CellRendererPixbuf()
+        thumbnail.set_property("ypad", 2)
+        self.thumbcol.pack_start(thumbnail, False)
+        self.thumbcol.add_attribute(thumbnail, 'pixbuf', ROW_THUMBNAIL)
+        self.thumbcol.add_attribute(thumbnail, 'visible', ROW_IS_VM)
+        vmlist.append_column(self.thumbcol)
+
         def make_stats_column(title, colnum):
             col = Gtk.TreeViewColumn(title)
             col.set_min_width(140)
@@ -415,6 +453,15 @@ class vmmManager(vmmGObjectUI):
 
         return row[ROW_HANDLE]
 
+    def current_vms(self):
+        """
+        Return every selected VM
+        """
+        selection = self.widget("vm-list").get_selection()
+        model, paths = selection.get_selected_rows()
+        return [model[path][ROW_HANDLE] for path in paths
+                if not model[path][ROW_IS_CONN]]
+
     def current_conn(self):
         row = self.current_row()
         if not row:
@@ -499,6 +546,11 @@ class vmmManager(vmmGObjectUI):
             self.show_host(_src)
 
     def do_delete(self, ignore=None):
+        vms = self.current_vms()
+        if len(vms) > 1:
+            self._do_delete_vms(vms)
+            return
+
         conn = self.current_conn()
         vm = self.current_vm()
         if vm is None:
@@ -506,6 +558,15 @@ class vmmManager(vmmGObjectUI):
         else:
             vmmenu.VMActionUI.delete(self, vm)
 
+    def _do_delete_vms(self, vms):
+        conns = set([vm.conn for vm in vms])
+        if len(conns) > 1:
+            self.err.val_err(
+                _("Virtual machines from different connections can not "
+                  "be deleted together."))
+            return
+        vmmenu.VMActionUI.delete(self, vms)
+
     def _do_delete_conn(self, conn):
         result = self.err.yes_no(_("This will remove the connection:\n\n%s\n\n"
                                    "Are you sure?") % conn.get_uri())
@@ -550,6 +611,18 @@ class vmmManager(vmmGObjectUI):
             conn.open()
             return True
 
+    def migrate_conn_vms(self, ignore):
+        conn = self.current_conn()
+        vms = [vm for vm in conn.list_vms() if vm.is_active()]
+        if not vms:
+            self.err.show_info(
+                _("No running VMs on connection '%s'.") %
+                conn.get_pretty_desc())
+            return
+
+        from .migrate import vmmMigrateDialog
+        vmmMigrateDialog.show_instance(self, vms)
+
 
     ####################################
     # VM add/remove management methods #
@@ -570,6 +643,7 @@ class vmmManager(vmmGObjectUI):
 
         # Expand a connection when adding a vm to it
         self.widget("vm-list").expand_row(conn_row.path, False)
+        self._queue_visible_vms_update()
 
     def vm_removed(self, conn, connkey):
         parent = self.get_row(conn).iter
@@ -577,6 +651,9 @@ class vmmManager(vmmGObjectUI):
             rowiter = self.model.iter_nth_child(parent, rowidx)
             vm = self.model[rowiter][ROW_HANDLE]
             if vm.get_connkey() == connkey:
+                if vm in self._thumbnail_vms:
+                    self._thumbnail_vms.remove(vm)
+                    vmmScreenshotService.get_instance().unwatch_vm(vm)
                 self.model.remove(rowiter)
                 break
 
@@ -641,6 +718,7 @@ class vmmManager(vmmGObjectUI):
         row.insert(ROW_IS_VM_RUNNING, bool(vm) and vm.is_active())
         row.insert(ROW_COLOR, color)
         row.insert(ROW_INSPECTION_OS_ICON, os_icon)
+        row.insert(ROW_THUMBNAIL, None)
 
         return row
 
@@ -703,6 +781,8 @@ class vmmManager(vmmGObjectUI):
             row[ROW_STATUS_ICON] = vm.run_status_icon_name()
             row[ROW_IS_VM_RUNNING] = vm.is_active()
             row[ROW_MARKUP] = self._build_vm_markup(name, status)
+            if not vm.is_active():
+                row[ROW_THUMBNAIL] = None
 
             desc = vm.get_description()
             row[ROW_HINT] = util.xml_escape(desc)
@@ -713,6 +793,68 @@ class vmmManager(vmmGObjectUI):
 
         self.vm_row_updated(vm)
 
+    def _queue_visible_vms_update(self, *args):
+        ignore = args
+        if self._visible_vms_queued:
+            return
+        self._visible_vms_queued = True
+        self.idle_add(self._update_visible_vms)
+
+    def _get_visible_vms(self):
+        vmlist = self.widget("vm-list")
+        visible = vmlist.get_visible_range()
+        if not visible:
+            return []
+
+        start, end = visible
+        vms = []
+        for connrow in self.model:
+            if not vmlist.row_expanded(connrow.path):
+                continue
+            for row in connrow.iterchildren():
+                if (row.path.compare(start) >= 0 and
+                    row.path.compare(end) <= 0):
+                    vms.append(row[ROW_HANDLE])
+        return vms
+
+    def _update_visible_vms(self):
+        """
+        Have the inspection service handle the VMs whose rows are
+        on screen before any others, and only capture thumbnails for
+        those VMs
+        """
+        self._visible_vms_queued = False
+        if not self.is_visible():
+            return
+
+        vms = self._get_visible_vms()
+        inspection = vmmInspection.get_instance()
+        if inspection and self.config.inspection_supported():
+            inspection.vms_visible(vms)
+
+        if not self.config.is_vmlist_thumbnail_visible():
+            vms = []
+        self._set_thumbnail_vms(vms)
+
+    def _set_thumbnail_vms(self, vms):
+        service = vmmScreenshotService.get_instance()
+        for vm in self._thumbnail_vms:
+            if vm not in vms:
+                service.unwatch_vm(vm)
+        for vm in vms:
+            service.watch_vm(vm)
+        self._thumbnail_vms = vms
+
+    def vm_screenshot_updated(self, _src, vm):
+        row = self.get_row(vm)
+        if row is None:
+            return
+
+        shot = vmmScreenshotService.get_instance().get_screenshot(vm)
+        if not shot or not vm.is_active():
+            return
+        row[ROW_THUMBNAIL] = shot.thumbnail
+
     def vm_inspection_changed(self, vm):
         row = self.get_row(vm)
         if row is None:
@@ -729,6 +871,7 @@ class vmmManager(vmmGObjectUI):
         cli --connect $URI
         """
         sel = self.widget("vm-list").get_selection()
+        sel.unselect_all()
         for row in self.model:
             if not row[ROW_IS_CONN]:
                 continue
@@ -781,7 +924,7 @@ class vmmManager(vmmGObjectUI):
         show_open = bool(vm)
         show_details = bool(vm)
         host_details = bool(vm or conn)
-        can_delete = bool(vm or conn)
+        can_delete = bool(vm or conn or self.current_vms())
 
         show_run = bool(vm and vm.is_runable())
         is_paused = bool(vm and vm.is_paused())
@@ -816,8 +959,10 @@ class vmmManager(vmmGObjectUI):
         if Gdk.keyval_name(event.keyval) != "Menu":
             return False
 
-        model, treeiter = self.widget("vm-list").get_selection().get_selected()
-        self.popup_vm_menu(model, treeiter, event)
+        row = self.current_row()
+        if not row:
+            return False
+        self.popup_vm_menu(self.model, row.iter, event)
         return True
 
     def popup_vm_menu_button(self, vmlist, event):
@@ -848,6 +993,7 @@ class vmmManager(vmmGObjectUI):
             self.connmenu_items["disconnect"].set_sensitive(not (disconn or
                                                                  conning))
             self.connmenu_items["connect"].set_sensitive(disconn)
+            self.connmenu_items["migrate"].set_sensitive(conn.is_active())
             self.connmenu_items["delete"].set_sensitive(disconn)
 
             self.connmenu.popup(None, None, None, None, 0, event.time)
@@ -960,6 +1106,19 @@ class vmmManager(vmmGObjectUI):
             self.config.is_vmlist_host_cpu_usage_visible(), self.hostcpucol,
             self.host_cpu_usage_img, "menu_view_stats_host_cpu")
 
+    def toggle_thumbnail_visible_widget(self):
+        visible = self.config.is_vmlist_thumbnail_visible()
+        self.thumbcol.set_visible(visible)
+        self.widget("menu_view_thumbnail").set_active(visible)
+        if not visible:
+            for connrow in self.model:
+                for row in connrow.iterchildren():
+                    row[ROW_THUMBNAIL] = None
+        self._queue_visible_vms_update()
+
+    def toggle_thumbnail_visible(self, src):
+        self.config.set_vmlist_thumbnail_visible(src.get_active())
+
     def toggle_stats_visible(self, src, stats_id):
         visible = src.get_active()
         set_stats = {
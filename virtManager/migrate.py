@@ -5,6 +5,7 @@
 # See the COPYING file in the top-level directory.
 
 import logging
+import time
 import traceback
 
 from gi.repository import Gdk
@@ -13,6 +14,7 @@ from gi.repository import Pango
 
 from virtinst import util
 
+from . import batchmigrate
 from . import uiutil
 from .asyncjob import vmmAsyncJob
 from .baseclass import vmmGObjectUI
@@ -20,6 +22,11 @@ from .connmanager import vmmConnectionManager
 from .domain import vmmDomain
 
 
+# How long to measure each VM's memory dirty rate for, and how much
+# longer to wait for the results, in seconds
+_DIRTY_RATE_CALC_SECONDS = 1
+_DIRTY_RATE_WAIT = 3
+
 NUM_COLS = 3
 (COL_LABEL,
  COL_URI,
@@ -29,6 +36,10 @@ NUM_COLS = 3
 class vmmMigrateDialog(vmmGObjectUI):
     @classmethod
     def show_instance(cls, parentobj, vm):
+        """
+        :param vm: A vmmDomain, or a list of vmmDomains on the same
+            connection to migrate as a batch
+        """
         try:
             if not cls._instance:
                 cls._instance = vmmMigrateDialog()
@@ -40,6 +51,7 @@ class vmmMigrateDialog(vmmGObjectUI):
     def __init__(self):
         vmmGObjectUI.__init__(self, "migrate.ui", "vmm-migrate")
         self.vm = None
+        self._vms = []
 
         self.builder.connect_signals({
             "on_vmm_migrate_delete_event": self._delete_event,
@@ -59,6 +71,7 @@ class vmmMigrateDialog(vmmGObjectUI):
 
     def _cleanup(self):
         self.vm = None
+        self._vms = []
 
     @property
     def _connobjs(self):
@@ -75,7 +88,7 @@ class vmmMigrateDialog(vmmGObjectUI):
 
     def show(self, parent, vm):
         logging.debug("Showing migrate wizard")
-        self._set_vm(vm)
+        self._set_vms(isinstance(vm, list) and vm or [vm])
         self._reset_state()
         self.topwin.set_transient_for(parent)
         self.topwin.present()
@@ -83,20 +96,31 @@ class vmmMigrateDialog(vmmGObjectUI):
     def close(self, ignore1=None, ignore2=None):
         logging.debug("Closing migrate wizard")
         self.topwin.hide()
-        self._set_vm(None)
+        self._set_vms([])
         return 1
 
     def _vm_removed(self, _conn, connkey):
-        if self.vm.get_connkey() == connkey:
+        vms = [vm for vm in self._vms if vm.get_connkey() != connkey]
+        if len(vms) == len(self._vms):
+            return
+        if not vms:
             self.close()
+            return
+        self._vms = vms
+        self.vm = vms[0]
+        self._set_name_label()
 
-    def _set_vm(self, newvm):
+    def _set_vms(self, newvms):
         oldvm = self.vm
         if oldvm:
             oldvm.conn.disconnect_by_obj(self)
-        if newvm:
-            newvm.conn.connect("vm-removed", self._vm_removed)
-        self.vm = newvm
+        if newvms:
+            newvms[0].conn.connect("vm-removed", self._vm_removed)
+        self._vms = newvms
+        self.vm = newvms and newvms[0] or None
+
+    def _is_batch(self):
+        return len(self._vms) > 1
 
 
     ################
@@ -143,6 +167,16 @@ class vmmMigrateDialog(vmmGObjectUI):
         combo.set_model(model)
         uiutil.init_combo_text_column(combo, 0)
 
+        # Batch order combo
+        combo = self.widget("migrate-order")
+        # label, order
+        model = Gtk.ListStore(str, str)
+        model.append([_("Smallest memory first"), batchmigrate.ORDER_MEMORY])
+        model.append([_("Lowest dirty rate first"),
+                      batchmigrate.ORDER_DIRTY_RATE])
+        combo.set_model(model)
+        uiutil.init_combo_text_column(combo, 0)
+
         self.widget("migrate-dest").emit("changed")
 
         self.widget("migrate-mode").set_tooltip_text(
@@ -151,10 +185,24 @@ class vmmMigrateDialog(vmmGObjectUI):
             self.widget("migrate-unsafe-label").get_tooltip_text())
         self.widget("migrate-temporary").set_tooltip_text(
             self.widget("migrate-temporary-label").get_tooltip_text())
+        self.widget("migrate-bandwidth").set_tooltip_text(
+            self.widget("migrate-bandwidth-label").get_tooltip_text())
+        self.widget("migrate-parallel").set_tooltip_text(
+            self.widget("migrate-parallel-label").get_tooltip_text())
+        self.widget("migrate-order").set_tooltip_text(
+            self.widget("migrate-order-label").get_tooltip_text())
+
+    def _set_name_label(self):
+        names = [vm.get_name_or_title() for vm in self._vms]
+        self.widget("migrate-label-name").set_text(", ".join(names))
 
     def _reset_state(self):
-        title_str = ("<span size='large' color='white'>%s '%s'</span>" %
-                     (_("Migrate"), util.xml_escape(self.vm.get_name())))
+        if self._is_batch():
+            title = _("Migrate %d VMs") % len(self._vms)
+        else:
+            title = "%s '%s'" % (_("Migrate"), self.vm.get_name())
+        title_str = ("<span size='large' color='white'>%s</span>" %
+                     util.xml_escape(title))
         self.widget("header-label").set_markup(title_str)
 
         self.widget("migrate-advanced-expander").set_expanded(False)
@@ -165,7 +213,7 @@ class vmmMigrateDialog(vmmGObjectUI):
 
         hostname = self.conn.libvirt_gethostname()
         srctext = "%s (%s)" % (hostname, self.conn.get_pretty_desc())
-        self.widget("migrate-label-name").set_text(self.vm.get_name_or_title())
+        self._set_name_label()
         self.widget("migrate-label-src").set_text(srctext)
         self.widget("migrate-label-src").set_tooltip_text(self.conn.get_uri())
 
@@ -176,6 +224,11 @@ class vmmMigrateDialog(vmmGObjectUI):
         self.widget("migrate-mode").set_active(0)
         self.widget("migrate-unsafe").set_active(False)
         self.widget("migrate-temporary").set_active(False)
+        self.widget("migrate-bandwidth").set_value(0)
+        self.widget("migrate-parallel").set_value(2)
+        self.widget("migrate-order").set_active(0)
+        for name in ["migrate-parallel", "migrate-order"]:
+            uiutil.set_grid_row_visible(self.widget(name), self._is_batch())
 
         if self.conn.is_xen():
             # Default xen port is 8002
@@ -360,8 +413,15 @@ class vmmMigrateDialog(vmmGObjectUI):
     def _finish_cb(self, error, details, destconn):
         self.reset_finish_cursor()
 
+        if error and self._is_batch():
+            # Some of the batch may have moved, so refresh both sides
+            destconn.schedule_priority_tick(pollvm=True)
+            self.conn.schedule_priority_tick(pollvm=True)
+
         if error:
-            error = _("Unable to migrate guest: %s") % error
+            if not self._is_batch():
+                # The batch error already says what failed
+                error = _("Unable to migrate guest: %s") % error
             self.err.show_err(error, details=details)
         else:
             destconn.schedule_priority_tick(pollvm=True)
@@ -377,6 +437,10 @@ class vmmMigrateDialog(vmmGObjectUI):
             tunnel = self._is_tunnel_selected()
             unsafe = self.widget("migrate-unsafe").get_active()
             temporary = self.widget("migrate-temporary").get_active()
+            bandwidth = int(self.widget("migrate-bandwidth").get_value())
+            parallel = int(self.widget("migrate-parallel").get_value())
+            order = uiutil.get_list_selection(
+                self.widget("migrate-order"), column=1)
 
             if tunnel:
                 uri = self.widget("migrate-tunnel-uri").get_text()
@@ -391,16 +455,21 @@ class vmmMigrateDialog(vmmGObjectUI):
 
         self.set_finish_cursor()
 
+        if uri:
+            destlabel += " " + uri
+
+        if self._is_batch():
+            self._finish_batch(destconn, destlabel, uri, tunnel, unsafe,
+                               temporary, bandwidth, parallel, order)
+            return
+
         cancel_cb = None
         if self.vm.getjobinfo_supported:
             cancel_cb = (self._cancel_migration, self.vm)
 
-        if uri:
-            destlabel += " " + uri
-
         progWin = vmmAsyncJob(
             self._async_migrate,
-            [self.vm, destconn, uri, tunnel, unsafe, temporary],
+            [self.vm, destconn, uri, tunnel, unsafe, temporary, bandwidth],
             self._finish_cb, [destconn],
             _("Migrating VM '%s'") % self.vm.get_name(),
             (_("Migrating VM '%s' to %s. This may take a while.") %
@@ -423,8 +492,8 @@ class vmmMigrateDialog(vmmGObjectUI):
         asyncjob.job_canceled = True
         return
 
-    def _async_migrate(self, asyncjob,
-            origvm, origdconn, migrate_uri, tunnel, unsafe, temporary):
+    def _async_migrate(self, asyncjob, origvm, origdconn, migrate_uri,
+            tunnel, unsafe, temporary, bandwidth):
         meter = asyncjob.get_meter()
 
         srcconn = origvm.conn
@@ -437,4 +506,100 @@ class vmmMigrateDialog(vmmGObjectUI):
                       srcconn.get_uri(), dstconn.get_uri())
 
         vm.migrate(dstconn, migrate_uri, tunnel, unsafe, temporary,
-            meter=meter)
+            meter=meter, bandwidth=bandwidth)
+
+
+    ##########################
+    # batch migrate handling #
+    ##########################
+
+    def _finish_batch(self, destconn, destlabel, uri, tunnel, unsafe,
+                      temporary, bandwidth, parallel, order):
+        # The batch is created in the job thread, the cancel callback
+        # finds it here
+        batchholder = []
+        names = [vm.get_name() for vm in self._vms]
+
+        progWin = vmmAsyncJob(
+            self._async_batch_migrate,
+            [batchholder, names, destconn, uri, tunnel, unsafe, temporary,
+             bandwidth, parallel, order],
+            self._finish_cb, [destconn],
+            _("Migrating %d VMs") % len(names),
+            (_("Migrating %(count)d VMs to %(dest)s. "
+               "This may take a while.") %
+             {"count": len(names), "dest": destlabel}),
+            self.topwin, cancel_cb=(self._cancel_batch_migration,
+                                    batchholder))
+        progWin.run()
+
+    def _cancel_batch_migration(self, asyncjob, batchholder):
+        logging.debug("Cancelling batch migrate job")
+        if not batchholder:
+            return
+        batchholder[0].cancel()
+        asyncjob.job_canceled = True
+
+    def _measure_dirty_rates(self, jobs):
+        """
+        libvirt only reports a dirty rate after a measurement was asked
+        for, so start one for every VM and wait for the results. VMs we
+        can't measure keep dirty_rate=None and are migrated last
+        """
+        pending = [job for job in jobs if
+                   job.vm.start_dirty_rate_calc(_DIRTY_RATE_CALC_SECONDS)]
+        if not pending:
+            return
+
+        time.sleep(_DIRTY_RATE_CALC_SECONDS)
+        deadline = time.time() + _DIRTY_RATE_WAIT
+        while pending:
+            for job in pending[:]:
+                job.dirty_rate = job.vm.get_dirty_rate()
+                if job.dirty_rate is not None:
+                    pending.remove(job)
+            if not pending or time.time() > deadline:
+                break
+            time.sleep(.2)
+
+        logging.debug("Measured dirty rates: %s",
+                      dict((job.name, job.dirty_rate) for job in jobs))
+
+    def _async_batch_migrate(self, asyncjob, batchholder, names, dstconn,
+            migrate_uri, tunnel, unsafe, temporary, bandwidth, parallel,
+            order):
+        meter = asyncjob.get_meter()
+        srcconn = self.conn
+
+        jobs = []
+        for name in names:
+            vminst = srcconn.get_backend().lookupByName(name)
+            vm = vmmDomain(srcconn, vminst, vminst.UUID())
+            jobs.append(batchmigrate.MigrationJob(
+                vm, name, vm.get_memory() * 1024))
+        if order == batchmigrate.ORDER_DIRTY_RATE:
+            self._measure_dirty_rates(jobs)
+
+        logging.debug("Batch migrating vms=%s from %s to %s parallel=%s "
+                      "bandwidth=%s order=%s", names, srcconn.get_uri(),
+                      dstconn.get_uri(), parallel, bandwidth, order)
+
+        backend = batchmigrate.LibvirtMigrateBackend(
+            dstconn, migrate_uri, tunnel, unsafe, temporary)
+        batch = batchmigrate.MigrationBatch(backend, jobs,
+            parallel=parallel, bandwidth=bandwidth, order=order)
+        batchholder.append(batch)
+        batch.run(meter=meter, text=_("Migrating"))
+
+        if asyncjob.job_canceled:
+            return
+        failed = [job for job in batch.jobs
+                  if job.state == job.STATE_FAILED]
+        if failed:
+            error = "\n".join(["%s: %s" % (job.name, job.error)
+                               for job in failed])
+            details = "\n\n".join([job.details for job in failed])
+            asyncjob.set_error(
+                _("%(failed)d of %(total)d VMs failed to migrate:\n%(err)s") %
+                {"failed": len(failed), "total": len(batch.jobs),
+                 "err": error}, details)
@@ -7,9 +7,19 @@
 # This module provides a simple way to trace any activity on a specific
 # python class or module. The trace output is logged using the regular
 # logging infrastructure. Invoke this with virt-manager --trace-libvirt
+#
+# It can also profile the wrapped calls, collecting per API call counts,
+# latency histograms, stream bytes and caller sites, which are written
+# out as JSON. Invoke this with virt-manager --profile-libvirt FILE
 
+import atexit
+import bisect
+import json
 import logging
+import os
 import re
+import signal
+import sys
 import threading
 import time
 import traceback
@@ -19,6 +29,133 @@ from types import FunctionType
 
 CHECK_MAINLOOP = False
 
+# Upper bounds in seconds of the latency histogram buckets. The last
+# bucket catches everything slower
+HISTOGRAM_BOUNDS = [.0001, .001, .01, .1, 1, 10]
+HISTOGRAM_LABELS = (["<%gms" % (b * 1000) for b in HISTOGRAM_BOUNDS] +
+                    [">=%gms" % (HISTOGRAM_BOUNDS[-1] * 1000)])
+
+# (object, attribute name, original __dict__ value or None) for
+# everything we have replaced, so it can be restored by unwrap_all
+_wrapped = []
+_trace = True
+_profiler = None
+_profile_path = None
+
+
+class _APIStats(object):
+    def __init__(self):
+        self.calls = 0
+        self.main_calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.bytes = 0
+        self.histogram = [0] * len(HISTOGRAM_LABELS)
+        self.callers = {}
+
+    def get_data(self):
+        return {
+            "calls": self.calls,
+            "main_thread_calls": self.main_calls,
+            "worker_calls": self.calls - self.main_calls,
+            "errors": self.errors,
+            "total_time": self.total_time,
+            "max_time": self.max_time,
+            "bytes": self.bytes,
+            "histogram": dict(zip(HISTOGRAM_LABELS, self.histogram)),
+            "callers": dict(self.callers),
+        }
+
+
+class Profiler(object):
+    """
+    Collects stats for every call through the generated wrappers.
+    Recording only takes a lock and bumps some counters, so it's cheap
+    enough to leave on for a whole session.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._start = time.time()
+        self._skip_files = set([_source_file(__file__)])
+
+    def skip_caller_file(self, filename):
+        """
+        Don't attribute calls to code in @filename. Used for the module
+        being wrapped, since its methods call each other.
+        """
+        self._skip_files.add(_source_file(filename))
+
+    def _find_caller(self):
+        frame = sys._getframe(3)  # pylint: disable=protected-access
+        while frame and frame.f_code.co_filename in self._skip_files:
+            frame = frame.f_back
+        if not frame:
+            return "unknown"
+        code = frame.f_code
+        return "%s:%d:%s" % (os.path.basename(code.co_filename),
+                             frame.f_lineno, code.co_name)
+
+    def record(self, name, elapsed, is_main_thread, failed, nbytes):
+        caller = self._find_caller()
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = _APIStats()
+                self._stats[name] = stats
+            stats.calls += 1
+            stats.main_calls += int(is_main_thread)
+            stats.errors += int(failed)
+            stats.total_time += elapsed
+            stats.max_time = max(stats.max_time, elapsed)
+            stats.bytes += nbytes
+            stats.histogram[bisect.bisect(HISTOGRAM_BOUNDS, elapsed)] += 1
+            stats.callers[caller] = stats.callers.get(caller, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+            self._start = time.time()
+
+    def get_report(self):
+        with self._lock:
+            apis = dict((name, stats.get_data()) for
+                        name, stats in self._stats.items())
+            start = self._start
+        return {
+            "start": start,
+            "duration": time.time() - start,
+            "pid": os.getpid(),
+            "apis": apis,
+        }
+
+    def dump(self, path):
+        report = self.get_report()
+        tmppath = path + ".tmp"
+        with open(tmppath, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        os.rename(tmppath, path)
+        logging.debug("Wrote libvirt profile for %d APIs to %s",
+                      len(report["apis"]), path)
+
+
+def _source_file(filename):
+    if filename.endswith(".pyc"):
+        filename = filename[:-1]
+    return filename
+
+
+def _stream_bytes(name, args, ret):
+    """
+    Number of bytes moved by a stream send/recv call
+    """
+    if name.endswith("Stream.recv") and isinstance(ret, bytes):
+        return len(ret)
+    if name.endswith("Stream.send") and isinstance(ret, int) and ret > 0:
+        return ret
+    return 0
+
 
 def generate_wrapper(origfunc, name):
     # This could be used as generic infrastructure, but it has hacks for
@@ -26,8 +163,8 @@ def generate_wrapper(origfunc, name):
     # which causes UI blocking on slow network connections.
 
     def newfunc(*args, **kwargs):
-        threadname = threading.current_thread().name
-        is_main_thread = (threading.current_thread().name == "MainThread")
+        curthread = threading.current_thread()
+        is_main_thread = (curthread is threading.main_thread())
 
         # These APIs don't hit the network, so we might not want to see them.
         is_non_network_libvirt_call = (name.endswith(".name") or
@@ -37,24 +174,44 @@ def generate_wrapper(origfunc, name):
             name.endswith(".connect") or
             name.startswith("libvirtError"))
 
-        if (not is_non_network_libvirt_call and
+        if (_trace and not is_non_network_libvirt_call and
             (is_main_thread or not CHECK_MAINLOOP)):
             tb = ""
             if is_main_thread:
                 tb = "\n%s" % "".join(traceback.format_stack())
             logging.debug("TRACE %s: thread=%s: %s %s %s%s",
-                          time.time(), threadname, name, args, kwargs, tb)
-        return origfunc(*args, **kwargs)
+                          time.time(), curthread.name, name, args, kwargs, tb)
+
+        profiler = _profiler
+        if not profiler:
+            return origfunc(*args, **kwargs)
+
+        ret = None
+        failed = True
+        start = time.perf_counter()
+        try:
+            ret = origfunc(*args, **kwargs)
+            failed = False
+            return ret
+        finally:
+            profiler.record(name, time.perf_counter() - start,
+                            is_main_thread, failed,
+                            _stream_bytes(name, args, ret))
 
     return newfunc
 
 
+def _replace(obj, name, newfunc):
+    _wrapped.append((obj, name, obj.__dict__.get(name)))
+    setattr(obj, name, newfunc)
+
+
 def wrap_func(module, funcobj):
     name = funcobj.__name__
     logging.debug("wrapfunc %s %s", funcobj, name)
 
     newfunc = generate_wrapper(funcobj, name)
-    setattr(module, name, newfunc)
+    _replace(module, name, newfunc)
 
 
 def wrap_method(classobj, methodobj):
@@ -63,7 +220,7 @@ def wrap_method(classobj, methodobj):
     logging.debug("wrapmeth %s", fullname)
 
     newfunc = generate_wrapper(methodobj, fullname)
-    setattr(classobj, name, newfunc)
+    _replace(classobj, name, newfunc)
 
 
 def wrap_class(classobj):
@@ -75,9 +232,25 @@ def wrap_class(classobj):
             wrap_method(classobj, obj)
 
 
-def wrap_module(module, mainloop, regex):
+def wrap_module(module, mainloop, regex, trace=True, profile=False):
+    """
+    Wrap every function and class method in @module
+
+    :param mainloop: Only log calls made from the main thread
+    :param regex: Only wrap top level names matching this regex
+    :param trace: Log every call
+    :param profile: Collect stats for every call, see get_profiler()
+    """
     global CHECK_MAINLOOP
+    global _trace
+    global _profiler
     CHECK_MAINLOOP = mainloop
+    _trace = trace
+    if profile and not _profiler:
+        _profiler = Profiler()
+    if _profiler and getattr(module, "__file__", None):
+        _profiler.skip_caller_file(module.__file__)
+
     for name in dir(module):
         if regex and not re.match(regex, name):
             continue
@@ -86,3 +259,56 @@ def wrap_module(module, mainloop, regex):
             wrap_func(module, obj)
         if isinstance(obj, type):
             wrap_class(obj)
+
+
+def unwrap_all():
+    """
+    Restore everything replaced by wrap_module, and stop profiling
+    """
+    global _profiler
+    while _wrapped:
+        obj, name, orig = _wrapped.pop()
+        if orig is None:
+            delattr(obj, name)
+        else:
+            setattr(obj, name, orig)
+    _profiler = None
+
+
+def get_profiler():
+    return _profiler
+
+
+def _dump_profile_report():
+    if _profiler and _profile_path:
+        try:
+            _profiler.dump(_profile_path)
+        except Exception:
+            logging.exception("Error writing libvirt profile")
+
+
+def enable_profile_report(path):
+    """
+    Write the profile report as JSON to @path at exit. See also
+    watch_profile_signal
+    """
+    global _profile_path
+    _profile_path = path
+    atexit.register(_dump_profile_report)
+
+
+def watch_profile_signal(signum=signal.SIGUSR2):
+    """
+    Also write the profile report whenever the process receives
+    @signum. GLib's signal handling doesn't survive a fork(), so this
+    must be called after the app has forked into the background
+    """
+    def _handler():
+        _dump_profile_report()
+        return True
+
+    # A python signal handler would run on the main thread, possibly
+    # in the middle of Profiler.record() with the lock held. Have the
+    # main loop do the dump instead
+    from gi.repository import GLib
+    GLib.unix_signal_add(GLib.PRIORITY_DEFAULT, signum, _handler)
@@ -32,6 +32,9 @@ class vmmNodeDevice(vmmLibvirtObject):
         return True
     def _using_events(self):
         return self.conn.using_node_device_events
+    def _can_release_xml(self):
+        # The connection's NodeDeviceIndex keeps a reference anyways
+        return False
 
     def tick(self, stats_update=True):
         # Deliberately empty
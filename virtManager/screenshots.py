@@ -0,0 +1,259 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+import collections
+import concurrent.futures
+import io
+import logging
+import threading
+import time
+
+from gi.repository import GdkPixbuf
+
+from .baseclass import vmmGObject
+
+
+# Max screenshot streams we will have open to a single connection
+_MAX_STREAMS_PER_CONN = 2
+# Max screenshot streams overall
+_MAX_WORKERS = 4
+# Number of VMs we keep screenshots for
+_CACHE_SIZE = 64
+
+# Max size of the image shown when creating a snapshot
+PREVIEW_SIZE = 450
+# Max size of the thumbnail shown in the manager VM list
+THUMBNAIL_SIZE = 96
+
+
+def scale_pixbuf(pixbuf, maxsize):
+    """
+    Scale @pixbuf down so neither dimension is larger than @maxsize
+    """
+    def _scale(big, small):
+        if big <= maxsize:
+            return big, small
+        factor = float(maxsize) / float(big)
+        return maxsize, max(1, int(factor * float(small)))
+
+    width = pixbuf.get_width()
+    height = pixbuf.get_height()
+    if width > height:
+        width, height = _scale(width, height)
+    else:
+        height, width = _scale(height, width)
+
+    if (width, height) == (pixbuf.get_width(), pixbuf.get_height()):
+        return pixbuf
+    return pixbuf.scale_simple(width, height, GdkPixbuf.InterpType.BILINEAR)
+
+
+def pixbuf_from_data(mime, data):
+    loader = GdkPixbuf.PixbufLoader.new_with_mime_type(mime)
+    loader.write(data)
+    pixbuf = loader.get_pixbuf()
+    loader.close()
+    return pixbuf
+
+
+def pixbuf_to_png(pixbuf, metadata=None):
+    metadata = metadata or {}
+    ret = pixbuf.save_to_bufferv(
+        'png', list(metadata.keys()), list(metadata.values())
+    )
+    # On Fedora 19, ret is (bool, str)
+    # Someday the bindings might be fixed to just return the str, try
+    # and future proof it a bit
+    if isinstance(ret, tuple) and len(ret) >= 2:
+        ret = ret[1]
+    # F24 rawhide, ret[1] is a named tuple with a 'buffer' element...
+    if hasattr(ret, "buffer"):
+        ret = ret.buffer
+    return ret
+
+
+class vmmScreenshot(object):
+    """
+    A downscaled VM console screenshot
+    """
+    def __init__(self, timestamp, preview, thumbnail):
+        self.timestamp = timestamp
+        self.preview = preview
+        self.thumbnail = thumbnail
+
+    def age(self):
+        return time.time() - self.timestamp
+
+
+class vmmScreenshotService(vmmGObject):
+    """
+    Takes VM console screenshots in background threads, and keeps the
+    downscaled results in an LRU cache.
+
+    VMs registered with watch_vm() are captured periodically, at the
+    configured thumbnail interval. Other users can request a single
+    capture with request(). Both cap the number of screenshot streams
+    open to a single connection.
+    """
+    __gsignals__ = {
+        "screenshot-updated": (vmmGObject.RUN_FIRST, None, [object]),
+    }
+
+    @classmethod
+    def get_instance(cls):
+        if not cls._instance:
+            cls._instance = vmmScreenshotService()
+        return cls._instance
+
+    def __init__(self):
+        vmmGObject.__init__(self)
+        self._cleanup_on_app_close()
+
+        self._lock = threading.Lock()
+        self._cache = collections.OrderedDict()
+        self._pending = set()
+        self._conn_streams = {}
+        self._watched = {}
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=_MAX_WORKERS, thread_name_prefix="screenshot")
+
+        self._timer = None
+        self._reset_timer()
+        self.add_gsettings_handle(
+            self.config.on_thumbnail_update_interval_changed(
+                self._reset_timer))
+
+    def _cleanup(self):
+        self._executor.shutdown(wait=False)
+        self._cache = collections.OrderedDict()
+        self._watched = {}
+        self._timer = None
+
+
+    ###########
+    # Polling #
+    ###########
+
+    def _reset_timer(self, *args, **kwargs):
+        ignore = args
+        ignore = kwargs
+        if self._timer:
+            self.remove_gobject_timeout(self._timer)
+        interval = self.config.get_thumbnail_update_interval() * 1000
+        self._timer = self.timeout_add(interval, self._tick)
+
+    def _tick(self):
+        for vm in list(self._watched.values()):
+            self.request(vm)
+        return True
+
+    def watch_vm(self, vm):
+        """
+        Start periodically capturing screenshots of @vm
+        """
+        key = self._get_key(vm)
+        if key not in self._watched:
+            self._watched[key] = vm
+            self.request(vm)
+
+    def unwatch_vm(self, vm):
+        self._watched.pop(self._get_key(vm), None)
+
+
+    ###########
+    # Capture #
+    ###########
+
+    def _get_key(self, vm):
+        return (vm.conn.get_uri(), vm.get_uuid())
+
+    def _get_conn_semaphore(self, uri):
+        with self._lock:
+            if uri not in self._conn_streams:
+                self._conn_streams[uri] = threading.BoundedSemaphore(
+                        _MAX_STREAMS_PER_CONN)
+            return self._conn_streams[uri]
+
+    def _take_screenshot(self, vm):
+        stream = None
+        try:
+            stream = vm.conn.get_backend().newStream(0)
+            screen = 0
+            flags = 0
+            mime = vm.get_backend().screenshot(stream, screen, flags)
+
+            ret = io.BytesIO()
+            def _write_cb(_stream, data, userdata):
+                ignore = stream
+                ignore = userdata
+                ret.write(data)
+
+            stream.recvAll(_write_cb, None)
+            return mime, ret.getvalue()
+        finally:
+            try:
+                if stream:
+                    stream.finish()
+            except Exception:
+                pass
+
+    def _capture(self, vm, key, fresh):
+        try:
+            with self._get_conn_semaphore(key[0]):
+                if fresh:
+                    # qemu + qxl has a bug where the screenshot generally
+                    # only shows the data from the previous screenshot
+                    # request, so take an extra one up front:
+                    # https://bugs.launchpad.net/qemu/+bug/1314293
+                    self._take_screenshot(vm)
+                mime, data = self._take_screenshot(vm)
+
+            pixbuf = pixbuf_from_data(mime, data)
+            preview = scale_pixbuf(pixbuf, PREVIEW_SIZE)
+            thumbnail = scale_pixbuf(preview, THUMBNAIL_SIZE)
+            shot = vmmScreenshot(time.time(), preview, thumbnail)
+
+            with self._lock:
+                self._cache[key] = shot
+                self._cache.move_to_end(key)
+                while len(self._cache) > _CACHE_SIZE:
+                    self._cache.popitem(last=False)
+            self.idle_emit("screenshot-updated", vm)
+        except Exception as e:
+            logging.debug("Error taking screenshot of %s: %s",
+                          vm.get_name(), e)
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def request(self, vm, fresh=False):
+        """
+        Capture a screenshot of @vm in the background, if it has
+        a running display. 'screenshot-updated' is emitted when done.
+
+        :param fresh: Make sure the image reflects the current display
+            contents, which costs an extra screenshot with some drivers
+        """
+        if (not vm.is_active() or vm.is_paused() or
+            not vm.xmlobj.devices.graphics):
+            return
+
+        key = self._get_key(vm)
+        with self._lock:
+            if key in self._pending:
+                return
+            self._pending.add(key)
+        self._executor.submit(self._capture, vm, key, fresh)
+
+    def get_screenshot(self, vm):
+        """
+        Return the latest cached vmmScreenshot for @vm, or None
+        """
+        key = self._get_key(vm)
+        with self._lock:
+            shot = self._cache.get(key)
+            if shot:
+                self._cache.move_to_end(key)
+            return shot
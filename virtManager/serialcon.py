@@ -4,7 +4,10 @@
 # This work is licensed under the GNU GPLv2 or later.
 # See the COPYING file in the top-level directory.
 
+import gzip
 import logging
+import os
+import time
 
 import gi
 from gi.repository import Gdk
@@ -22,9 +25,68 @@ from gi.repository import Vte
 
 import libvirt
 
+from virtinst import util
+
 from .baseclass import vmmGObject
 
 
+# Max bytes to read from the stream at a time
+_RECV_SIZE = 64 * 1024
+# Max bytes to feed to the terminal per main loop iteration, so a
+# flooding guest can't starve the UI
+_FEED_SIZE = 64 * 1024
+# Stop reading from the stream when this much data is waiting to be
+# displayed, resume once the terminal has caught up
+_BUFFER_HIGH = 1024 * 1024
+_BUFFER_LOW = 256 * 1024
+
+
+class _ConsoleLog(object):
+    """
+    Gzip compressed on disk log of console output, rotated once
+    @maxsize uncompressed bytes have been written. Up to @keep old logs
+    are kept as NAME.1.gz, NAME.2.gz, ...
+    """
+    def __init__(self, path, maxsize=10 * 1024 * 1024, keep=4):
+        self.path = path
+        self._maxsize = maxsize
+        self._keep = keep
+        self._file = None
+        self._written = 0
+        self._last_flush = 0
+
+        dirname = os.path.dirname(self.path)
+        if not os.path.exists(dirname):
+            os.makedirs(dirname, 0o700)
+        self._open()
+
+    def _open(self):
+        self._file = gzip.open(self.path + ".gz", "ab")
+        self._written = 0
+
+    def _rotate(self):
+        self._file.close()
+        for idx in reversed(range(1, self._keep)):
+            src = "%s.%d.gz" % (self.path, idx)
+            if os.path.exists(src):
+                os.rename(src, "%s.%d.gz" % (self.path, idx + 1))
+        os.rename(self.path + ".gz", self.path + ".1.gz")
+        self._open()
+
+    def write(self, data):
+        self._file.write(data)
+        self._written += len(data)
+        if self._written >= self._maxsize:
+            self._rotate()
+        elif time.time() - self._last_flush > 2:
+            # Make sure output is recoverable if we crash
+            self._file.flush()
+            self._last_flush = time.time()
+
+    def close(self):
+        self._file.close()
+
+
 class ConsoleConnection(vmmGObject):
     def __init__(self, vm):
         vmmGObject.__init__(self)
@@ -33,9 +95,13 @@ class ConsoleConnection(vmmGObject):
         self.conn = vm.conn
 
         self.stream = None
+        self.log = None
 
-        self.streamToTerminal = b""
-        self.terminalToStream = ""
+        self._terminal = None
+        self._to_terminal = bytearray()
+        self._to_stream = bytearray()
+        self._reading_paused = False
+        self._display_pending = False
 
     def _cleanup(self):
         self.close()
@@ -43,9 +109,24 @@ class ConsoleConnection(vmmGObject):
         self.vm = None
         self.conn = None
 
+    def _update_stream_events(self):
+        events = (libvirt.VIR_STREAM_EVENT_ERROR |
+                  libvirt.VIR_STREAM_EVENT_HANGUP)
+        if not self._reading_paused:
+            events |= libvirt.VIR_STREAM_EVENT_READABLE
+        if self._to_stream:
+            events |= libvirt.VIR_STREAM_EVENT_WRITABLE
+        self.stream.eventUpdateCallback(events)
+
+    def _queue_display(self):
+        if self._display_pending:
+            return
+        self._display_pending = True
+        self.idle_add(self._display_data)
+
     def _event_on_stream(self, stream, events, opaque):
         ignore = stream
-        terminal = opaque
+        ignore = opaque
 
         if (events & libvirt.VIR_EVENT_HANDLE_ERROR or
             events & libvirt.VIR_EVENT_HANDLE_HANGUP):
@@ -55,7 +136,7 @@ class ConsoleConnection(vmmGObject):
 
         if events & libvirt.VIR_EVENT_HANDLE_READABLE:
             try:
-                got = self.stream.recv(1024 * 100)
+                got = self.stream.recv(_RECV_SIZE)
             except Exception:
                 logging.exception("Error receiving stream data")
                 self.close()
@@ -69,16 +150,22 @@ class ConsoleConnection(vmmGObject):
                 self.close()
                 return
 
-            queued_text = bool(self.streamToTerminal)
-            self.streamToTerminal += got
-            if not queued_text:
-                self.idle_add(self.display_data, terminal)
+            self._log_data(got)
+            self._to_terminal += got
+            self._queue_display()
+
+            if (not self._reading_paused and
+                len(self._to_terminal) >= _BUFFER_HIGH):
+                logging.debug("Console output backlog is %d bytes, "
+                              "pausing stream reads", len(self._to_terminal))
+                self._reading_paused = True
+                self._update_stream_events()
 
         if (events & libvirt.VIR_EVENT_HANDLE_WRITABLE and
-            self.terminalToStream):
+            self._to_stream):
 
             try:
-                done = self.stream.send(self.terminalToStream.encode())
+                done = self.stream.send(bytes(self._to_stream))
             except Exception:
                 logging.exception("Error sending stream data")
                 self.close()
@@ -88,18 +175,45 @@ class ConsoleConnection(vmmGObject):
                 # This is basically EAGAIN
                 return
 
-            self.terminalToStream = self.terminalToStream[done:]
+            del self._to_stream[:done]
+            if not self._to_stream:
+                self._update_stream_events()
 
-        if not self.terminalToStream:
-            self.stream.eventUpdateCallback(libvirt.VIR_STREAM_EVENT_READABLE |
-                                            libvirt.VIR_STREAM_EVENT_ERROR |
-                                            libvirt.VIR_STREAM_EVENT_HANGUP)
+    def _log_data(self, data):
+        if not self.log:
+            return
+        try:
+            self.log.write(data)
+        except Exception:
+            logging.exception("Error writing console log %s, disabling",
+                              self.log.path)
+            self.log = None
+
+    def _display_data(self):
+        if not self._to_terminal or not self._terminal:
+            self._display_pending = False
+            return False
+
+        self._terminal.feed(bytes(self._to_terminal[:_FEED_SIZE]))
+        del self._to_terminal[:_FEED_SIZE]
+
+        if (self._reading_paused and self.stream and
+            len(self._to_terminal) <= _BUFFER_LOW):
+            logging.debug("Console caught up, resuming stream reads")
+            self._reading_paused = False
+            self._update_stream_events()
+
+        if self._to_terminal:
+            # Keep the idle callback running until everything is fed
+            return True
+        self._display_pending = False
+        return False
 
 
     def is_open(self):
         return self.stream is not None
 
-    def open(self, dev, terminal):
+    def open(self, dev, terminal, logpath=None):
         if self.stream:
             self.close()
 
@@ -113,12 +227,36 @@ class ConsoleConnection(vmmGObject):
         stream = self.conn.get_backend().newStream(libvirt.VIR_STREAM_NONBLOCK)
         self.vm.open_console(name, stream)
         self.stream = stream
+        self._terminal = terminal
+        self._reading_paused = False
+        self._to_stream = bytearray()
+        if logpath:
+            self.set_log_path(logpath)
 
         self.stream.eventAddCallback((libvirt.VIR_STREAM_EVENT_READABLE |
                                       libvirt.VIR_STREAM_EVENT_ERROR |
                                       libvirt.VIR_STREAM_EVENT_HANGUP),
                                      self._event_on_stream,
-                                     terminal)
+                                     None)
+
+    def set_log_path(self, logpath):
+        """
+        Start or stop teeing console output to a compressed log at
+        @logpath. Pass None to stop logging
+        """
+        if self.log and self.log.path == logpath:
+            return
+        if self.log:
+            self.log.close()
+            self.log = None
+        if not logpath:
+            return
+
+        try:
+            self.log = _ConsoleLog(logpath)
+            logging.debug("Logging console output to %s", logpath)
+        except Exception:
+            logging.exception("Error opening console log %s", logpath)
 
     def close(self):
         if self.stream:
@@ -132,6 +270,8 @@ class ConsoleConnection(vmmGObject):
                 logging.exception("Error finishing stream")
 
         self.stream = None
+        self._to_stream = bytearray()
+        self.set_log_path(None)
 
     def send_data(self, src, text, length, terminal):
         """
@@ -144,19 +284,9 @@ class ConsoleConnection(vmmGObject):
         if self.stream is None:
             return
 
-        self.terminalToStream += text
-        if self.terminalToStream:
-            self.stream.eventUpdateCallback(libvirt.VIR_STREAM_EVENT_READABLE |
-                                            libvirt.VIR_STREAM_EVENT_WRITABLE |
-                                            libvirt.VIR_STREAM_EVENT_ERROR |
-                                            libvirt.VIR_STREAM_EVENT_HANGUP)
-
-    def display_data(self, terminal):
-        if not self.streamToTerminal:
-            return
-
-        terminal.feed(self.streamToTerminal)
-        self.streamToTerminal = b""
+        self._to_stream += text.encode()
+        if self._to_stream:
+            self._update_stream_events()
 
 
 class vmmSerialConsole(vmmGObject):
@@ -192,6 +322,7 @@ class vmmSerialConsole(vmmGObject):
         self.serial_copy = None
         self.serial_paste = None
         self.serial_close = None
+        self.serial_log = None
         self.init_popup()
 
         self.terminal = None
@@ -226,6 +357,12 @@ class vmmSerialConsole(vmmGObject):
         self.serial_paste.connect("activate", self.serial_paste_text)
         self.serial_popup.add(self.serial_paste)
 
+        self.serial_popup.add(Gtk.SeparatorMenuItem())
+        self.serial_log = Gtk.CheckMenuItem.new_with_mnemonic(
+            _("_Log Output to Disk"))
+        self.serial_log.connect("toggled", self.serial_log_toggled)
+        self.serial_popup.add(self.serial_log)
+
     def init_ui(self):
         self.box = Gtk.Notebook()
         self.box.set_show_tabs(False)
@@ -270,8 +407,21 @@ class vmmSerialConsole(vmmGObject):
         self.box = None
 
     def close(self):
-        if self.console:
-            self.console.close()
+        if not self.console:
+            return
+        if self.console.log and self.vm.is_active():
+            # Keep capturing output while the window is closed
+            logging.debug("Console logging enabled, keeping '%s' open",
+                          self.name)
+            return
+        self.console.close()
+
+    def _get_log_path(self):
+        if not self.vm.get_serial_log():
+            return None
+        return os.path.join(util.get_cache_dir(), "console-logs",
+                            "%s-%s" % (self.vm.get_name(), self.vm.get_uuid()),
+                            "serial%s.log" % self.target_port)
 
     def show_error(self, msg):
         self.error_label.set_markup("<b>%s</b>" % msg)
@@ -280,7 +430,8 @@ class vmmSerialConsole(vmmGObject):
     def open_console(self):
         try:
             if not self.console.is_open():
-                self.console.open(self.lookup_dev(), self.terminal)
+                self.console.open(self.lookup_dev(), self.terminal,
+                                  logpath=self._get_log_path())
             self.box.set_current_page(0)
             return True
         except Exception as e:
@@ -331,6 +482,7 @@ class vmmSerialConsole(vmmGObject):
             self.serial_copy.set_sensitive(True)
         else:
             self.serial_copy.set_sensitive(False)
+        self.serial_log.set_active(self.vm.get_serial_log())
         self.serial_popup.popup(None, None, None, None, 0, event.time)
 
     def serial_copy_text(self, src_ignore):
@@ -338,3 +490,10 @@ class vmmSerialConsole(vmmGObject):
 
     def serial_paste_text(self, src_ignore):
         self.terminal.paste_clipboard()
+
+    def serial_log_toggled(self, src):
+        if src.get_active() == self.vm.get_serial_log():
+            return
+        self.vm.set_serial_log(src.get_active())
+        if self.console.is_open():
+            self.console.set_log_path(self._get_log_path())
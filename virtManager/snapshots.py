@@ -6,12 +6,10 @@
 
 import datetime
 import glob
-import io
 import logging
 import os
 
 from gi.repository import Gdk
-from gi.repository import GdkPixbuf
 from gi.repository import Gtk
 from gi.repository import Pango
 
@@ -21,8 +19,14 @@ from virtinst import util
 from . import uiutil
 from .baseclass import vmmGObjectUI
 from .asyncjob import vmmAsyncJob
+from . import screenshots
+from .screenshots import vmmScreenshotService
 
 
+# Snapshots to load XML for when the list's visible rows aren't known
+# yet, such as before it's first drawn
+LOAD_PAGE_SIZE = 30
+
 mimemap = {
     "image/x-portable-pixmap": "ppm",
     "image/png": "png",
@@ -51,6 +55,10 @@ class vmmSnapshotPage(vmmGObjectUI):
         self._unapplied_changes = False
 
         self._snapmenu = None
+        self._new_screenshot = None
+        # Names of snapshots with an XML fetch in progress
+        self._loading = set()
+        self._load_queued = False
         self._init_ui()
 
         self._snapshot_new = self.widget("snapshot-new")
@@ -83,16 +91,21 @@ class vmmSnapshotPage(vmmGObjectUI):
         selection.set_mode(Gtk.SelectionMode.MULTIPLE)
         selection.set_select_function(self._confirm_changes, None)
 
+        vmmScreenshotService.get_instance().connect(
+            "screenshot-updated", self._screenshot_updated)
+
     ##############
     # Init stuff #
     ##############
 
     def _cleanup(self):
+        vmmScreenshotService.get_instance().disconnect_by_obj(self)
         self.vm = None
 
         self._snapshot_new.destroy()
         self._snapshot_new = None
         self._snapmenu = None
+        self._new_screenshot = None
 
     def _init_ui(self):
         # pylint: disable=redefined-variable-type
@@ -141,6 +154,8 @@ class vmmSnapshotPage(vmmGObjectUI):
         slist.set_tooltip_column(2)
         slist.append_column(col)
         slist.set_row_separator_func(_sep_cb, None)
+        slist.get_vadjustment().connect("value-changed",
+                                        self._queue_load_visible)
 
         # Snapshot popup menu
         menu = Gtk.Menu()
@@ -170,19 +185,23 @@ class vmmSnapshotPage(vmmGObjectUI):
     # Functional bits #
     ###################
 
+    def _get_snapshot_map(self):
+        return dict((snap.get_name(), snap) for
+                    snap in self.vm.list_snapshots())
+
     def _get_selected_snapshots(self):
         selection = self.widget("snapshot-list").get_selection()
         def add_snap(treemodel, path, it, snaps):
             ignore = path
-            try:
-                name = treemodel[it][0]
-                for snap in self.vm.list_snapshots():
-                    if name == snap.get_name():
-                        snaps.append(snap)
-            except Exception:
-                pass
+            name = treemodel[it][0]
+            if name in snapmap:
+                snaps.append(snapmap[name])
 
         snaps = []
+        try:
+            snapmap = self._get_snapshot_map()
+        except Exception:
+            return snaps
         selection.selected_foreach(add_snap, snaps)
         return snaps
 
@@ -209,6 +228,7 @@ class vmmSnapshotPage(vmmGObjectUI):
 
         try:
             snapshots = self.vm.list_snapshots()
+            self.vm.load_snapshot_summary()
         except Exception as e:
             logging.exception(e)
             self._set_error_page(_("Error refreshing snapshot list: %s") %
@@ -218,23 +238,12 @@ class vmmSnapshotPage(vmmGObjectUI):
         has_external = False
         has_internal = False
         for snap in snapshots:
-            desc = snap.get_xmlobj().description
-            name = snap.get_name()
-            state = snap.run_status()
+            row = self._build_row(snap)
             if snap.is_external():
                 has_external = True
-                sortname = "3%s" % name
-                external = " (%s)" % _("External")
             else:
                 has_internal = True
-                external = ""
-                sortname = "1%s" % name
-
-            label = "%s\n<span size='small'>%s: %s%s</span>" % (
-                (util.xml_escape(name), _("VM State"),
-                 util.xml_escape(state), external))
-            model.append([name, label, desc, snap.run_status_icon_name(),
-                          sortname, snap.is_current()])
+            model.append(row)
 
         if has_internal and has_external:
             model.append([None, None, None, None, "2", False])
@@ -253,29 +262,112 @@ class vmmSnapshotPage(vmmGObjectUI):
         model.foreach(check_selection, cursnaps)
 
         self._initial_populate = True
+        self._queue_load_visible()
+
+    def _build_row(self, snap):
+        """
+        Build a list row for @snap. This doesn't fetch the XML, the
+        description is filled in once it's loaded.
+        """
+        name = snap.get_name()
+        state = snap.run_status()
+        if snap.is_external():
+            sortname = "3%s" % name
+            external = " (%s)" % _("External")
+        else:
+            external = ""
+            sortname = "1%s" % name
 
-    def _make_screenshot_pixbuf(self, mime, sdata):
-        loader = GdkPixbuf.PixbufLoader.new_with_mime_type(mime)
-        loader.write(sdata)
-        pixbuf = loader.get_pixbuf()
-        loader.close()
-
-        maxsize = 450
-        def _scale(big, small, maxsize):
-            if big <= maxsize:
-                return big, small
-            factor = float(maxsize) / float(big)
-            return maxsize, int(factor * float(small))
-
-        width = pixbuf.get_width()
-        height = pixbuf.get_height()
-        if width > height:
-            width, height = _scale(width, height, maxsize)
+        label = "%s\n<span size='small'>%s: %s%s</span>" % (
+            (util.xml_escape(name), _("VM State"),
+             util.xml_escape(state), external))
+        return [name, label, snap.get_description(),
+                snap.run_status_icon_name(), sortname, snap.is_current()]
+
+
+    ##########################
+    # Background XML loading #
+    ##########################
+
+    def _get_visible_names(self):
+        slist = self.widget("snapshot-list")
+        model = slist.get_model()
+
+        visible = slist.get_visible_range()
+        if visible:
+            start = visible[0].get_indices()[0]
+            end = visible[1].get_indices()[0]
         else:
-            height, width = _scale(height, width, maxsize)
+            start = 0
+            end = LOAD_PAGE_SIZE - 1
+
+        names = []
+        for idx in range(start, min(end + 1, len(model))):
+            name = model[model.iter_nth_child(None, idx)][0]
+            if name:
+                names.append(name)
+        return names
+
+    def _queue_load_visible(self, ignore=None):
+        if self._load_queued:
+            return
+        self._load_queued = True
+        self.idle_add(self._load_visible)
+
+    def _load_visible(self):
+        self._load_queued = False
+        if not self.vm:
+            return
+        snapmap = self._get_snapshot_map()
+        self._load_snapshots([snapmap[name] for name in
+                              self._get_visible_names() if name in snapmap])
 
-        return pixbuf.scale_simple(width, height,
-                                   GdkPixbuf.InterpType.BILINEAR)
+    def _load_snapshots(self, snaps):
+        snaps = [snap for snap in snaps if not snap.is_xml_loaded() and
+                 snap.get_name() not in self._loading]
+        if not snaps:
+            return
+        for snap in snaps:
+            self._loading.add(snap.get_name())
+        self._start_thread(self._load_snapshots_thread,
+                           "snapshot XML for %s" % self.vm.get_name(),
+                           args=(snaps,))
+
+    def _load_snapshots_thread(self, snaps):
+        for snap in snaps:
+            snap.init_libvirt_state()
+        self.idle_add(self._snapshots_loaded, snaps)
+
+    def _snapshots_loaded(self, snaps):
+        for snap in snaps:
+            self._loading.discard(snap.get_name())
+        if not self.vm:
+            return
+
+        # Collect the rows first, updating the sort key can reorder them
+        snapmap = dict((snap.get_name(), snap) for snap in snaps)
+        model = self.widget("snapshot-list").get_model()
+        rows = [row for row in model if row[0] in snapmap]
+        for row in rows:
+            try:
+                newrow = self._build_row(snapmap[row[0]])
+            except Exception:
+                logging.debug("Error building row for snapshot %s",
+                              row[0], exc_info=True)
+                continue
+            for idx, val in enumerate(newrow):
+                if row[idx] != val:
+                    row[idx] = val
+
+        selected = self._get_selected_snapshots()
+        if (len(selected) == 1 and
+            selected[0].get_name() in snapmap and
+            not self._unapplied_changes):
+            self._show_snapshot(selected[0])
+
+    def _make_screenshot_pixbuf(self, mime, sdata):
+        pixbuf = screenshots.pixbuf_from_data(mime, sdata)
+        return screenshots.scale_pixbuf(pixbuf, screenshots.PREVIEW_SIZE)
 
     def _read_screenshot_file(self, name):
         if not name:
@@ -373,59 +465,22 @@ class vmmSnapshotPage(vmmGObjectUI):
     # 'New' handling #
     ##################
 
-    def _take_screenshot(self):
-        stream = None
-        try:
-            stream = self.vm.conn.get_backend().newStream(0)
-            screen = 0
-            flags = 0
-            mime = self.vm.get_backend().screenshot(stream, screen, flags)
-
-            ret = io.BytesIO()
-            def _write_cb(_stream, data, userdata):
-                ignore = stream
-                ignore = userdata
-                ret.write(data)
-
-            stream.recvAll(_write_cb, None)
-            return mime, ret.getvalue()
-        finally:
-            try:
-                if stream:
-                    stream.finish()
-            except Exception:
-                pass
-
-    def _get_screenshot(self):
-        if not self.vm.is_active():
-            logging.debug("Skipping screenshot since VM is not active")
-            return
-        if not self.vm.xmlobj.devices.graphics:
-            logging.debug("Skipping screenshot since VM has no graphics")
-            return
-
-        try:
-            # Perform two screenshots, because qemu + qxl has a bug where
-            # screenshot generally only shows the data from the previous
-            # screenshot request:
-            # https://bugs.launchpad.net/qemu/+bug/1314293
-            self._take_screenshot()
-            mime, sdata = self._take_screenshot()
-        except Exception:
-            logging.exception("Error taking screenshot")
-            return
+    def _set_new_screenshot(self, shot):
+        self._new_screenshot = shot
+        uiutil.set_grid_row_visible(
+            self.widget("snapshot-new-screenshot"), bool(shot))
+        if shot:
+            self.widget("snapshot-new-screenshot").set_from_pixbuf(
+                shot.preview)
 
-        ext = _mime_to_ext(mime)
-        if not ext:
+    def _screenshot_updated(self, _src, vm):
+        if vm != self.vm or not self._snapshot_new.is_visible():
             return
-
-        newpix = self._make_screenshot_pixbuf(mime, sdata)
-        setattr(newpix, "vmm_mimetype", mime)
-        setattr(newpix, "vmm_sndata", sdata)
-        return newpix
+        self._set_new_screenshot(
+            vmmScreenshotService.get_instance().get_screenshot(vm))
 
     def _reset_new_state(self):
-        collidelist = [s.get_xmlobj().name for s in self.vm.list_snapshots()]
+        collidelist = [s.get_name() for s in self.vm.list_snapshots()]
         default_name = DomainSnapshot.find_free_name(
             self.vm.get_backend(), collidelist)
 
@@ -437,12 +492,13 @@ class vmmSnapshotPage(vmmGObjectUI):
         self.widget("snapshot-new-status-icon").set_from_icon_name(
             self.vm.run_status_icon_name(), Gtk.IconSize.BUTTON)
 
-        sn = self._get_screenshot()
-        uiutil.set_grid_row_visible(
-            self.widget("snapshot-new-screenshot"), bool(sn))
-        if sn:
-            self.widget("snapshot-new-screenshot").set_from_pixbuf(sn)
-
+        # Show whatever we have cached right away, and swap in an up to
+        # date capture when the screenshot service finishes one
+        self._set_new_screenshot(None)
+        if self.vm.is_active():
+            service = vmmScreenshotService.get_instance()
+            self._set_new_screenshot(service.get_screenshot(self.vm))
+            service.request(self.vm, fresh=True)
 
     def _snapshot_new_name_changed(self, src):
         self.widget("snapshot-new-ok").set_sensitive(bool(src.get_text()))
@@ -476,13 +532,15 @@ class vmmSnapshotPage(vmmGObjectUI):
         if not snwidget.is_visible():
             return None, None
 
-        sn = snwidget.get_pixbuf()
-        if not sn:
+        if not self._new_screenshot:
             return None, None
 
-        mime = getattr(sn, "vmm_mimetype", None)
-        sndata = getattr(sn, "vmm_sndata", None)
-        return mime, sndata
+        try:
+            return ("image/png",
+                    screenshots.pixbuf_to_png(self._new_screenshot.preview))
+        except Exception:
+            logging.exception("Error encoding screenshot")
+            return None, None
 
     def _do_create_snapshot(self, asyncjob, xml, name, mime, sndata):
         ignore = asyncjob
@@ -571,7 +629,8 @@ class vmmSnapshotPage(vmmGObjectUI):
         desc_widget = self.widget("snapshot-description")
         desc = desc_widget.get_buffer().get_property("text") or ""
 
-        if len(snaps) == 1 and snaps[0].get_xmlobj().description != desc:
+        if (len(snaps) == 1 and snaps[0].is_xml_loaded() and
+            snaps[0].get_description() != desc):
             self._unapplied_changes = True
 
         self.widget("snapshot-apply").set_sensitive(True)
@@ -652,8 +711,15 @@ class vmmSnapshotPage(vmmGObjectUI):
             self.widget("snapshot-delete").set_sensitive(True)
             return
 
+        if not snap[0].is_xml_loaded():
+            self._set_error_page(_("Loading snapshot details..."))
+            self._load_snapshots(snap)
+            return
+        self._show_snapshot(snap[0])
+
+    def _show_snapshot(self, snap):
         try:
-            self._set_snapshot_state(snap[0])
+            self._set_snapshot_state(snap)
         except Exception as e:
             logging.exception(e)
             self._set_error_page(_("Error selecting snapshot: %s") % str(e))
@@ -0,0 +1,213 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+"""
+Shared OpenSSH ControlMaster connections, so all console tunnels to
+a host multiplex over a single authenticated ssh transport.
+"""
+
+import atexit
+import hashlib
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+
+# How long an unused master connection is kept around
+IDLE_TIMEOUT = 30
+# How long to wait for the master to authenticate. This includes any
+# time the user spends typing a password into ssh-askpass
+START_TIMEOUT = 120
+
+# Only start one master at a time, so ssh-askpass dialogs for different
+# hosts don't pile up on top of each other
+_start_lock = threading.Lock()
+
+_masters = {}
+_masters_lock = threading.Lock()
+_socket_dir = None
+
+
+def _get_socket_dir():
+    global _socket_dir
+    if _socket_dir is None:
+        basedir = os.environ.get("XDG_RUNTIME_DIR") or None
+        _socket_dir = tempfile.mkdtemp(prefix="virt-manager-ssh-",
+                                       dir=basedir)
+    return _socket_dir
+
+
+class SSHControlMaster(object):
+    """
+    A ControlMaster ssh process for one host/port/user. Tunnels hold
+    a reference while they are open, and the master is shut down once
+    it has been unused for @idle_timeout seconds.
+    """
+    def __init__(self, host, port, user, sshcmd="ssh",
+                 idle_timeout=IDLE_TIMEOUT, start_timeout=START_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.user = user
+        self._sshcmd = sshcmd
+        self._idle_timeout = idle_timeout
+        self._start_timeout = start_timeout
+
+        key = "%s:%s:%s" % (user or "", host, port or "")
+        self.path = os.path.join(_get_socket_dir(),
+                hashlib.sha256(key.encode("utf-8")).hexdigest()[:16])
+
+        self._lock = threading.Lock()
+        self._refs = 0
+        self._proc = None
+        self._errfile = None
+        self._errout = ""
+        self._failed = False
+        self._timer = None
+
+    def _host_args(self):
+        args = []
+        if self.port:
+            args += ["-p", str(self.port)]
+        if self.user:
+            args += ["-l", self.user]
+        return args + [self.host]
+
+    def get_client_args(self):
+        """
+        Options that make an ssh command run over this master
+        """
+        return ["-o", "ControlPath=%s" % self.path,
+                "-o", "ControlMaster=no"]
+
+    def get_err_output(self):
+        return self._errout
+
+    def is_running(self):
+        return bool(self._proc and self._proc.poll() is None and
+                    os.path.exists(self.path))
+
+    def _start(self):
+        argv = [self._sshcmd, "-M", "-N",
+                "-o", "ControlPath=%s" % self.path,
+                "-o", "ControlPersist=no"] + self._host_args()
+        logging.debug("Starting ssh control master: %s", " ".join(argv))
+
+        self._errfile = tempfile.TemporaryFile()
+        self._proc = subprocess.Popen(argv, stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL, stderr=self._errfile,
+                close_fds=True)
+
+        start = time.time()
+        while not os.path.exists(self.path):
+            if self._proc.poll() is not None:
+                break
+            if time.time() - start > self._start_timeout:
+                logging.debug("Timed out waiting for ssh control master")
+                break
+            time.sleep(.05)
+
+        if self.is_running():
+            logging.debug("ssh control master pid=%s running at %s",
+                          self._proc.pid, self.path)
+            return True
+
+        self._stop()
+        return False
+
+    def _stop(self):
+        if self._proc:
+            logging.debug("Stopping ssh control master pid=%s",
+                          self._proc.pid)
+            if self._proc.poll() is None:
+                self._proc.terminate()
+            self._proc.wait()
+        self._proc = None
+
+        if self._errfile:
+            self._errfile.seek(0)
+            self._errout = self._errfile.read().decode(
+                    errors="replace").strip()
+            self._errfile.close()
+            self._errfile = None
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _idle_timeout_cb(self):
+        with self._lock:
+            if self._refs == 0 and self._timer:
+                self._timer = None
+                self._stop()
+
+    def acquire(self):
+        """
+        Take a reference on the master, starting it if needed. Returns
+        False if the master couldn't be started, in which case callers
+        should fall back to standalone ssh connections. The reference
+        must be dropped with release() either way.
+        """
+        with self._lock:
+            self._refs += 1
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+            if self.is_running():
+                return True
+            if self._failed:
+                return False
+
+            self._stop()
+            with _start_lock:
+                ret = self._start()
+            self._failed = not ret
+            return ret
+
+    def release(self):
+        with self._lock:
+            self._refs -= 1
+            if self._refs > 0:
+                return
+
+            # Retry starting the master next time we're needed
+            self._failed = False
+            if not self._proc:
+                return
+            self._timer = threading.Timer(self._idle_timeout,
+                                          self._idle_timeout_cb)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def close(self):
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            self._stop()
+
+
+def get_master(host, port, user):
+    """
+    Return the shared SSHControlMaster for the passed host info
+    """
+    key = (host, port, user)
+    with _masters_lock:
+        if key not in _masters:
+            _masters[key] = SSHControlMaster(host, port, user)
+        return _masters[key]
+
+
+def _cleanup():
+    for master in list(_masters.values()):
+        master.close()
+    if _socket_dir:
+        shutil.rmtree(_socket_dir, ignore_errors=True)
+
+
+atexit.register(_cleanup)
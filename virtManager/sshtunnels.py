@@ -13,6 +13,7 @@ import threading
 import ipaddress
 
 from .baseclass import vmmGObject
+from . import sshmux
 
 
 class ConnectionInfo(object):
@@ -144,12 +145,17 @@ class _Tunnel(object):
         self._pid = None
         self._closed = False
         self._errfd = None
+        self._master = None
 
     def close(self):
         if self._closed:
             return
         self._closed = True
 
+        if self._master:
+            self._master.release()
+            self._master = None
+
         logging.debug("Close tunnel PID=%s ERRFD=%s",
                       self._pid, self._errfd and self._errfd.fileno() or None)
 
@@ -177,8 +183,20 @@ class _Tunnel(object):
 
         return errout
 
+    def open_mux(self, master, argv, sshfd):
+        """
+        Open the tunnel over @master, which we hold a reference on
+        """
+        if self._closed:
+            master.release()
+            sshfd.close()
+            return
+        self._master = master
+        self.open(argv, sshfd)
+
     def open(self, argv, sshfd):
         if self._closed:
+            sshfd.close()
             return
 
         errfds = socket.socketpair()
@@ -203,7 +221,7 @@ class _Tunnel(object):
         self._pid = pid
 
 
-def _make_ssh_command(ginfo):
+def _make_ssh_command(ginfo, master=None):
     if not ginfo.need_tunnel():
         return None
 
@@ -211,6 +229,8 @@ def _make_ssh_command(ginfo):
 
     # Build SSH cmd
     argv = ["ssh", "ssh"]
+    if master:
+        argv += master.get_client_args()
     if port:
         argv += ["-p", str(port)]
 
@@ -254,11 +274,37 @@ def _make_ssh_command(ginfo):
 
 
 class SSHTunnels(object):
+    """
+    Tunnels for a single console. All tunnels to a host share one
+    ssh ControlMaster connection, so only the first one has to
+    authenticate, and the rest open in parallel without taking the
+    global scheduler lock. If the master can't be started we fall
+    back to serialized standalone ssh processes.
+    """
     def __init__(self, ginfo):
         self._tunnels = []
         self._sshcommand = _make_ssh_command(ginfo)
         self._locked = False
 
+        self._master = None
+        self._muxcommand = None
+        if self._sshcommand:
+            host, port = ginfo.get_tunnel_host()
+            self._master = sshmux.get_master(host, port, ginfo.connuser)
+            self._muxcommand = _make_ssh_command(ginfo, self._master)
+
+    def _open_thread(self, t, sshfd):
+        if self._master.acquire():
+            vmmGObject.idle_add(t.open_mux, self._master,
+                                self._muxcommand, sshfd)
+            return
+
+        self._master.release()
+        logging.debug("ssh control master unavailable, "
+                      "using standalone tunnel")
+        _tunnel_scheduler.schedule(self._lock, t.open,
+                                   self._sshcommand, sshfd)
+
     def open_new(self):
         t = _Tunnel()
         self._tunnels.append(t)
@@ -270,7 +316,11 @@ class SSHTunnels(object):
         # level socket object for the SSH side, since it simplifies things
         # in that area.
         viewerfd, sshfd = socket.socketpair()
-        _tunnel_scheduler.schedule(self._lock, t.open, self._sshcommand, sshfd)
+        thread = threading.Thread(name="Tunnel open thread",
+                                  target=self._open_thread,
+                                  args=(t, sshfd))
+        thread.daemon = True
+        thread.start()
 
         retfd = os.dup(viewerfd.fileno())
         logging.debug("Generated tunnel fd=%s for viewer", retfd)
@@ -284,6 +334,8 @@ class SSHTunnels(object):
 
     def get_err_output(self):
         errstrings = []
+        if self._master and self._master.get_err_output():
+            errstrings.append(self._master.get_err_output())
         for l in self._tunnels:
             e = l.get_err_output().strip()
             if e and e not in errstrings:
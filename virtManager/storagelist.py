@@ -72,6 +72,9 @@ class vmmStorageList(vmmGObjectUI):
         self._name_hint = None
 
         self._active_edits = []
+        self._vol_poolkey = None
+        self._vol_refresh_id = 0
+        self._vol_select_hint = None
         self._addpool = None
         self._addvol = None
         self._volmenu = None
@@ -300,6 +303,8 @@ class vmmStorageList(vmmGObjectUI):
             ICON_SHUTOFF, Gtk.IconSize.BUTTON)
         self.widget("pool-state").set_text(_("Inactive"))
         self.widget("vol-list").get_model().clear()
+        self._vol_poolkey = None
+        self._vol_refresh_id += 1
         self.widget("pool-autostart").set_label(_("On Boot"))
         self.widget("pool-autostart").set_active(False)
 
@@ -389,59 +394,109 @@ class vmmStorageList(vmmGObjectUI):
             curpool and curpool.get_connkey() or None)
 
     def _populate_vols(self):
-        list_widget = self.widget("vol-list")
+        """
+        Kick off building the volume rows in a thread. The result is
+        applied to the list by _apply_vol_rows
+        """
         pool = self._current_pool()
-        vols = pool and pool.get_volumes() or []
-        model = list_widget.get_model()
-        list_widget.get_selection().unselect_all()
-        model.clear()
-
-        vadj = self.widget("vol-scroll").get_vadjustment()
-        vscroll_percent = vadj.get_value() // max(vadj.get_upper(), 1)
-
-        for vol in vols:
-            key = vol.get_connkey()
+        poolkey = pool and pool.get_connkey() or None
+        if poolkey != self._vol_poolkey:
+            # Different pool, don't leave the old pool's volumes up
+            # while the new list is built
+            self.widget("vol-list").get_model().clear()
+            self._vol_poolkey = poolkey
+
+        self._vol_refresh_id += 1
+        if not pool:
+            return
+        self._start_thread(self._build_vol_rows_thread,
+                           name="storagelist-vols",
+                           args=(pool, self._vol_refresh_id))
 
-            try:
-                path = vol.get_target_path()
-                name = vol.get_pretty_name(pool.get_type())
-                cap = str(vol.get_capacity())
-                sizestr = vol.get_pretty_capacity()
-                fmt = vol.get_format() or ""
-            except Exception:
-                logging.debug("Error getting volume info for '%s', "
-                              "hiding it", key, exc_info=True)
-                continue
+    def _build_vol_rows_thread(self, pool, refresh_id):
+        rows = []
+        try:
+            conn = self.conn
+            if not conn:
+                return
 
-            namestr = None
             try:
-                if path:
-                    names = DeviceDisk.path_in_use_by(vol.conn.get_backend(),
-                                                       path)
-                    namestr = ", ".join(names)
-                    if not namestr:
-                        namestr = None
+                inuse = DeviceDisk.get_paths_in_use_map(conn.get_backend())
             except Exception:
-                logging.exception("Failed to determine if storage volume in "
-                                  "use.")
+                logging.exception("Failed to determine if storage volumes "
+                                  "are in use.")
+                inuse = {}
+
+            pooltype = pool.get_type()
+            for vol in pool.get_volumes():
+                key = vol.get_connkey()
+
+                try:
+                    path = vol.get_target_path()
+                    name = vol.get_pretty_name(pooltype)
+                    cap = str(vol.get_capacity())
+                    sizestr = vol.get_pretty_capacity()
+                    fmt = vol.get_format() or ""
+                except Exception:
+                    logging.debug("Error getting volume info for '%s', "
+                                  "hiding it", key, exc_info=True)
+                    continue
+
+                namestr = ", ".join(inuse.get(path, [])) or None
+
+                row = [None] * VOL_NUM_COLUMNS
+                row[VOL_COLUMN_KEY] = key
+                row[VOL_COLUMN_NAME] = name
+                row[VOL_COLUMN_SIZESTR] = sizestr
+                row[VOL_COLUMN_CAPACITY] = cap
+                row[VOL_COLUMN_FORMAT] = fmt
+                row[VOL_COLUMN_INUSEBY] = namestr
+                row[VOL_COLUMN_SENSITIVE] = True
+                rows.append(row)
+        except Exception:
+            logging.exception("Error building volume list")
+
+        self.idle_add(self._apply_vol_rows, pool.get_connkey(),
+                      refresh_id, rows)
+
+    def _apply_vol_rows(self, poolkey, refresh_id, rows):
+        """
+        Update the volume list in place to match @rows, so selection
+        and scroll position are kept across refreshes
+        """
+        if (not self.conn or refresh_id != self._vol_refresh_id or
+            poolkey != self._vol_poolkey):
+            # Superseded by a newer refresh, or the dialog went away
+            return
 
-            sensitive = True
+        model = self.widget("vol-list").get_model()
+        newrows = {}
+        for row in rows:
             if self._vol_sensitive_cb:
-                sensitive = self._vol_sensitive_cb(fmt)
-
-            row = [None] * VOL_NUM_COLUMNS
-            row[VOL_COLUMN_KEY] = key
-            row[VOL_COLUMN_NAME] = name
-            row[VOL_COLUMN_SIZESTR] = sizestr
-            row[VOL_COLUMN_CAPACITY] = cap
-            row[VOL_COLUMN_FORMAT] = fmt
-            row[VOL_COLUMN_INUSEBY] = namestr
-            row[VOL_COLUMN_SENSITIVE] = sensitive
-            model.append(row)
-
-        def _reset_vscroll_position():
-            vadj.set_value(vadj.get_upper() * vscroll_percent)
-        self.idle_add(_reset_vscroll_position)
+                row[VOL_COLUMN_SENSITIVE] = self._vol_sensitive_cb(
+                        row[VOL_COLUMN_FORMAT])
+            newrows[row[VOL_COLUMN_KEY]] = row
+
+        # Iterating a sorted model while changing it isn't safe, so grab
+        # references to the existing rows first
+        oldrows = [(row[VOL_COLUMN_KEY], Gtk.TreeRowReference.new(
+            model, row.path)) for row in model]
+        for key, rowref in oldrows:
+            treeiter = model.get_iter(rowref.get_path())
+            newrow = newrows.pop(key, None)
+            if newrow is None:
+                model.remove(treeiter)
+            elif list(model[treeiter]) != newrow:
+                model[treeiter] = newrow
+
+        for row in rows:
+            if row[VOL_COLUMN_KEY] in newrows:
+                model.append(row)
+
+        if self._vol_select_hint in [r[VOL_COLUMN_KEY] for r in rows]:
+            uiutil.set_list_selection(self.widget("vol-list"),
+                                      self._vol_select_hint)
+            self._vol_select_hint = None
 
     def _confirm_changes(self):
         if not self._active_edits:
@@ -504,16 +559,21 @@ class vmmStorageList(vmmGObjectUI):
         uiutil.set_list_selection(self.widget("pool-list"), connkey)
 
     def _vol_created(self, src, pool_connkey, volname):
-        # The vol list will have already been updated, since this
-        # signal arrives only after pool-refreshed. So all we do here is
-        # select the vol we just created.
+        # This signal arrives only after pool-refreshed, but the vol
+        # list is filled in asynchronously, so the new volume might not
+        # be listed yet. Select it now if it is, otherwise once the
+        # pending refresh completes.
         ignore = src
         pool = self._current_pool()
         if not pool or pool.get_connkey() != pool_connkey:
             return
 
-        # Select the new volume
-        uiutil.set_list_selection(self.widget("vol-list"), volname)
+        self._vol_select_hint = volname
+        for row in self.widget("vol-list").get_model():
+            if row[VOL_COLUMN_KEY] == volname:
+                uiutil.set_list_selection(self.widget("vol-list"), volname)
+                self._vol_select_hint = None
+                break
 
     def _pool_autostart_changed(self, src):
         ignore = src
@@ -15,6 +15,10 @@ from .libvirtobject import vmmLibvirtObject
 
 
 class vmmStorageVolume(vmmLibvirtObject):
+    _XML_SUMMARY_FIELDS = ["name", "type", "key", "target_path",
+                           "backing_store", "format",
+                           "capacity", "allocation"]
+
     def __init__(self, conn, backend, key):
         vmmLibvirtObject.__init__(self, conn, backend, key, StorageVolume)
 
@@ -38,6 +42,9 @@ class vmmStorageVolume(vmmLibvirtObject):
 
     def _get_backend_status(self):
         return self._STATUS_ACTIVE
+    def _can_release_xml(self):
+        # Volume XML is only fetched again when the pool is refreshed
+        return True
 
     def tick(self, stats_update=True):
         # Deliberately empty
@@ -67,15 +74,15 @@ class vmmStorageVolume(vmmLibvirtObject):
     #################
 
     def get_key(self):
-        return self.get_xmlobj().key or ""
+        return self._get_xml_field("key") or ""
     def get_target_path(self):
-        return self.get_xmlobj().target_path or ""
+        return self._get_xml_field("target_path") or ""
     def get_format(self):
-        return self.get_xmlobj().format
+        return self._get_xml_field("format")
     def get_capacity(self):
-        return self.get_xmlobj().capacity
+        return self._get_xml_field("capacity")
     def get_allocation(self):
-        return self.get_xmlobj().allocation
+        return self._get_xml_field("allocation")
 
     def get_pretty_capacity(self):
         return util.pretty_bytes(self.get_capacity())
@@ -97,12 +104,15 @@ class vmmStoragePool(vmmLibvirtObject):
     __gsignals__ = {
         "refreshed": (vmmLibvirtObject.RUN_FIRST, None, [])
     }
+    _XML_SUMMARY_FIELDS = ["name", "type", "uuid", "target_path",
+                           "allocation", "available", "capacity"]
 
     def __init__(self, conn, backend, key):
         vmmLibvirtObject.__init__(self, conn, backend, key, StoragePool)
 
         self._last_refresh_time = 0
         self._volumes = None
+        self._volume_paths = None
 
 
     ##########################
@@ -138,16 +148,17 @@ class vmmStoragePool(vmmLibvirtObject):
             # shows up while the conn is connected, this means it was
             # just 'defined' recently and doesn't need to be refreshed.
             self.refresh(_from_object_init=True)
-        for vol in self.get_volumes():
-            vol.init_libvirt_state()
+        self.conn.schedule_object_init(self.get_volumes())
 
     def _invalidate_xml(self):
         vmmLibvirtObject._invalidate_xml(self)
         self._volumes = None
+        self._volume_paths = None
 
     def _cleanup(self):
         vmmLibvirtObject._cleanup(self)
         self._volumes = None
+        self._volume_paths = None
 
 
     ###########
@@ -206,15 +217,40 @@ class vmmStoragePool(vmmLibvirtObject):
         self._update_volumes(force=False)
         return self._volumes[:]
 
+    def get_cached_volumes(self):
+        """
+        The volumes we already know about, without listing them
+        """
+        return (self._volumes or [])[:]
+
     def get_volume(self, key):
         for vol in self.get_volumes():
             if vol.get_connkey() == key:
                 return vol
         return None
 
+    def get_volume_by_path(self, path):
+        """
+        Look up a volume by target path, using a lazily built index that
+        is thrown away whenever the volume list is refreshed
+        """
+        self._update_volumes(force=False)
+        if self._volume_paths is None:
+            self._volume_paths = {}
+            for vol in self._volumes:
+                try:
+                    self._volume_paths[vol.get_target_path()] = vol
+                except Exception as e:
+                    # Errors can happen if the volume disappeared,
+                    # bug 1092739
+                    logging.debug("Error looking up path for vol=%s: %s",
+                        vol.get_name(), e)
+        return self._volume_paths.get(path)
+
     def _update_volumes(self, force):
         if not self.is_active():
             self._volumes = []
+            self._volume_paths = None
             return
         if not force and self._volumes is not None:
             return
@@ -224,6 +260,7 @@ class vmmStoragePool(vmmLibvirtObject):
             self.conn.get_backend(), self.get_backend(), keymap,
             lambda obj, key: vmmStorageVolume(self.conn, obj, key))
         self._volumes = allvols
+        self._volume_paths = None
 
 
     #########################
@@ -242,18 +279,18 @@ class vmmStoragePool(vmmLibvirtObject):
         return self.get_xmlobj().supports_volume_creation(clone=clone)
 
     def get_type(self):
-        return self.get_xmlobj().type
+        return self._get_xml_field("type")
     def get_uuid(self):
-        return self.get_xmlobj().uuid
+        return self._get_xml_field("uuid")
     def get_target_path(self):
-        return self.get_xmlobj().target_path or ""
+        return self._get_xml_field("target_path") or ""
 
     def get_allocation(self):
-        return self.get_xmlobj().allocation
+        return self._get_xml_field("allocation")
     def get_available(self):
-        return self.get_xmlobj().available
+        return self._get_xml_field("available")
     def get_capacity(self):
-        return self.get_xmlobj().capacity
+        return self._get_xml_field("capacity")
 
     def get_pretty_allocation(self):
         return util.pretty_bytes(self.get_allocation())
@@ -34,6 +34,13 @@ def get_list_selected_row(widget, check_visible=False):
 
     if hasattr(widget, "get_selection"):
         selection = widget.get_selection()
+        if selection.get_mode() == Gtk.SelectionMode.MULTIPLE:
+            # Only report a row if exactly one is selected
+            model, paths = selection.get_selected_rows()
+            if len(paths) != 1:
+                return None
+            return model[paths[0]]
+
         model, treeiter = selection.get_selected()
         if treeiter is None:
             return None
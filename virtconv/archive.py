@@ -0,0 +1,308 @@
+# Copyright (C) 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+#
+
+import gzip
+import json
+import os
+import posixpath
+import re
+import struct
+import tarfile
+import zipfile
+
+
+# Members this size or smaller are extracted up front, so the parsers
+# can find config and VMDK descriptor files. Matches the size limit the
+# parsers use to identify a config file.
+EXTRACT_LIMIT = 1024 * 1024 * 2
+
+_COPY_BLOCK_SIZE = 1024 * 1024
+_ZIP_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+
+_TAR_EXTS = ["ova", "tar", "gz", "bz2", "bzip2", "xz"]
+_ZIP_EXTS = ["zip"]
+
+# Magic bytes of the compression formats tarfile can transparently handle
+_COMPRESSED_MAGIC = [b"\x1f\x8b", b"BZh", b"\xfd7zXZ\x00"]
+
+# VMDK descriptor extent line, like: RW 4192256 SPARSE "disk-s001.vmdk"
+_VMDK_EXTENT_RE = re.compile(
+    r'^\s*(?:RW|RDONLY|NOACCESS)\s+\d+\s+\w+\s+"([^"]+)"')
+
+
+def _clean_member_name(name):
+    """
+    Normalize an archive member name, returning None for anything that
+    would land outside of the extraction directory.
+    """
+    name = posixpath.normpath(name.replace("\\", "/"))
+    if (name.startswith("/") or name == ".." or
+        name.startswith("../") or name == "."):
+        return None
+    return name
+
+
+def _make_dstpath(destdir, name):
+    dstpath = os.path.join(destdir, name)
+    if not os.path.exists(os.path.dirname(dstpath)):
+        os.makedirs(os.path.dirname(dstpath))
+    return dstpath
+
+
+def _get_vmdk_extents(path):
+    """
+    If @path is a VMDK descriptor file, return the file names of its
+    extents, relative to the descriptor's directory
+    """
+    with open(path, "rb") as f:
+        content = f.read(EXTRACT_LIMIT)
+    if b"# Disk DescriptorFile" not in content:
+        return []
+
+    ret = []
+    for line in content.decode("utf-8", "replace").splitlines():
+        match = _VMDK_EXTENT_RE.match(line)
+        if match:
+            ret.append(match.group(1))
+    return ret
+
+
+def _copy_fileobj_sparse(src, dstpath):
+    """
+    Stream file object @src into a new file @dstpath, leaving holes
+    where the source has blocks of zeros.
+    """
+    zeros = bytes(_COPY_BLOCK_SIZE)
+    with open(dstpath, "wb") as dst:
+        while True:
+            data = src.read(_COPY_BLOCK_SIZE)
+            if not data:
+                break
+            if data == zeros[:len(data)]:
+                dst.seek(len(data), os.SEEK_CUR)
+            else:
+                dst.write(data)
+        dst.truncate()
+
+
+class _Archive(object):
+    """
+    Base class for reading archives in process. Each method opens its
+    own handle on the archive, so members can be read from multiple
+    threads at once.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._members = None
+
+    def _list_members(self):
+        """
+        Return a dict of cleaned member name -> (raw name, size) for
+        every regular file in the archive
+        """
+        raise NotImplementedError()
+
+    def _open_member(self, handle, rawname):
+        raise NotImplementedError()
+
+    def _open(self):
+        raise NotImplementedError()
+
+    def _get_data_offset(self, rawname):
+        raise NotImplementedError()
+
+    def _get_members(self):
+        if self._members is None:
+            self._members = self._list_members()
+        return self._members
+
+    def _extract_pass(self, destdir, want_cb, done_cb):
+        """
+        Extract every member for which want_cb(name, size) is True under
+        @destdir, calling done_cb(name, dstpath) after each one. want_cb
+        is checked as the pass goes, so done_cb can ask for more members
+        """
+        for name in self.get_members():
+            if not want_cb(name, self.get_size(name)):
+                continue
+            dstpath = _make_dstpath(destdir, name)
+            self.extract(name, dstpath)
+            done_cb(name, dstpath)
+
+    def get_members(self):
+        return sorted(self._get_members())
+
+    def get_size(self, name):
+        return self._get_members()[name][1]
+
+    def get_data_offset(self, name):
+        """
+        If @name is stored uncompressed and contiguous inside the archive
+        file, return the offset of its data, so tools can read it in
+        place. Otherwise return None.
+        """
+        return self._get_data_offset(self._get_members()[name][0])
+
+    def extract(self, name, dstpath, decompress=False):
+        """
+        Stream member @name to @dstpath. If @decompress is True, the
+        member is gzip compressed and is decompressed on the fly.
+        """
+        rawname = self._get_members()[name][0]
+        with self._open() as handle:
+            with self._open_member(handle, rawname) as src:
+                if decompress:
+                    src = gzip.GzipFile(fileobj=src, mode="rb")
+                _copy_fileobj_sparse(src, dstpath)
+
+    def extract_small(self, destdir, limit=EXTRACT_LIMIT):
+        """
+        Extract all members of @limit size or less under @destdir, plus
+        the extents of any VMDK descriptor among them, so a multi file
+        VMDK can be opened from @destdir
+        """
+        wanted = set()
+        done = set()
+
+        def _want(name, size):
+            return name not in done and (name in wanted or size <= limit)
+
+        def _done(name, dstpath):
+            done.add(name)
+            dirname = posixpath.dirname(name)
+            for extent in _get_vmdk_extents(dstpath):
+                extent = _clean_member_name(posixpath.join(dirname, extent))
+                if extent:
+                    wanted.add(extent)
+
+        while True:
+            self._extract_pass(destdir, _want, _done)
+            # Extents stored ahead of their descriptor need another pass
+            if not (wanted - done) & set(self._get_members()):
+                break
+
+
+class _TarArchive(_Archive):
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            head = f.read(6)
+        self._compressed = any([head.startswith(m) for m in
+                                _COMPRESSED_MAGIC])
+        self._offsets = {}
+        _Archive.__init__(self, path)
+
+    def _open(self):
+        return tarfile.open(self.path, "r:*")
+
+    def _add_member(self, members, info):
+        name = _clean_member_name(info.name)
+        if not info.isreg() or name is None:
+            return None
+        members[name] = (info.name, info.size)
+        if not info.issparse():
+            self._offsets[info.name] = info.offset_data
+        return name
+
+    def _list_members(self):
+        ret = {}
+        with self._open() as tar:
+            for info in tar:
+                self._add_member(ret, info)
+        return ret
+
+    def _extract_pass(self, destdir, want_cb, done_cb):
+        # Read the archive front to back in one go, since with compressed
+        # tars every seek backwards means decompressing from the start.
+        # The member list is filled in along the way
+        members = {}
+        with tarfile.open(self.path, "r|*") as tar:
+            for info in tar:
+                name = self._add_member(members, info)
+                if name is None or not want_cb(name, info.size):
+                    continue
+                dstpath = _make_dstpath(destdir, name)
+                src = tar.extractfile(info)
+                try:
+                    _copy_fileobj_sparse(src, dstpath)
+                finally:
+                    src.close()
+                done_cb(name, dstpath)
+        if self._members is None:
+            self._members = members
+
+    def _open_member(self, handle, rawname):
+        return handle.extractfile(rawname)
+
+    def _get_data_offset(self, rawname):
+        if self._compressed:
+            return None
+        self._get_members()
+        return self._offsets.get(rawname)
+
+
+class _ZipArchive(_Archive):
+    def _open(self):
+        return zipfile.ZipFile(self.path)
+
+    def _list_members(self):
+        ret = {}
+        with self._open() as z:
+            for info in z.infolist():
+                name = _clean_member_name(info.filename)
+                if info.is_dir() or name is None:
+                    continue
+                ret[name] = (info.filename, info.file_size)
+        return ret
+
+    def _open_member(self, handle, rawname):
+        return handle.open(rawname)
+
+    def _get_data_offset(self, rawname):
+        with self._open() as z:
+            info = z.getinfo(rawname)
+            if (info.compress_type != zipfile.ZIP_STORED or
+                info.flag_bits & 0x1):
+                return None
+            header_offset = info.header_offset
+
+        # The local header's name and extra field lengths can differ
+        # from the central directory copy, so read them from the file
+        with open(self.path, "rb") as f:
+            f.seek(header_offset)
+            header = _ZIP_LOCAL_HEADER.unpack(
+                    f.read(_ZIP_LOCAL_HEADER.size))
+        namelen, extralen = header[-2:]
+        return (header_offset + _ZIP_LOCAL_HEADER.size +
+                namelen + extralen)
+
+
+def open_archive(path):
+    """
+    Return an archive object for @path if it is a format we can read in
+    process, otherwise None.
+    """
+    ext = os.path.splitext(path)[1][1:]
+    if ext in _ZIP_EXTS:
+        return _ZipArchive(path)
+    if ext in _TAR_EXTS and tarfile.is_tarfile(path):
+        return _TarArchive(path)
+    return None
+
+
+def build_qemu_img_source(archivepath, offset, size):
+    """
+    Return a qemu-img 'json:' filename that reads the @size bytes at
+    @offset within @archivepath. The image format is still probed.
+    """
+    spec = {
+        "file": {
+            "driver": "raw",
+            "offset": offset,
+            "size": size,
+            "file": {"driver": "file", "filename": archivepath},
+        },
+    }
+    return "json:" + json.dumps(spec, sort_keys=True)
@@ -7,6 +7,7 @@
 # See the COPYING file in the top-level directory.
 #
 
+import concurrent.futures
 from distutils.spawn import find_executable
 import logging
 import os
@@ -17,6 +18,12 @@ import tempfile
 
 from virtinst import StoragePool
 
+from . import archive as archivemod
+
+
+# Max number of disks to copy/convert at the same time
+_CONVERT_WORKERS = 4
+
 
 class parser_class(object):
     """
@@ -97,70 +104,73 @@ def _run_cmd(cmd):
         (" ".join(cmd), ret, out))
 
 
+def _make_tempdir():
+    basedir = "/var/tmp"
+    if not _is_test():
+        return tempfile.mkdtemp(prefix="virt-convert-tmp", dir=basedir)
+
+    tempdir = os.path.join(basedir, "virt-convert-tmp")
+    if not os.path.exists(tempdir):
+        os.makedirs(tempdir)
+    return tempdir
+
+
+def _extract_with_cmd(input_file, tempdir, print_cb):
+    """
+    Fully extract an archive format we can't read in process
+    """
+    base = os.path.basename(input_file)
+    binname = "7z"
+    pkg = "p7zip"
+    cmd = ["7z", "-o" + tempdir, "e", input_file]
+    if not find_executable(binname):
+        raise RuntimeError(_("%s appears to be an archive, "
+            "but '%s' is not installed. "
+            "Please either install '%s', or extract the archive "
+            "yourself and point virt-convert at "
+            "the extracted directory.") % (base, pkg, pkg))
+
+    print_cb(_("%s appears to be an archive, running: %s") %
+        (base, " ".join(cmd)))
+    _run_cmd(cmd)
+
+
 def _find_input(input_file, parser, print_cb):
     """
     Given the input file, determine if its a directory, archive, etc
+
+    tar/ova and zip archives are read in process: only small members like
+    the config and descriptor files, plus the extents of multi file VMDKs,
+    are extracted. Other disk images are left in the archive and streamed
+    out by convert_disks. The archive object is returned so the caller
+    can do that.
     """
     force_clean = []
+    archive = None
 
     try:
         ext = os.path.splitext(input_file)[1]
-        tempdir = None
-        binname = None
-        pkg = None
         if ext and ext[1:] in ["zip", "gz", "ova",
                 "tar", "bz2", "bzip2", "7z", "xz"]:
-            basedir = "/var/tmp"
-            if _is_test():
-                tempdir = os.path.join(basedir, "virt-convert-tmp")
-            else:
-                tempdir = tempfile.mkdtemp(
-                    prefix="virt-convert-tmp", dir=basedir)
+            tempdir = _make_tempdir()
+            force_clean.append(tempdir)
 
             base = os.path.basename(input_file)
-
-            if (ext[1:] == "zip"):
-                binname = "unzip"
-                pkg = "unzip"
-                cmd = ["unzip", "-o", "-d", tempdir, input_file]
-            elif (ext[1:] == "7z"):
-                binname = "7z"
-                pkg = "p7zip"
-                cmd = ["7z", "-o" + tempdir, "e", input_file]
-            elif (ext[1:] == "ova" or ext[1:] == "tar"):
-                binname = "tar"
-                pkg = "tar"
-                cmd = ["tar", "xf", input_file, "-C", tempdir]
-            elif (ext[1:] == "gz"):
-                binname = "gzip"
-                pkg = "gzip"
-                cmd = ["tar", "zxf", input_file, "-C", tempdir]
-            elif (ext[1:] == "bz2" or ext[1:] == "bzip2"):
-                binname = "bzip2"
-                pkg = "bzip2"
-                cmd = ["tar", "jxf", input_file, "-C", tempdir]
-            elif (ext[1:] == "xz"):
-                binname = "xz"
-                pkg = "xz"
-                cmd = ["tar", "Jxf", input_file, "-C", tempdir]
-            if not find_executable(binname):
-                raise RuntimeError(_("%s appears to be an archive, "
-                    "but '%s' is not installed. "
-                    "Please either install '%s', or extract the archive "
-                    "yourself and point virt-convert at "
-                    "the extracted directory.") % (base, pkg, pkg))
-
-            print_cb(_("%s appears to be an archive, running: %s") %
-                (base, " ".join(cmd)))
-
-            _run_cmd(cmd)
-            force_clean.append(tempdir)
+            if ext[1:] == "7z":
+                _extract_with_cmd(input_file, tempdir, print_cb)
+            else:
+                archive = archivemod.open_archive(input_file)
+                if not archive:
+                    raise RuntimeError(_("%s is not a valid archive") % base)
+                print_cb(_("%s appears to be an archive, reading it "
+                           "in place") % base)
+                archive.extract_small(tempdir)
             input_file = tempdir
 
         if not os.path.isdir(input_file):
             if not parser:
                 parser = _find_parser_by_file(input_file)
-            return input_file, parser, force_clean
+            return input_file, parser, force_clean, archive
 
         parsers = parser and [parser] or _get_parsers()
         for root, ignore, files in os.walk(input_file):
@@ -168,12 +178,12 @@ def _find_input(input_file, parser, print_cb):
                 for f in [f for f in files if f.endswith(p.suffix)]:
                     path = os.path.join(root, f)
                     if p.identify_file(path):
-                        return path, p, force_clean
+                        return path, p, force_clean, archive
 
         raise RuntimeError("Could not find parser for file %s" % input_file)
     except Exception:
         for f in force_clean:
-            shutil.rmtree(f)
+            shutil.rmtree(f, ignore_errors=True)
         raise
 
 
@@ -205,7 +215,8 @@ class VirtConverter(object):
 
         (self._input_file,
          self.parser,
-         self._force_clean) = _find_input(input_file, parser, self.print_cb)
+         self._force_clean,
+         self._archive) = _find_input(input_file, parser, self.print_cb)
         self._top_dir = os.path.dirname(os.path.abspath(self._input_file))
 
         logging.debug("converter not input_file=%s parser=%s",
@@ -231,33 +242,33 @@ class VirtConverter(object):
             if os.path.isdir(path):
                 shutil.rmtree(path)
 
-    def _copy_file(self, absin, absout, dry):
+    def _copy_file(self, absin, absout):
         self.print_cb("Copying %s to %s" % (os.path.basename(absin), absout))
-        if not dry:
-            shutil.copy(absin, absout)
+        return lambda: shutil.copy(absin, absout)
 
-    def _qemu_convert(self, absin, absout, disk_format, dry):
+    def _find_qemu_img(self):
         """
-        Use qemu-img to convert the given disk.  Note that at least some
-        version of qemu-img cannot handle multi-file VMDKs, so this can
-        easily go wrong.
         Gentoo, Debian, and Ubuntu (potentially others) install kvm-img
         with kvm and qemu-img with qemu. Both would work.
         """
         binnames = ["qemu-img", "kvm-img"]
-
-        decompress_cmd = None
-
         if _is_test():
-            executable = "/usr/bin/qemu-img"
-        else:
-            for binname in binnames:
-                executable = find_executable(binname)
-                if executable:
-                    break
+            return "/usr/bin/qemu-img"
 
-        if executable is None:
-            raise RuntimeError(_("None of %s tools found.") % binnames)
+        for binname in binnames:
+            executable = find_executable(binname)
+            if executable:
+                return executable
+        raise RuntimeError(_("None of %s tools found.") % binnames)
+
+    def _qemu_convert(self, absin, absout, disk_format):
+        """
+        Use qemu-img to convert the given disk.  Note that at least some
+        version of qemu-img cannot handle multi-file VMDKs, so this can
+        easily go wrong.
+        """
+        executable = self._find_qemu_img()
+        decompress_cmd = None
 
         base = os.path.basename(absin)
         ext = os.path.splitext(base)[1]
@@ -271,18 +282,107 @@ class VirtConverter(object):
             self.print_cb("Running %s" % " ".join(decompress_cmd))
         cmd = [executable, "convert", "-O", disk_format, base, absout]
         self.print_cb("Running %s" % " ".join(cmd))
-        if dry:
-            return
 
         cmd[4] = absin
-        if decompress_cmd is not None:
-            _run_cmd(decompress_cmd)
-        _run_cmd(cmd)
+        def _job():
+            if decompress_cmd is not None:
+                _run_cmd(decompress_cmd)
+            _run_cmd(cmd)
+        return _job
+
+    def _find_archive_member(self, path):
+        """
+        Map a disk path from the parsed config to a member of the input
+        archive, if it isn't a file on disk
+        """
+        if not self._archive or not path or os.path.exists(path):
+            return None
+
+        tempdir = self._force_clean[0]
+        topdir = os.path.relpath(self._top_dir, tempdir)
+        candidates = [os.path.relpath(path, tempdir),
+                      os.path.join(topdir, os.path.basename(path))]
+        if not os.path.isabs(path):
+            candidates.insert(0, os.path.join(topdir, path))
+
+        members = self._archive.get_members()
+        for candidate in candidates:
+            candidate = os.path.normpath(candidate)
+            if candidate in members:
+                return candidate
+        return None
+
+    def _stream_member(self, member, absout, disk_format):
+        """
+        Copy or convert a disk image straight out of the input archive,
+        without extracting it to a temporary location first.
+        """
+        archive = self._archive
+        base = os.path.basename(member)
+        decompress = base.endswith(".gz")
+
+        if not disk_format:
+            self.print_cb("Copying %s to %s" % (base, absout))
+            return lambda: archive.extract(member, absout)
+
+        executable = self._find_qemu_img()
+        offset = archive.get_data_offset(member)
+        if offset is not None and not decompress:
+            # The image is stored as is inside the archive file, so
+            # qemu-img can read it in place
+            src = archivemod.build_qemu_img_source(archive.path, offset,
+                    archive.get_size(member))
+            cmd = [executable, "convert", "-O", disk_format, src, absout]
+            self.print_cb("Running %s" % " ".join(cmd))
+            return lambda: _run_cmd(cmd)
+
+        # qemu-img needs random access to the image, so stream it out
+        # of the compressed archive next to the destination file
+        stagepath = absout + ".part"
+        cmd = [executable, "convert", "-O", disk_format, stagepath, absout]
+        self.print_cb("Extracting %s to %s" % (base, stagepath))
+        self.print_cb("Running %s" % " ".join(cmd))
+
+        def _job():
+            try:
+                archive.extract(member, stagepath, decompress=decompress)
+                _run_cmd(cmd)
+            finally:
+                if os.path.exists(stagepath):
+                    os.unlink(stagepath)
+        return _job
+
+    def _run_jobs(self, jobs):
+        """
+        Run the disk copy/convert jobs, up to _CONVERT_WORKERS at a time.
+        If any job fails, cancel the pending ones and raise the error.
+        """
+        if len(jobs) <= 1:
+            for job in jobs:
+                job()
+            return
+
+        error = None
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=min(len(jobs), _CONVERT_WORKERS),
+                thread_name_prefix="convert-disk") as executor:
+            futures = [executor.submit(job) for job in jobs]
+            for future in concurrent.futures.as_completed(futures):
+                if future.cancelled() or future.exception() is None:
+                    continue
+                if error is None:
+                    error = future.exception()
+                    for f in futures:
+                        f.cancel()
+
+        if error is not None:
+            raise error
 
     def convert_disks(self, disk_format, destdir=None, dry=False):
         """
         Convert a disk into the requested format if possible, in the
         given output directory.  Raises RuntimeError or other failures.
+        Disks are copied/converted in parallel.
         """
         if disk_format == "none":
             disk_format = None
@@ -291,6 +391,7 @@ class VirtConverter(object):
             destdir = StoragePool.get_default_dir(self.conn, build=not dry)
 
         guest = self.get_guest()
+        jobs = []
         for disk in guest.devices.disk:
             if disk.device != "disk":
                 continue
@@ -309,10 +410,17 @@ class VirtConverter(object):
                 raise RuntimeError(_("New path name '%s' already exists") %
                     newpath)
 
-            if not disk_format or disk_format == "none":
-                self._copy_file(disk.path, newpath, dry)
+            member = self._find_archive_member(disk.path)
+            if member:
+                jobs.append(self._stream_member(member, newpath, disk_format))
+            elif not disk_format or disk_format == "none":
+                jobs.append(self._copy_file(disk.path, newpath))
             else:
-                self._qemu_convert(disk.path, newpath, disk_format, dry)
+                jobs.append(self._qemu_convert(disk.path, newpath,
+                                               disk_format))
             disk.driver_type = disk_format
             disk.path = newpath
             self._err_clean.append(newpath)
+
+        if not dry:
+            self._run_jobs(jobs)
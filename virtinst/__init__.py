@@ -24,24 +24,36 @@ def _setup_i18n():
 _setup_i18n()
 
 from virtinst import util
-from virtinst.uri import URI
-from virtinst.osdict import OSDB
-
-from virtinst.domain import *  # pylint: disable=wildcard-import
-
-from virtinst.capabilities import Capabilities
-from virtinst.domcapabilities import DomainCapabilities
-from virtinst.interface import Interface, InterfaceProtocol
-from virtinst.network import Network
-from virtinst.nodedev import NodeDevice
-from virtinst.storage import StoragePool, StorageVolume
-
-from virtinst.devices import *  # pylint: disable=wildcard-import
-
-from virtinst.installer import Installer
-
-from virtinst.guest import Guest
-from virtinst.cloner import Cloner
-from virtinst.snapshot import DomainSnapshot
-
-from virtinst.connection import VirtinstConnection
+from virtinst import devices as _devices
+from virtinst import domain as _domain
+
+# Public API names and the module that provides them. Importing
+# virtinst is kept cheap for the command line tools, the modules are
+# only loaded when one of their names is first accessed.
+_LAZY_ATTRS = {
+    "URI": ".uri",
+    "OSDB": ".osdict",
+
+    "Capabilities": ".capabilities",
+    "DomainCapabilities": ".domcapabilities",
+    "Interface": ".interface",
+    "InterfaceProtocol": ".interface",
+    "Network": ".network",
+    "NodeDevice": ".nodedev",
+    "NodeDeviceIndex": ".nodedev",
+    "StoragePool": ".storage",
+    "StorageVolume": ".storage",
+
+    "Installer": ".installer",
+    "LocationFetchCache": ".installertreemedia",
+
+    "Guest": ".guest",
+    "Cloner": ".cloner",
+    "DomainSnapshot": ".snapshot",
+
+    "VirtinstConnection": ".connection",
+}
+_LAZY_ATTRS.update(dict((name, ".domain") for name in _domain.__all__))
+_LAZY_ATTRS.update(dict((name, ".devices") for name in _devices.__all__))
+
+__getattr__ = util.make_lazy_getattr(__name__, _LAZY_ATTRS)
@@ -28,7 +28,6 @@ from .devices import (Device, DeviceController, DeviceDisk, DeviceGraphics,
 from .domain import DomainClock, DomainOs
 from .nodedev import NodeDevice
 from .storage import StoragePool, StorageVolume
-from .unattended import UnattendedData
 
 
 ##########################
@@ -219,6 +218,7 @@ def getConnection(uri):
     conn = VirtinstConnection(uri)
     conn.open(_openauth_cb, None)
     logging.debug("Received libvirt URI %s", conn.uri)
+    conn.enable_disk_cache()
 
     return conn
 
@@ -1430,6 +1430,7 @@ class ParseUnattended(VirtCLIParser):
 
 
 def parse_unattended(unattended):
+    from .unattended import UnattendedData
     ret = UnattendedData()
     parser = ParseUnattended(None, unattended)
     parser.parse(ret)
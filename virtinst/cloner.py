@@ -7,12 +7,15 @@
 # This work is licensed under the GNU GPLv2 or later.
 # See the COPYING file in the top-level directory.
 
+import concurrent.futures
 import logging
 import re
 import os
+import threading
 
 import libvirt
 
+from . import progress
 from . import util
 from .guest import Guest
 from .devices import DeviceInterface
@@ -21,6 +24,63 @@ from .storage import StorageVolume
 from .devices import DeviceChannel
 
 
+class _CloneCancelled(Exception):
+    pass
+
+
+class _DiskCloneMeter(progress.BaseMeter):
+    """
+    Per disk meter handed to DeviceDisk.build_storage, which forwards
+    progress to the shared _AggregateCloneMeter
+    """
+    def __init__(self, parent, key, size, cancellable):
+        progress.BaseMeter.__init__(self)
+        self._parent = parent
+        self._key = key
+        self._size = size
+        self._cancellable = cancellable
+
+    def start(self, *args, **kwargs):
+        ignore = args
+        ignore = kwargs
+
+    def update(self, amount_read, now=None):
+        # Raising here aborts local copies. Libvirt volume creation can't
+        # be interrupted, and calls us from its own progress thread.
+        if self._cancellable and self._parent.cancelled.is_set():
+            raise _CloneCancelled()
+        self._parent.disk_update(self._key, min(amount_read, self._size))
+
+    def end(self, amount_read, now=None):
+        self._parent.disk_update(self._key, self._size)
+
+
+class _AggregateCloneMeter(object):
+    """
+    Merges progress of multiple concurrent disk clones into one meter
+    """
+    def __init__(self, meter, total_size, text):
+        self._meter = meter
+        self._lock = threading.Lock()
+        self._amounts = {}
+        self.cancelled = threading.Event()
+
+        self._meter.start(size=total_size, text=text)
+
+    def make_disk_meter(self, key, size, cancellable):
+        self._amounts[key] = 0
+        return _DiskCloneMeter(self, key, size, cancellable)
+
+    def disk_update(self, key, amount):
+        with self._lock:
+            self._amounts[key] = amount
+            self._meter.update(sum(self._amounts.values()))
+
+    def end(self):
+        with self._lock:
+            self._meter.end(sum(self._amounts.values()))
+
+
 class Cloner(object):
 
     # Reasons why we don't default to cloning.
@@ -54,6 +114,7 @@ class Cloner(object):
         self._clone_running = False
         self._replace = False
         self._reflink = False
+        self._concurrency = 1
 
         # Default clone policy for back compat: don't clone readonly,
         # shareable, or empty disks
@@ -243,6 +304,16 @@ class Cloner(object):
         self._reflink = reflink
     reflink = property(_get_reflink, _set_reflink)
 
+    # Max number of disks to copy at the same time
+    def _get_concurrency(self):
+        return self._concurrency
+    def _set_concurrency(self, val):
+        val = int(val)
+        if val < 1:
+            raise ValueError(_("Clone concurrency must be at least 1"))
+        self._concurrency = val
+    concurrency = property(_get_concurrency, _set_concurrency)
+
 
     ######################
     # Functional methods #
@@ -455,10 +526,7 @@ class Cloner(object):
             dom = self.conn.defineXML(self.clone_xml)
 
             if self.preserve:
-                for dst_dev in self.clone_disks:
-                    dst_dev.build_storage(meter)
-                if self._nvram_disk:
-                    self._nvram_disk.build_storage(meter)
+                self._build_clone_storage(meter)
         except Exception as e:
             logging.debug("Duplicate failed: %s", str(e))
             if dom:
@@ -467,6 +535,81 @@ class Cloner(object):
 
         logging.debug("Duplicating finished.")
 
+    def _build_clone_storage(self, meter):
+        """
+        Create storage for all the clone disks, up to self.concurrency at
+        a time. If any disk fails, cancel the pending clones and remove
+        any storage we created.
+        """
+        disks = self.clone_disks[:]
+        if self._nvram_disk:
+            disks.append(self._nvram_disk)
+
+        # Local paths which didn't exist before we started, so are safe
+        # to remove if the clone fails partway through
+        new_local_paths = [d.path for d in disks
+                           if not d.get_vol_install() and d.path and
+                           not os.path.exists(d.path)]
+
+        try:
+            if self.concurrency <= 1 or len(disks) <= 1:
+                for disk in disks:
+                    disk.build_storage(meter)
+            else:
+                self._build_clone_storage_concurrent(disks, meter)
+        except Exception:
+            self._cleanup_clone_storage(disks, new_local_paths)
+            raise
+
+    def _build_clone_storage_concurrent(self, disks, meter):
+        meter = util.ensure_meter(meter)
+        sizes = [int((d.get_size() or 0) * 1024 * 1024 * 1024)
+                 for d in disks]
+        aggmeter = _AggregateCloneMeter(meter, sum(sizes),
+                _("Cloning %d disks") % len(disks))
+
+        logging.debug("Cloning %d disks, concurrency=%d",
+                      len(disks), self.concurrency)
+        with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.concurrency,
+                thread_name_prefix="clone-disk") as executor:
+            futures = []
+            for idx, disk in enumerate(disks):
+                diskmeter = aggmeter.make_disk_meter(idx, sizes[idx],
+                        not disk.get_vol_install())
+                futures.append(executor.submit(disk.build_storage, diskmeter))
+
+            error = None
+            for future in concurrent.futures.as_completed(futures):
+                if future.cancelled():
+                    continue
+                e = future.exception()
+                if e is None or isinstance(e, _CloneCancelled):
+                    continue
+                if error is None:
+                    error = e
+                    aggmeter.cancelled.set()
+                    for f in futures:
+                        f.cancel()
+
+        if error is not None:
+            raise error
+        aggmeter.end()
+
+    def _cleanup_clone_storage(self, disks, new_local_paths):
+        for disk in disks:
+            try:
+                vol = disk.storage_was_created and disk.get_vol_object()
+                if vol:
+                    logging.debug("Removing cloned volume %s", disk.path)
+                    vol.delete(0)
+                elif disk.path in new_local_paths and os.path.exists(disk.path):
+                    logging.debug("Removing cloned file %s", disk.path)
+                    os.unlink(disk.path)
+            except Exception:
+                logging.debug("Error cleaning up clone storage %s",
+                              disk.path, exc_info=True)
+
     def generate_clone_disk_path(self, origpath, newname=None):
         origname = self.original_guest
         newname = newname or self.clone_name
@@ -0,0 +1,137 @@
+#
+# Copyright 2019 Red Hat, Inc.
+#
+# This work is licensed under the GNU GPLv2 or later.
+# See the COPYING file in the top-level directory.
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from virtcli import CLIConfig
+
+from . import support
+
+
+# Bump this if the format of the cache file changes
+_CACHE_VERSION = 1
+
+_SUPPORT_NAMES = dict((getattr(support, name), name) for name in
+                      dir(support) if name.startswith("SUPPORT_"))
+
+
+def _get_cache_path(uri):
+    from . import util
+    uristr = hashlib.sha256(uri.encode("utf-8")).hexdigest()
+    return os.path.join(util.get_cache_dir(), "conncache", uristr + ".json")
+
+
+class ConnectionCache(object):
+    """
+    On disk cache of static connection data: support check results,
+    capabilities XML, and domain capabilities XML. The cache is tied to
+    the libvirt library, daemon, and hypervisor versions, so any version
+    change throws the cached data away.
+
+    :param uri: Connection URI the data belongs to
+    :param stamp: dict of version info that must match the cached copy
+    :param path: Optional path to the cache file
+    """
+    def __init__(self, uri, stamp, path=None):
+        self._path = path or _get_cache_path(uri)
+        self._stamp = stamp.copy()
+        self._stamp["uri"] = uri
+        self._stamp["virtinst"] = CLIConfig.version
+
+        self._data = self._read() or {}
+        self._data.setdefault("support", {})
+        self._data.setdefault("domcaps", {})
+
+
+    ###################
+    # Private helpers #
+    ###################
+
+    def _read(self):
+        if not os.path.exists(self._path):
+            return None
+
+        try:
+            with open(self._path) as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.debug("Error reading connection cache %s: %s",
+                    self._path, e)
+            return None
+
+        if (data.get("version") != _CACHE_VERSION or
+            data.get("stamp") != self._stamp):
+            logging.debug("Connection cache %s is out of date", self._path)
+            return None
+
+        logging.debug("Using connection cache %s", self._path)
+        return data
+
+    def _write(self):
+        self._data["version"] = _CACHE_VERSION
+        self._data["stamp"] = self._stamp
+
+        try:
+            dirname = os.path.dirname(self._path)
+            if not os.path.exists(dirname):
+                os.makedirs(dirname, 0o700)
+            fd, tmppath = tempfile.mkstemp(dir=dirname, prefix=".conncache")
+            with os.fdopen(fd, "w") as f:
+                json.dump(self._data, f)
+            os.rename(tmppath, self._path)
+        except Exception as e:
+            logging.debug("Error writing connection cache %s: %s",
+                    self._path, e)
+
+    def _set(self, section, key, value):
+        if section:
+            store = self._data[section]
+        else:
+            store = self._data
+        if store.get(key) == value:
+            return
+        store[key] = value
+        self._write()
+
+
+    ##############
+    # Public API #
+    ##############
+
+    def get_support(self, feature):
+        """
+        Return cached result of support check @feature, or None
+        """
+        return self._data["support"].get(_SUPPORT_NAMES.get(feature))
+
+    def set_support(self, feature, value):
+        if feature not in _SUPPORT_NAMES:
+            return
+        self._set("support", _SUPPORT_NAMES[feature], bool(value))
+
+    def get_caps_xml(self):
+        return self._data.get("caps")
+
+    def set_caps_xml(self, xml):
+        self._set(None, "caps", xml)
+
+    def get_domcaps_xml(self, key):
+        return self._data["domcaps"].get(json.dumps(key))
+
+    def set_domcaps_xml(self, key, xml):
+        self._set("domcaps", json.dumps(key), xml)
+
+    def invalidate_caps(self):
+        """
+        Drop all cached capabilities XML
+        """
+        self._data.pop("caps", None)
+        self._data["domcaps"] = {}
+        self._write()
@@ -5,6 +5,7 @@
 # See the COPYING file in the top-level directory.
 
 import logging
+import os
 import weakref
 
 import libvirt
@@ -13,8 +14,9 @@ from . import pollhelpers
 from . import support
 from . import util
 from . import Capabilities
+from .conncache import ConnectionCache
 from .guest import Guest
-from .nodedev import NodeDevice
+from .nodedev import NodeDevice, NodeDeviceIndex
 from .storage import StoragePool, StorageVolume
 from .uri import URI, MagicURI
 
@@ -59,6 +61,8 @@ class VirtinstConnection(object):
 
         self._support_cache = {}
         self._fetch_cache = {}
+        self._domcaps_cache = {}
+        self._disk_cache = None
 
         # These let virt-manager register a callback which provides its
         # own cached object lists, rather than doing fresh calls
@@ -66,6 +70,7 @@ class VirtinstConnection(object):
         self.cb_fetch_all_pools = None
         self.cb_fetch_all_vols = None
         self.cb_fetch_all_nodedevs = None
+        self.cb_get_nodedev_index = None
         self.cb_cache_new_pool = None
 
 
@@ -87,8 +92,12 @@ class VirtinstConnection(object):
 
     def _get_caps(self):
         if not self._caps:
-            self._caps = Capabilities(self,
-                self._libvirtconn.getCapabilities())
+            xml = self._disk_cache and self._disk_cache.get_caps_xml()
+            if not xml:
+                xml = self._libvirtconn.getCapabilities()
+                if self._disk_cache:
+                    self._disk_cache.set_caps_xml(xml)
+            self._caps = Capabilities(self, xml)
         return self._caps
     caps = property(_get_caps)
 
@@ -110,6 +119,7 @@ class VirtinstConnection(object):
         self._libvirtconn = None
         self._uri = None
         self._fetch_cache = {}
+        self._disk_cache = None
         return ret
 
     def fake_conn_predictable(self):
@@ -117,6 +127,48 @@ class VirtinstConnection(object):
 
     def invalidate_caps(self):
         self._caps = None
+        self._domcaps_cache = {}
+        if self._disk_cache:
+            self._disk_cache.invalidate_caps()
+
+    def get_domain_capabilities_xml(self, emulator, arch, machine, hvtype):
+        """
+        Cached wrapper around getDomainCapabilities, so creating many
+        guests with the same connection only fetches the XML once
+        """
+        key = (emulator, arch, machine, hvtype)
+        if key not in self._domcaps_cache:
+            xml = (self._disk_cache and
+                   self._disk_cache.get_domcaps_xml(key))
+            if not xml:
+                xml = self._libvirtconn.getDomainCapabilities(
+                    emulator, arch, machine, hvtype)
+                if self._disk_cache:
+                    self._disk_cache.set_domcaps_xml(key, xml)
+            self._domcaps_cache[key] = xml
+        return self._domcaps_cache[key]
+
+    def enable_disk_cache(self, path=None):
+        """
+        Persist support check results and capabilities XML in an on
+        disk cache, shared between processes. Meant for short lived
+        command line tools, where fetching this data over and over
+        dominates startup time against remote hosts.
+
+        The cache is keyed by URI and library, daemon, and hypervisor
+        versions, so a version change invalidates it.
+        """
+        if self._magic_uri or self.is_really_test():
+            return
+        if "VIRTINST_TEST_SUITE" in os.environ and not path:
+            return
+
+        stamp = {
+            "libvirt": self.local_libvirt_version(),
+            "daemon": self.daemon_version(),
+            "hypervisor": self.conn_version(),
+        }
+        self._disk_cache = ConnectionCache(self.uri, stamp, path=path)
 
     def is_open(self):
         return bool(self._libvirtconn)
@@ -158,6 +210,7 @@ class VirtinstConnection(object):
     _FETCH_KEY_POOLS = "pools"
     _FETCH_KEY_VOLS = "vols"
     _FETCH_KEY_NODEDEVS = "nodedevs"
+    _FETCH_KEY_NODEDEV_INDEX = "nodedev-index"
 
     def _fetch_all_domains_raw(self):
         ignore, ignore, ret = pollhelpers.fetch_vms(
@@ -276,6 +329,19 @@ class VirtinstConnection(object):
             self._fetch_cache[key] = self._fetch_all_nodedevs_raw()
         return self._fetch_cache[key][:]
 
+    def get_nodedev_index(self):
+        """
+        Returns a NodeDeviceIndex of every node device
+        """
+        if self.cb_get_nodedev_index:
+            return self.cb_get_nodedev_index()  # pylint: disable=not-callable
+
+        key = self._FETCH_KEY_NODEDEV_INDEX
+        if key not in self._fetch_cache:
+            self._fetch_cache[key] = NodeDeviceIndex(
+                self.fetch_all_nodedevs())
+        return self._fetch_cache[key]
+
 
     #########################
     # Libvirt API overrides #
@@ -384,10 +450,21 @@ class VirtinstConnection(object):
 
 
     def check_support(self, features, data=None):
+        # Only checks against the connection itself can be shared
+        # with other processes
+        use_disk_cache = bool(self._disk_cache and
+                              (data is None or data is self))
+
         def _check_support(key):
             if key not in self._support_cache:
-                self._support_cache[key] = support.check_support(
-                    self, key, data or self)
+                ret = None
+                if use_disk_cache:
+                    ret = self._disk_cache.get_support(key)
+                if ret is None:
+                    ret = support.check_support(self, key, data or self)
+                    if use_disk_cache:
+                        self._disk_cache.set_support(key, ret)
+                self._support_cache[key] = ret
             return self._support_cache[key]
 
         for f in util.listify(features):
@@ -3,27 +3,35 @@
 # This work is licensed under the GNU GPLv2 or later.
 # See the COPYING file in the top-level directory.
 
+from .. import util as _util
 
-from .char import DeviceChannel, DeviceConsole, DeviceParallel, DeviceSerial
-from .controller import DeviceController
-from .device import Device
-from .disk import DeviceDisk
-from .filesystem import DeviceFilesystem
-from .graphics import DeviceGraphics
-from .hostdev import DeviceHostdev
-from .input import DeviceInput
-from .interface import DeviceInterface
-from .memballoon import DeviceMemballoon
-from .memory import DeviceMemory
-from .panic import DevicePanic
-from .smartcard import DeviceSmartcard
-from .sound import DeviceSound
-from .redirdev import DeviceRedirdev
-from .rng import DeviceRng
-from .tpm import DeviceTpm
-from .video import DeviceVideo
-from .vsock import DeviceVsock
-from .watchdog import DeviceWatchdog
+# Map of public class name -> submodule. Submodules are only
+# imported when the class is first accessed
+_LAZY_ATTRS = {
+    "DeviceChannel": ".char",
+    "DeviceConsole": ".char",
+    "DeviceParallel": ".char",
+    "DeviceSerial": ".char",
+    "DeviceController": ".controller",
+    "Device": ".device",
+    "DeviceDisk": ".disk",
+    "DeviceFilesystem": ".filesystem",
+    "DeviceGraphics": ".graphics",
+    "DeviceHostdev": ".hostdev",
+    "DeviceInput": ".input",
+    "DeviceInterface": ".interface",
+    "DeviceMemballoon": ".memballoon",
+    "DeviceMemory": ".memory",
+    "DevicePanic": ".panic",
+    "DeviceSmartcard": ".smartcard",
+    "DeviceSound": ".sound",
+    "DeviceRedirdev": ".redirdev",
+    "DeviceRng": ".rng",
+    "DeviceTpm": ".tpm",
+    "DeviceVideo": ".video",
+    "DeviceVsock": ".vsock",
+    "DeviceWatchdog": ".watchdog",
+}
 
-
-__all__ = [l for l in locals() if l.startswith("Device")]
+__all__ = sorted(_LAZY_ATTRS)
+__getattr__ = _util.make_lazy_getattr(__name__, _LAZY_ATTRS)
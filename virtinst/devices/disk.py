@@ -256,6 +256,43 @@ class DeviceDisk(Device):
 
         return ret
 
+    @staticmethod
+    def get_paths_in_use_map(conn):
+        """
+        Return a dict mapping every path used by a VM to the list of VM
+        names using it, either directly or via a volume backing chain.
+        Equivalent to calling path_in_use_by for every path, but only
+        scans the VM and volume lists once.
+
+        :param conn: virConnect to check VMs
+        """
+        # Map of volume path -> its backing store path
+        backingmap = dict((vol.target_path, vol.backing_store)
+                          for vol in conn.fetch_all_vols()
+                          if vol.target_path and vol.backing_store)
+
+        ret = {}
+        def _add(path, name):
+            if not path:
+                return
+            names = ret.setdefault(path, [])
+            if name not in names:
+                names.append(name)
+
+        for vm in conn.fetch_all_domains():
+            for path in [vm.os.kernel, vm.os.initrd, vm.os.dtb]:
+                _add(path, vm.name)
+
+            for disk in vm.devices.disk:
+                backpath = disk.path
+                seen = []
+                while backpath and backpath not in seen:
+                    seen.append(backpath)
+                    _add(backpath, vm.name)
+                    backpath = backingmap.get(backpath)
+
+        return ret
+
     @staticmethod
     def build_vol_install(conn, volname, poolobj, size, sparse,
                           fmt=None, backing_store=None, backing_format=None):
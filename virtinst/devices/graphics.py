@@ -257,9 +257,8 @@ class DeviceGraphics(Device):
         # the first one
         if not self.rendernode and self.conn.check_support(
                 self.conn.SUPPORT_CONN_SPICE_RENDERNODE):
-            for nodedev in self.conn.fetch_all_nodedevs():
-                if (nodedev.device_type != 'drm' or
-                    nodedev.drm_type != 'render'):
+            for nodedev in self.conn.get_nodedev_index().filter('drm'):
+                if nodedev.drm_type != 'render':
                     continue
                 self.rendernode = nodedev.get_devnode().path
                 break
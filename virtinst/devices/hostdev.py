@@ -31,13 +31,8 @@ class DeviceHostdev(Device):
             self.vendor = nodedev.vendor_id
             self.product = nodedev.product_id
 
-            count = 0
-
-            for dev in self.conn.fetch_all_nodedevs():
-                if (dev.device_type == NodeDevice.CAPABILITY_TYPE_USBDEV and
-                    dev.vendor_id == self.vendor and
-                    dev.product_id == self.product):
-                    count += 1
+            count = len(self.conn.get_nodedev_index().find_by_ids(
+                self.vendor, self.product, NodeDevice.CAPABILITY_TYPE_USBDEV))
 
             if not count:
                 raise RuntimeError(_("Could not find USB device "
@@ -49,12 +44,8 @@ class DeviceHostdev(Device):
                 self.device = nodedev.device
 
         elif nodedev.device_type == nodedev.CAPABILITY_TYPE_NET:
-            founddev = None
-            for checkdev in self.conn.fetch_all_nodedevs():
-                if checkdev.name == nodedev.parent:
-                    founddev = checkdev
-                    break
-
+            founddev = self.conn.get_nodedev_index().lookup_name(
+                nodedev.parent)
             self.set_from_nodedev(founddev)
 
         elif nodedev.device_type == nodedev.CAPABILITY_TYPE_SCSIDEV:
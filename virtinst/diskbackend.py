@@ -6,6 +6,7 @@
 # This work is licensed under the GNU GPLv2 or later.
 # See the COPYING file in the top-level directory.
 
+import errno
 import logging
 import os
 import re
@@ -550,14 +551,15 @@ class CloneStorageCreator(_StorageCreator):
         text = (_("Cloning %(srcfile)s") %
                 {'srcfile': os.path.basename(self._input_path)})
 
-        size_bytes = int(self.get_size()) * 1024 * 1024 * 1024
+        # Only used for the meter, the copy goes until the source EOF
+        size_bytes = int(float(self.get_size()) * 1024 * 1024 * 1024)
         progresscb.start(filename=self._output_path, size=size_bytes,
                          text=text)
 
         # Plain file clone
-        self._clone_local(progresscb, size_bytes)
+        self._clone_local(progresscb)
 
-    def _clone_local(self, meter, size_bytes):
+    def _clone_local(self, meter):
         if self._input_path == "/dev/null":
             # Not really sure why this check is here,
             # but keeping for compat
@@ -569,27 +571,10 @@ class CloneStorageCreator(_StorageCreator):
 
         # If a destination file exists and sparse flag is True,
         # this priority takes an existing file.
+        sparse = bool(not os.path.exists(self._output_path) and self._sparse)
 
-        if (not os.path.exists(self._output_path) and self._sparse):
-            clone_block_size = 4096
-            sparse = True
-            fd = None
-            try:
-                fd = os.open(self._output_path, os.O_WRONLY | os.O_CREAT,
-                             0o640)
-                os.ftruncate(fd, size_bytes)
-            finally:
-                if fd:
-                    os.close(fd)
-        else:
-            clone_block_size = 1024 * 1024 * 10
-            sparse = False
-
-        logging.debug("Local Cloning %s to %s, sparse=%s, block_size=%s",
-                      self._input_path, self._output_path,
-                      sparse, clone_block_size)
-
-        zeros = '\0' * 4096
+        logging.debug("Local Cloning %s to %s, sparse=%s",
+                      self._input_path, self._output_path, sparse)
 
         src_fd, dst_fd = None, None
         try:
@@ -597,25 +582,7 @@ class CloneStorageCreator(_StorageCreator):
                 src_fd = os.open(self._input_path, os.O_RDONLY)
                 dst_fd = os.open(self._output_path,
                                  os.O_WRONLY | os.O_CREAT, 0o640)
-
-                i = 0
-                while 1:
-                    l = os.read(src_fd, clone_block_size)
-                    s = len(l)
-                    if s == 0:
-                        meter.end(size_bytes)
-                        break
-                    # check sequence of zeros
-                    if sparse and zeros == l:
-                        os.lseek(dst_fd, s, 1)
-                    else:
-                        b = os.write(dst_fd, l)
-                        if s != b:
-                            meter.end(i)
-                            break
-                    i += s
-                    if i < size_bytes:
-                        meter.update(i)
+                _copy_local_file(src_fd, dst_fd, sparse, meter)
             except OSError as e:
                 raise RuntimeError(_("Error cloning diskimage %s to %s: %s") %
                                 (self._input_path, self._output_path, str(e)))
@@ -626,6 +593,183 @@ class CloneStorageCreator(_StorageCreator):
                 os.close(dst_fd)
 
 
+##########################
+# Local file copy engine #
+##########################
+
+# FICLONE from linux/fs.h, same as 'cp --reflink'
+_FICLONE = 0x40049409
+# Read size for the userspace copy fallback and zero detection
+_COPY_BLOCK_SIZE = 1024 * 1024
+# Max bytes per in-kernel copy call, so the meter still gets updates
+_COPY_KERNEL_CHUNK = 64 * 1024 * 1024
+# errnos meaning 'this copy method isn't supported here', not real errors
+_COPY_UNSUPPORTED_ERRNOS = [errno.EXDEV, errno.EINVAL, errno.ENOSYS,
+                            errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF,
+                            errno.EPERM]
+
+
+def _try_reflink(src_fd, dst_fd):
+    """
+    Try to share the source extents with the destination, if the
+    filesystem supports it (btrfs, XFS with reflink=1, ...)
+    """
+    try:
+        import fcntl
+        fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        return True
+    except (ImportError, IOError, OSError) as e:
+        logging.debug("reflink clone not available: %s", e)
+        return False
+
+
+def _get_data_extents(src_fd, size_bytes):
+    """
+    Return a list of (offset, length) of the allocated regions of src_fd,
+    using SEEK_DATA/SEEK_HOLE. If the platform or filesystem doesn't
+    support that, the whole file is treated as data.
+    """
+    if not hasattr(os, "SEEK_DATA"):
+        return [(0, size_bytes)]
+
+    extents = []
+    offset = 0
+    try:
+        while offset < size_bytes:
+            try:
+                start = os.lseek(src_fd, offset, os.SEEK_DATA)
+            except OSError as e:
+                if e.errno == errno.ENXIO:
+                    # No more data past offset
+                    break
+                raise
+            if start >= size_bytes:
+                break
+            end = min(os.lseek(src_fd, start, os.SEEK_HOLE), size_bytes)
+            extents.append((start, end - start))
+            offset = end
+    except OSError as e:
+        logging.debug("SEEK_DATA not supported, copying everything: %s", e)
+        return [(0, size_bytes)]
+    return extents
+
+
+class _LocalCopier(object):
+    """
+    Copy ranges between two fds, using copy_file_range or sendfile if
+    the kernel supports them for these fds, otherwise read+write.
+    When sparse=True, zero blocks are never written to the destination.
+    """
+    def __init__(self, src_fd, dst_fd, sparse, meter):
+        self._src_fd = src_fd
+        self._dst_fd = dst_fd
+        self._sparse = sparse
+        self._meter = meter
+        self._zeros = bytes(_COPY_BLOCK_SIZE)
+
+        self._kernel_copy = None
+        if not sparse:
+            if hasattr(os, "copy_file_range"):
+                self._kernel_copy = self._copy_file_range
+            elif hasattr(os, "sendfile"):
+                self._kernel_copy = self._sendfile
+
+    def _copy_file_range(self, offset, count):
+        return os.copy_file_range(self._src_fd, self._dst_fd, count,
+                                  offset, offset)
+
+    def _sendfile(self, offset, count):
+        os.lseek(self._dst_fd, offset, os.SEEK_SET)
+        return os.sendfile(self._dst_fd, self._src_fd, offset, count)
+
+    def _copy_range_kernel(self, offset, end):
+        while offset < end:
+            count = min(_COPY_KERNEL_CHUNK, end - offset)
+            try:
+                ret = self._kernel_copy(offset, count)
+            except OSError as e:
+                if e.errno not in _COPY_UNSUPPORTED_ERRNOS:
+                    raise
+                logging.debug("In kernel copy failed, "
+                              "falling back to read/write: %s", e)
+                self._kernel_copy = None
+                return offset
+            if ret == 0:
+                # Source is shorter than expected
+                return end
+            offset += ret
+            self._meter.update(offset)
+        return offset
+
+    def _copy_range_userspace(self, offset, end):
+        os.lseek(self._src_fd, offset, os.SEEK_SET)
+        while offset < end:
+            data = os.read(self._src_fd, min(_COPY_BLOCK_SIZE, end - offset))
+            if not data:
+                break
+
+            if self._sparse and data == self._zeros[:len(data)]:
+                offset += len(data)
+            else:
+                os.lseek(self._dst_fd, offset, os.SEEK_SET)
+                view = memoryview(data)
+                while view:
+                    written = os.write(self._dst_fd, view)
+                    view = view[written:]
+                    offset += written
+            self._meter.update(offset)
+        return offset
+
+    def copy_range(self, offset, length):
+        end = offset + length
+        if self._kernel_copy:
+            offset = self._copy_range_kernel(offset, end)
+        if offset < end:
+            self._copy_range_userspace(offset, end)
+
+
+def _get_fd_size(fd):
+    """
+    Return the byte length of a regular file or block device fd
+    """
+    info = os.fstat(fd)
+    if stat.S_ISREG(info.st_mode):
+        return info.st_size
+    size = os.lseek(fd, 0, os.SEEK_END)
+    os.lseek(fd, 0, os.SEEK_SET)
+    return size
+
+
+def _copy_local_file(src_fd, dst_fd, sparse, meter):
+    """
+    Copy all of src_fd to dst_fd.
+
+    If sparse=True the destination is a freshly created file: we try a
+    reflink first, then only copy the source's allocated extents and skip
+    any zero blocks, leaving holes in the destination.
+
+    If sparse=False every byte is written, since the destination may be
+    a preexisting file or block device with stale contents.
+    """
+    size_bytes = _get_fd_size(src_fd)
+    if sparse:
+        os.ftruncate(dst_fd, size_bytes)
+        srcinfo = os.fstat(src_fd)
+        if stat.S_ISREG(srcinfo.st_mode) and _try_reflink(src_fd, dst_fd):
+            logging.debug("Cloned with reflink")
+            os.ftruncate(dst_fd, size_bytes)
+            meter.end(size_bytes)
+            return
+        extents = _get_data_extents(src_fd, size_bytes)
+    else:
+        extents = [(0, size_bytes)]
+
+    copier = _LocalCopier(src_fd, dst_fd, sparse, meter)
+    for offset, length in extents:
+        copier.copy_range(offset, length)
+    meter.end(size_bytes)
+
+
 class ManagedStorageCreator(_StorageCreator):
     """
     Handles storage creation via libvirt APIs. All the actual creation
@@ -1,22 +1,28 @@
 # This work is licensed under the GNU GPLv2 or later.
 # See the COPYING file in the top-level directory.
 
+from .. import util as _util
 
-from .blkiotune import DomainBlkiotune
-from .clock import DomainClock
-from .cpu import DomainCpu
-from .cputune import DomainCputune
-from .features import DomainFeatures
-from .idmap import DomainIdmap
-from .metadata import DomainMetadata
-from .memorybacking import DomainMemoryBacking
-from .memtune import DomainMemtune
-from .numatune import DomainNumatune
-from .os import DomainOs
-from .pm import DomainPm
-from .resource import DomainResource
-from .seclabel import DomainSeclabel
-from .sysinfo import DomainSysinfo
-from .xmlnsqemu import DomainXMLNSQemu
+# Map of public class name -> submodule. Submodules are only
+# imported when the class is first accessed
+_LAZY_ATTRS = {
+    "DomainBlkiotune": ".blkiotune",
+    "DomainClock": ".clock",
+    "DomainCpu": ".cpu",
+    "DomainCputune": ".cputune",
+    "DomainFeatures": ".features",
+    "DomainIdmap": ".idmap",
+    "DomainMetadata": ".metadata",
+    "DomainMemoryBacking": ".memorybacking",
+    "DomainMemtune": ".memtune",
+    "DomainNumatune": ".numatune",
+    "DomainOs": ".os",
+    "DomainPm": ".pm",
+    "DomainResource": ".resource",
+    "DomainSeclabel": ".seclabel",
+    "DomainSysinfo": ".sysinfo",
+    "DomainXMLNSQemu": ".xmlnsqemu",
+}
 
-__all__ = [l for l in locals() if l.startswith("Domain")]
+__all__ = sorted(_LAZY_ATTRS)
+__getattr__ = _util.make_lazy_getattr(__name__, _LAZY_ATTRS)
@@ -144,7 +144,7 @@ class DomainCapabilities(XMLBuilder):
         if conn.check_support(
                 conn.SUPPORT_CONN_DOMAIN_CAPABILITIES):
             try:
-                xml = conn.getDomainCapabilities(emulator, arch,
+                xml = conn.get_domain_capabilities_xml(emulator, arch,
                     machine, hvtype)
             except Exception:
                 logging.debug("Error fetching domcapabilities XML",
@@ -161,7 +161,7 @@ class Guest(XMLBuilder):
         self.skip_default_usbredir = False
         self.skip_default_graphics = False
         self.skip_default_rng = False
-        self.x86_cpu_default = self.cpu.SPECIAL_MODE_APP_DEFAULT
+        self.x86_cpu_default = DomainCpu.SPECIAL_MODE_APP_DEFAULT
 
         self.__osinfo = None
         self._capsinfo = None
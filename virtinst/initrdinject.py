@@ -4,52 +4,89 @@
 # This work is licensed under the GNU GPLv2 or later.
 # See the COPYING file in the top-level directory.
 
+import gzip
 import logging
 import os
-import shutil
-import subprocess
-import tempfile
+import stat
 
 
-def perform_initrd_injections(initrd, injections, scratchdir):
+# Same block size that GNU cpio pads its output archives to
+_CPIO_BLOCKSIZE = 512
+_CPIO_TRAILER = "TRAILER!!!"
+_READ_SIZE = 1024 * 1024
+
+
+def _pad4(length):
+    return (4 - (length % 4)) % 4
+
+
+class _NewcWriter(object):
+    """
+    Minimal streaming writer for the 'newc' cpio format, the only
+    format the kernel accepts for an initramfs.
+    """
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+        self._ino = 0
+        self._written = 0
+
+    def _write(self, data):
+        self._fileobj.write(data)
+        self._written += len(data)
+
+    def _write_header(self, name, mode, mtime, filesize, nlink=1):
+        self._ino += 1
+        namebytes = name.encode("utf-8") + b"\0"
+        fields = [self._ino, mode, 0, 0, nlink, mtime, filesize,
+                  0, 0, 0, 0, len(namebytes), 0]
+        header = b"070701" + b"".join(
+                [("%08X" % (f & 0xFFFFFFFF)).encode("ascii")
+                 for f in fields])
+        self._write(header + namebytes)
+        self._write(b"\0" * _pad4(len(header) + len(namebytes)))
+
+    def add_file(self, path, name):
+        """
+        Stream the contents of @path into the archive as @name
+        """
+        with open(path, "rb") as src:
+            st = os.fstat(src.fileno())
+            mode = stat.S_IFREG | stat.S_IMODE(st.st_mode)
+            self._write_header(name, mode, int(st.st_mtime), st.st_size)
+
+            remaining = st.st_size
+            while remaining > 0:
+                data = src.read(min(_READ_SIZE, remaining))
+                if not data:
+                    raise RuntimeError(
+                        "%s changed size while being added to the initrd" %
+                        path)
+                self._write(data)
+                remaining -= len(data)
+        self._write(b"\0" * _pad4(st.st_size))
+
+    def close(self):
+        self._write_header(_CPIO_TRAILER, 0, 0, 0, nlink=1)
+        self._write(b"\0" * ((_CPIO_BLOCKSIZE -
+            (self._written % _CPIO_BLOCKSIZE)) % _CPIO_BLOCKSIZE))
+
+
+def perform_initrd_injections(initrd, injections):
     """
     Insert files into the root directory of the initial ram disk
+
+    The files are written as a gzip compressed newc cpio archive that is
+    appended to @initrd, which the kernel will unpack on top of the
+    existing initramfs contents.
     """
     if not injections:
         return
 
-    tempdir = tempfile.mkdtemp(dir=scratchdir)
-    os.chmod(tempdir, 0o775)
-
-    for filename in injections:
-        logging.debug("Copying %s to the initrd.", filename)
-        shutil.copy(filename, tempdir)
-
     logging.debug("Appending to the initrd.")
-    find_proc = subprocess.Popen(['find', '.', '-print0'],
-                                 stdout=subprocess.PIPE,
-                                 stderr=subprocess.PIPE,
-                                 cwd=tempdir)
-    cpio_proc = subprocess.Popen(['cpio', '-o', '--null', '-Hnewc', '--quiet'],
-                                 stdin=find_proc.stdout,
-                                 stdout=subprocess.PIPE,
-                                 stderr=subprocess.PIPE,
-                                 cwd=tempdir)
-    f = open(initrd, 'ab')
-    gzip_proc = subprocess.Popen(['gzip'], stdin=cpio_proc.stdout,
-                                 stdout=f, stderr=subprocess.PIPE)
-    cpio_proc.wait()
-    find_proc.wait()
-    gzip_proc.wait()
-    f.close()
-    shutil.rmtree(tempdir)
-
-    finderr = find_proc.stderr.read()
-    cpioerr = cpio_proc.stderr.read()
-    gziperr = gzip_proc.stderr.read()
-    if finderr:
-        logging.debug("find stderr=%s", finderr)
-    if cpioerr:
-        logging.debug("cpio stderr=%s", cpioerr)
-    if gziperr:
-        logging.debug("gzip stderr=%s", gziperr)
+    with open(initrd, "ab") as f:
+        with gzip.GzipFile(filename="", mode="wb", fileobj=f) as gz:
+            writer = _NewcWriter(gz)
+            for filename in injections:
+                logging.debug("Copying %s to the initrd.", filename)
+                writer.add_file(filename, os.path.basename(filename))
+            writer.close()
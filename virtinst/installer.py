@@ -34,9 +34,11 @@ class Installer(object):
     :param location_kernel: URL pointing to a kernel to fetch, or a relative
         path to indicate where the kernel is stored in location
     :param location_initrd: location_kernel, but pointing to an initrd
+    :param fetch_cache: LocationFetchCache shared by multiple Installers
+        for the same location, so the media is only fetched once
     """
     def __init__(self, conn, cdrom=None, location=None, install_bootdev=None,
-            location_kernel=None, location_initrd=None):
+            location_kernel=None, location_initrd=None, fetch_cache=None):
         self.conn = conn
 
         self.livecd = False
@@ -67,7 +69,7 @@ class Installer(object):
             self._install_bootdev = "cdrom"
         if location:
             self._treemedia = InstallerTreeMedia(self.conn, location,
-                    location_kernel, location_initrd)
+                    location_kernel, location_initrd, fetch_cache=fetch_cache)
 
 
     ###################
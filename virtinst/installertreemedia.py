@@ -6,6 +6,9 @@
 
 import logging
 import os
+import shutil
+import tempfile
+import threading
 
 from . import unattended
 from . import urldetect
@@ -41,6 +44,45 @@ class _LocationData(object):
             self.kernel_url_arg = osobj.get_kernel_url_arg()
 
 
+class LocationFetchCache(object):
+    """
+    Shares install tree detection and downloaded kernel/initrd files
+    between multiple InstallerTreeMedia using the same location, so
+    installing many guests only fetches the media once.
+
+    Callers must call cleanup() when all the installs are finished.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.fetcher = None
+        self.location_data = None
+        self._files = {}
+
+    def acquire_file(self, fetcher, path):
+        """
+        Download path via fetcher once, then return a private copy
+        of it that the caller owns
+        """
+        with self.lock:
+            if path not in self._files:
+                self._files[path] = fetcher.acquireFile(path)
+            origpath = self._files[path]
+
+        fileobj = tempfile.NamedTemporaryFile(dir=fetcher.scratchdir,
+                prefix=os.path.basename(origpath) + ".", delete=False)
+        with fileobj:
+            with open(origpath, "rb") as src:
+                shutil.copyfileobj(src, fileobj)
+        return fileobj.name
+
+    def cleanup(self):
+        with self.lock:
+            for path in self._files.values():
+                logging.debug("Removing %s", path)
+                os.unlink(path)
+            self._files = {}
+
+
 class InstallerTreeMedia(object):
     """
     Class representing --location Tree media. Can be one of
@@ -69,7 +111,8 @@ class InstallerTreeMedia(object):
             raise ValueError(_("Validating install media '%s' failed: %s") %
                 (str(path), e))
 
-    def __init__(self, conn, location, location_kernel, location_initrd):
+    def __init__(self, conn, location, location_kernel, location_initrd,
+                 fetch_cache=None):
         self.conn = conn
         self.location = location
         self._location_kernel = location_kernel
@@ -78,6 +121,10 @@ class InstallerTreeMedia(object):
 
         self._cached_fetcher = None
         self._cached_data = None
+        self._fetch_cache = fetch_cache
+        # The fetcher is shared between threads when using fetch_cache
+        self._fetch_lock = (fetch_cache and fetch_cache.lock or
+                            threading.RLock())
 
         self._tmpfiles = []
         self._tmpvols = []
@@ -107,6 +154,13 @@ class InstallerTreeMedia(object):
     def _get_fetcher(self, guest, meter):
         meter = util.ensure_meter(meter)
 
+        if self._fetch_cache and not self._cached_fetcher:
+            with self._fetch_cache.lock:
+                if not self._fetch_cache.fetcher:
+                    self._fetch_cache.fetcher = urlfetcher.fetcherForURI(
+                        self.location, util.make_scratchdir(guest), meter)
+                self._cached_fetcher = self._fetch_cache.fetcher
+
         if not self._cached_fetcher:
             scratchdir = util.make_scratchdir(guest)
 
@@ -117,27 +171,41 @@ class InstallerTreeMedia(object):
         return self._cached_fetcher
 
     def _get_cached_data(self, guest, fetcher):
+        if self._fetch_cache and not self._cached_data:
+            with self._fetch_cache.lock:
+                if not self._fetch_cache.location_data:
+                    self._fetch_cache.location_data = (
+                        self._detect_location_data(guest, fetcher))
+                self._cached_data = self._fetch_cache.location_data
+
         if not self._cached_data:
-            has_location_kernel = bool(
-                    self._location_kernel and self._location_initrd)
-            store = urldetect.getDistroStore(guest, fetcher,
-                    skip_error=has_location_kernel)
-
-            os_variant = None
-            osinfo_media = None
-            kernel_paths = []
-            if store:
-                kernel_paths = store.get_kernel_paths()
-                os_variant = store.get_osdict_info()
-                osinfo_media = store.get_osinfo_media()
-            if has_location_kernel:
-                kernel_paths = [
-                        (self._location_kernel, self._location_initrd)]
-
-            self._cached_data = _LocationData(os_variant, kernel_paths,
-                    osinfo_media)
+            self._cached_data = self._detect_location_data(guest, fetcher)
         return self._cached_data
 
+    def _detect_location_data(self, guest, fetcher):
+        has_location_kernel = bool(
+                self._location_kernel and self._location_initrd)
+        store = urldetect.getDistroStore(guest, fetcher,
+                skip_error=has_location_kernel)
+
+        os_variant = None
+        osinfo_media = None
+        kernel_paths = []
+        if store:
+            kernel_paths = store.get_kernel_paths()
+            os_variant = store.get_osdict_info()
+            osinfo_media = store.get_osinfo_media()
+        if has_location_kernel:
+            kernel_paths = [
+                    (self._location_kernel, self._location_initrd)]
+
+        return _LocationData(os_variant, kernel_paths, osinfo_media)
+
+    def _acquire_file(self, fetcher, path):
+        if self._fetch_cache:
+            return self._fetch_cache.acquire_file(fetcher, path)
+        return fetcher.acquireFile(path)
+
     def _prepare_kernel_url(self, guest, fetcher):
         cache = self._get_cached_data(guest, fetcher)
 
@@ -147,19 +215,18 @@ class InstallerTreeMedia(object):
                     return kpath, ipath
             raise RuntimeError(_("Couldn't find kernel for install tree."))
 
-        kernelpath, initrdpath = _check_kernel_pairs()
-        kernel = fetcher.acquireFile(kernelpath)
-        self._tmpfiles.append(kernel)
-        initrd = fetcher.acquireFile(initrdpath)
-        self._tmpfiles.append(initrd)
+        with self._fetch_lock:
+            kernelpath, initrdpath = _check_kernel_pairs()
+            kernel = self._acquire_file(fetcher, kernelpath)
+            self._tmpfiles.append(kernel)
+            initrd = self._acquire_file(fetcher, initrdpath)
+            self._tmpfiles.append(initrd)
 
         args = ""
         if not self.location.startswith("/") and cache.kernel_url_arg:
             args += "%s=%s" % (cache.kernel_url_arg, self.location)
 
-        perform_initrd_injections(initrd,
-                                  self.initrd_injections,
-                                  fetcher.scratchdir)
+        perform_initrd_injections(initrd, self.initrd_injections)
 
         kernel, initrd, tmpvols = upload_kernel_initrd(
                 guest.conn, fetcher.scratchdir,
@@ -10,16 +10,17 @@ import os
 from .xmlbuilder import XMLBuilder, XMLProperty, XMLChildProperty
 
 
-def _compare_int(nodedev_val, hostdev_val):
-    def _intify(val):
-        try:
-            if "0x" in str(val):
-                return int(val or '0x00', 16)
-            else:
-                return int(val)
-        except Exception:
-            return -1
+def _intify(val):
+    try:
+        if "0x" in str(val):
+            return int(val or '0x00', 16)
+        else:
+            return int(val)
+    except Exception:
+        return -1
+
 
+def _compare_int(nodedev_val, hostdev_val):
     nodedev_val = _intify(nodedev_val)
     hostdev_val = _intify(hostdev_val)
     return (nodedev_val == hostdev_val or hostdev_val == -1)
@@ -65,9 +66,9 @@ class NodeDevice(XMLBuilder):
                                "enumeration."))
 
         # First try and see if this is a libvirt nodedev name
-        for nodedev in conn.fetch_all_nodedevs():
-            if nodedev.name == idstring:
-                return nodedev
+        nodedev = conn.get_nodedev_index().lookup_name(idstring)
+        if nodedev:
+            return nodedev
 
         try:
             return _AddressStringToNodedev(conn, idstring)
@@ -375,11 +376,11 @@ def _AddressStringToHostdev(conn, addrstr):
 def _AddressStringToNodedev(conn, addrstr):
     hostdev = _AddressStringToHostdev(conn, addrstr)
 
-    # Iterate over node devices and compare
+    # Compare against the candidate node devices
     count = 0
     nodedev = None
 
-    for xmlobj in conn.fetch_all_nodedevs():
+    for xmlobj in conn.get_nodedev_index().find_hostdev_candidates(hostdev):
         if xmlobj.compare_to_hostdev(hostdev):
             nodedev = xmlobj
             count += 1
@@ -415,3 +416,132 @@ def _typeToDeviceClass(t):
         return DRMDevice
     else:
         return NodeDevice
+
+
+class NodeDeviceIndex(object):
+    """
+    Index of NodeDevice objects by name, device_type, capability_type,
+    (vendor_id, product_id) and PCI address, so lookups don't need to
+    scan every device on hosts with thousands of them. Vendor, product
+    and address values are compared as integers, so '0x1d6B' and
+    '0x1D6b' match.
+    """
+    def __init__(self, nodedevs=None):
+        self._names = {}
+        self._types = {}
+        self._caps = {}
+        self._ids = {}
+        self._pciaddrs = {}
+
+        for nodedev in nodedevs or []:
+            self.add(nodedev)
+
+    def __len__(self):
+        return len(self._names)
+
+    @staticmethod
+    def _add_key(table, key, nodedev):
+        table.setdefault(key, {})[nodedev.name] = nodedev
+
+    @staticmethod
+    def _remove_key(table, key, name):
+        entries = table.get(key)
+        if entries is None:
+            return
+        entries.pop(name, None)
+        if not entries:
+            table.pop(key)
+
+    @staticmethod
+    def _get_keys(nodedev):
+        capkey = getattr(nodedev, "capability_type", None)
+
+        idkey = None
+        if (getattr(nodedev, "vendor_id", None) is not None or
+            getattr(nodedev, "product_id", None) is not None):
+            idkey = (_intify(nodedev.vendor_id), _intify(nodedev.product_id))
+
+        pcikey = None
+        if nodedev.device_type == NodeDevice.CAPABILITY_TYPE_PCI:
+            pcikey = (_intify(nodedev.domain), _intify(nodedev.bus),
+                      _intify(nodedev.slot), _intify(nodedev.function))
+        return capkey, idkey, pcikey
+
+    def add(self, nodedev):
+        """
+        Add @nodedev, replacing any device with the same name
+        """
+        self.remove(nodedev.name)
+        capkey, idkey, pcikey = self._get_keys(nodedev)
+
+        self._names[nodedev.name] = (nodedev, capkey, idkey, pcikey)
+        self._add_key(self._types, nodedev.device_type, nodedev)
+        if capkey:
+            self._add_key(self._caps, capkey, nodedev)
+        if idkey:
+            self._add_key(self._ids, idkey, nodedev)
+        if pcikey:
+            self._add_key(self._pciaddrs, pcikey, nodedev)
+
+    def remove(self, name):
+        entry = self._names.pop(name, None)
+        if not entry:
+            return
+        nodedev, capkey, idkey, pcikey = entry
+        self._remove_key(self._types, nodedev.device_type, name)
+        self._remove_key(self._caps, capkey, name)
+        self._remove_key(self._ids, idkey, name)
+        self._remove_key(self._pciaddrs, pcikey, name)
+
+    def lookup_name(self, name):
+        entry = self._names.get(name)
+        return entry and entry[0] or None
+
+    def get_all(self):
+        return [entry[0] for entry in self._names.values()]
+
+    def filter(self, devtype=None, devcap=None):
+        """
+        Return the devices matching @devtype and @devcap, if passed
+        """
+        if devcap:
+            devs = list(self._caps.get(devcap, {}).values())
+            if devtype:
+                devs = [d for d in devs if d.device_type == devtype]
+            return devs
+        if devtype:
+            return list(self._types.get(devtype, {}).values())
+        return self.get_all()
+
+    def find_by_ids(self, vendor, product, devtype=None):
+        """
+        Return the devices with the passed vendor and product IDs
+        """
+        devs = self._ids.get((_intify(vendor), _intify(product)), {})
+        return [d for d in devs.values() if
+                not devtype or d.device_type == devtype]
+
+    def find_by_pci_address(self, domain, bus, slot, function):
+        key = (_intify(domain), _intify(bus), _intify(slot),
+               _intify(function))
+        return list(self._pciaddrs.get(key, {}).values())
+
+    def find_hostdev_candidates(self, hostdev):
+        """
+        Return the devices that might match @hostdev, a superset of the
+        ones where compare_to_hostdev is True
+        """
+        if hostdev.type == "pci":
+            addr = [hostdev.domain, hostdev.bus, hostdev.slot,
+                    hostdev.function]
+            if -1 not in [_intify(val) for val in addr]:
+                return self.find_by_pci_address(*addr)
+            return self.filter(NodeDevice.CAPABILITY_TYPE_PCI)
+
+        if hostdev.type == "usb":
+            if -1 not in [_intify(hostdev.vendor), _intify(hostdev.product)]:
+                return self.find_by_ids(hostdev.vendor, hostdev.product,
+                                        NodeDevice.CAPABILITY_TYPE_USBDEV)
+            return self.filter(NodeDevice.CAPABILITY_TYPE_USBDEV)
+
+        return self.get_all()
@@ -7,8 +7,12 @@
 # See the COPYING file in the top-level directory.
 
 import datetime
+import functools
+import json
 import logging
+import os
 import re
+import tempfile
 
 from gi.repository import Libosinfo
 
@@ -105,13 +109,88 @@ class _OsinfoIter:
         return ret
 
 
+###################
+# On disk OS index #
+###################
+
+# Bump this if the format of the index data changes
+_INDEX_VERSION = 1
+
+# Names of _OsVariant methods whose results are stored in the index.
+# Populated by the @_indexed decorator
+_INDEXED_METHODS = []
+
+
+def _indexed(fn):
+    """
+    Decorator for argument-less _OsVariant methods whose result can be
+    served from the on disk index, without loading the libosinfo DB
+    """
+    _INDEXED_METHODS.append(fn.__name__)
+
+    @functools.wraps(fn)
+    def wrapper(self):
+        if fn.__name__ in self._indexdata:
+            return self._indexdata[fn.__name__]
+        return fn(self)
+    return wrapper
+
+
+def _get_index_path():
+    if "VIRTINST_TEST_SUITE" in os.environ:
+        return None
+    from virtinst import util
+    return os.path.join(util.get_cache_dir(), "osinfo-index.json")
+
+
+def _get_osinfo_db_dirs():
+    """
+    Directories libosinfo loads its default DB from. Honors the same
+    environment overrides as Libosinfo.Loader.process_default_path
+    """
+    userdir = os.environ.get("OSINFO_USER_DIR")
+    if not userdir:
+        configdir = (os.environ.get("XDG_CONFIG_HOME") or
+                     os.path.expanduser("~/.config"))
+        userdir = os.path.join(configdir, "osinfo")
+
+    return [os.environ.get("OSINFO_DATA_DIR") or "",
+            os.environ.get("OSINFO_SYSTEM_DIR") or "/usr/share/osinfo",
+            "/usr/share/libosinfo/db",
+            os.environ.get("OSINFO_LOCAL_DIR") or "/etc/osinfo",
+            userdir]
+
+
+def _get_osinfo_db_stamp():
+    """
+    Return a list of (path, mtime) for every directory of the osinfo DB.
+    Adding, removing, or replacing a DB file changes the mtime of its
+    parent directory, so this changes whenever the DB is updated.
+    """
+    ret = []
+    for topdir in _get_osinfo_db_dirs():
+        if not topdir or not os.path.isdir(topdir):
+            continue
+        for dirpath, dirnames, dummy in os.walk(topdir):
+            dirnames.sort()
+            try:
+                ret.append([dirpath, os.stat(dirpath).st_mtime])
+            except OSError:
+                continue
+    return ret
+
+
 class _OSDB(object):
     """
     Entry point for the public API
     """
-    def __init__(self):
+    def __init__(self, index_path=None):
         self.__os_loader = None
         self.__all_variants = None
+        self.__full_id_map = None
+        self.__index = None
+        self.__index_variants = {}
+        self._index_path = index_path
 
     # This is only for back compatibility with pre-libosinfo support.
     # This should never change.
@@ -198,15 +277,97 @@ class _OSDB(object):
             self.__all_variants = allvariants
         return self.__all_variants
 
+    def _lookup_libosinfo_os(self, full_id):
+        """
+        Return the Libosinfo.Os for the passed ID. Only used by
+        _OsVariant objects built from the index
+        """
+        return self._os_loader.get_db().get_os(full_id)
+
+    def _build_index(self):
+        variants = {}
+        full_ids = {}
+        for name, osobj in self._all_variants.items():
+            variants[name] = osobj.get_index_data()
+            if osobj.full_id:
+                full_ids[osobj.full_id] = name
+        return {"variants": variants, "full_ids": full_ids}
+
+    def _read_index(self, stamp):
+        try:
+            with open(self._index_path) as f:
+                data = json.load(f)
+        except Exception as e:
+            logging.debug("Error reading osinfo index %s: %s",
+                    self._index_path, e)
+            return None
+
+        if (data.get("version") != _INDEX_VERSION or
+            data.get("stamp") != stamp):
+            logging.debug("osinfo index %s is out of date", self._index_path)
+            return None
+        return data
+
+    def _write_index(self, stamp, data):
+        data = data.copy()
+        data["version"] = _INDEX_VERSION
+        data["stamp"] = stamp
+
+        try:
+            dirname = os.path.dirname(self._index_path)
+            if not os.path.exists(dirname):
+                os.makedirs(dirname, 0o751)
+            fd, tmppath = tempfile.mkstemp(dir=dirname, prefix=".osinfo")
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.rename(tmppath, self._index_path)
+            logging.debug("Wrote osinfo index %s", self._index_path)
+        except Exception as e:
+            logging.debug("Error writing osinfo index %s: %s",
+                    self._index_path, e)
+
+    @property
+    def _index(self):
+        """
+        Compact index of the whole osinfo DB, cached on disk. If the
+        cache is missing or stale we load the full DB to regenerate it.
+        Returns None if no index path is configured.
+        """
+        if self.__index is None and self._index_path:
+            stamp = _get_osinfo_db_stamp()
+            index = self._read_index(stamp)
+            if index is None:
+                index = self._build_index()
+                self._write_index(stamp, index)
+            self.__index = index
+        return self.__index
+
+    def _variant_from_index(self, key):
+        if key not in self.__index_variants:
+            data = self._index["variants"].get(key)
+            self.__index_variants[key] = data and _OsVariant(None, data)
+        return self.__index_variants[key]
+
+    def _lookup_variant(self, key):
+        if self.__all_variants is None and self._index is not None:
+            return self._variant_from_index(key)
+        return self._all_variants.get(key)
+
 
     ###############
     # Public APIs #
     ###############
 
     def lookup_os_by_full_id(self, full_id):
-        for osobj in self._all_variants.values():
-            if osobj.full_id == full_id:
-                return osobj
+        if self.__all_variants is None and self._index is not None:
+            key = self._index["full_ids"].get(full_id)
+            return key and self._variant_from_index(key)
+
+        if self.__full_id_map is None:
+            self.__full_id_map = dict(
+                (osobj.full_id, osobj)
+                for osobj in self._all_variants.values())
+        return self.__full_id_map.get(full_id)
 
     def lookup_os(self, key):
         if key in self._aliases:
@@ -216,7 +377,7 @@ class _OSDB(object):
                 _("OS name '%s' is deprecated, using '%s' instead. "
                   "This alias will be removed in the future."), key, alias)
             key = alias
-        return self._all_variants.get(key)
+        return self._lookup_variant(key)
 
     def guess_os_by_iso(self, location):
         try:
@@ -241,7 +402,7 @@ class _OSDB(object):
         return _sort(sortmap)
 
 
-OSDB = _OSDB()
+OSDB = _OSDB(_get_index_path())
 
 
 #####################
@@ -249,22 +410,44 @@ OSDB = _OSDB()
 #####################
 
 class _OsVariant(object):
-    def __init__(self, o):
-        self._os = o
-        self._family = self._os and self._os.get_family() or None
-
-        self.full_id = self._os and self._os.get_id() or None
-        self.name = self._os and self._os.get_short_id() or "generic"
-        self.label = self._os and self._os.get_name() or "Generic default"
-        self.codename = self._os and self._os.get_codename() or ""
-        self.distro = self._os and self._os.get_distro() or ""
-        self.version = self._os and self._os.get_version() or None
+    def __init__(self, o, indexdata=None):
+        """
+        :param o: Libosinfo.Os object, or None for the generic OS
+        :param indexdata: dict from get_index_data(). If specified, the
+            Libosinfo.Os is only looked up if something actually needs it
+        """
+        self.__os = o
+        self._indexdata = indexdata or {}
+
+        if indexdata:
+            self._family = indexdata["family"]
+            self.full_id = indexdata["full_id"]
+            self.name = indexdata["name"]
+            self.label = indexdata["label"]
+            self.codename = indexdata["codename"]
+            self.distro = indexdata["distro"]
+            self.version = indexdata["version"]
+        else:
+            self._family = o and o.get_family() or None
+
+            self.full_id = o and o.get_id() or None
+            self.name = o and o.get_short_id() or "generic"
+            self.label = o and o.get_name() or "Generic default"
+            self.codename = o and o.get_codename() or ""
+            self.distro = o and o.get_distro() or ""
+            self.version = o and o.get_version() or None
 
         self.eol = self._get_eol()
 
     def __repr__(self):
         return "<%s name=%s>" % (self.__class__.__name__, self.name)
 
+    @property
+    def _os(self):
+        if self.__os is None and self.full_id:
+            self.__os = OSDB._lookup_libosinfo_os(self.full_id)
+        return self.__os
+
 
     ########################
     # Internal helper APIs #
@@ -326,7 +509,14 @@ class _OsVariant(object):
     # Cached APIs #
     ###############
 
-    def _get_eol(self):
+    def _get_eol_data(self):
+        """
+        Return (eol date, release date, release status), with dates as
+        YEAR-DAYOFYEAR strings, so they can be stored in the index
+        """
+        if "eol_data" in self._indexdata:
+            return self._indexdata["eol_data"]
+
         eol = self._os and self._os.get_eol_date() or None
         rel = self._os and self._os.get_release_date() or None
 
@@ -335,13 +525,22 @@ class _OsVariant(object):
         release_status = self._os and self._os.get_param_value(
                 Libosinfo.OS_PROP_RELEASE_STATUS) or None
 
-        def _glib_to_datetime(glibdate):
-            date = "%s-%s" % (glibdate.get_year(), glibdate.get_day_of_year())
+        def _glib_to_str(glibdate):
+            if glibdate is None:
+                return None
+            return "%s-%s" % (glibdate.get_year(), glibdate.get_day_of_year())
+
+        return [_glib_to_str(eol), _glib_to_str(rel), release_status]
+
+    def _get_eol(self):
+        eol, rel, release_status = self._get_eol_data()
+
+        def _str_to_datetime(date):
             return datetime.datetime.strptime(date, "%Y-%j")
 
         now = datetime.datetime.today()
         if eol is not None:
-            return now > _glib_to_datetime(eol)
+            return now > _str_to_datetime(eol)
 
         # Rolling distributions are never EOL.
         if release_status == "rolling":
@@ -349,7 +548,7 @@ class _OsVariant(object):
 
         # If no EOL is present, assume EOL if release was > 5 years ago
         if rel is not None:
-            rel5 = _glib_to_datetime(rel) + datetime.timedelta(days=365 * 5)
+            rel5 = _str_to_datetime(rel) + datetime.timedelta(days=365 * 5)
             return now > rel5
         return False
 
@@ -361,8 +560,27 @@ class _OsVariant(object):
     def get_handle(self):
         return self._os
 
+    def get_index_data(self):
+        """
+        Return a JSON serializable dict of everything needed to recreate
+        this object from the index without the libosinfo DB
+        """
+        ret = {
+            "family": self._family,
+            "full_id": self.full_id,
+            "name": self.name,
+            "label": self.label,
+            "codename": self.codename,
+            "distro": self.distro,
+            "version": self.version,
+            "eol_data": self._get_eol_data(),
+        }
+        for methodname in _INDEXED_METHODS:
+            ret[methodname] = getattr(self, methodname)()
+        return ret
+
     def is_generic(self):
-        return self._os is None
+        return self.full_id is None
 
     def is_windows(self):
         return self._family in ['win9x', 'winnt', 'win16']
@@ -383,41 +601,48 @@ class _OsVariant(object):
             return "localtime"
         return "utc"
 
+    @_indexed
     def supported_netmodels(self):
         return self._device_filter(cls="net")
 
+    @_indexed
     def supports_usbtablet(self):
         # If no OS specified, still default to tablet
-        if not self._os:
+        if self.is_generic():
             return True
 
         devids = ["http://usb.org/usb/80ee/0021"]
         return bool(self._device_filter(devids=devids))
 
+    @_indexed
     def supports_virtiodisk(self):
         # virtio-block and virtio1.0-block
         devids = ["http://pcisig.com/pci/1af4/1001",
                   "http://pcisig.com/pci/1af4/1042"]
         return bool(self._device_filter(devids=devids))
 
+    @_indexed
     def supports_virtioscsi(self):
         # virtio-scsi and virtio1.0-scsi
         devids = ["http://pcisig.com/pci/1af4/1004",
                   "http://pcisig.com/pci/1af4/1048"]
         return bool(self._device_filter(devids=devids))
 
+    @_indexed
     def supports_virtionet(self):
         # virtio-net and virtio1.0-net
         devids = ["http://pcisig.com/pci/1af4/1000",
                   "http://pcisig.com/pci/1af4/1041"]
         return bool(self._device_filter(devids=devids))
 
+    @_indexed
     def supports_virtiorng(self):
         # virtio-rng and virtio1.0-rng
         devids = ["http://pcisig.com/pci/1af4/1005",
                   "http://pcisig.com/pci/1af4/1044"]
         return bool(self._device_filter(devids=devids))
 
+    @_indexed
     def supports_virtioserial(self):
         devids = ["http://pcisig.com/pci/1af4/1003",
                   "http://pcisig.com/pci/1af4/1043"]
@@ -427,16 +652,19 @@ class _OsVariant(object):
         # Remove this hack after 6 months or so
         return self._is_related_to("rhel6.0")
 
+    @_indexed
     def supports_usb3(self):
         # qemu-xhci
         devids = ["http://pcisig.com/pci/1b36/0004"]
         return bool(self._device_filter(devids=devids))
 
+    @_indexed
     def supports_virtio1(self):
         # Use virtio1.0-net device as a proxy for virtio1.0 as a whole
         devids = ["http://pcisig.com/pci/1af4/1041"]
         return bool(self._device_filter(devids=devids))
 
+    @_indexed
     def supports_chipset_q35(self):
         # For our purposes, check for the union of q35 + virtio1.0 support
         if self.supports_virtionet() and not self.supports_virtio1():
@@ -478,12 +706,13 @@ class _OsVariant(object):
 
         return ret
 
+    @_indexed
     def get_kernel_url_arg(self):
         """
         Kernel argument name the distro's installer uses to reference
         a network source, possibly bypassing some installer prompts
         """
-        if not self._os:
+        if self.is_generic():
             return None
 
         # SUSE distros
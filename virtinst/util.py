@@ -292,3 +292,45 @@ def make_meter(quiet):
     if quiet:
         return progress.BaseMeter()
     return progress.TextMeter(fo=sys.stdout)
+
+
+def make_lazy_getattr(modname, attrmap):
+    """
+    Build a module level __getattr__ (PEP 562) for package @modname,
+    which imports the submodule that provides a public name on first
+    access, so importing the package itself stays cheap.
+
+    :param attrmap: dict mapping attribute name to the module, relative
+        to @modname, that defines it
+    """
+    modglobals = sys.modules[modname].__dict__
+
+    def _import(relname):
+        # Use __import__ rather than importlib so lazy imports still
+        # show up in 'python -X importtime' output
+        fullname = modname + relname
+        __import__(fullname)
+        return sys.modules[fullname]
+
+    def __getattr__(name):
+        if name in attrmap:
+            ret = getattr(_import(attrmap[name]), name)
+        elif name.startswith("_"):
+            raise AttributeError("module '%s' has no attribute '%s'" %
+                                 (modname, name))
+        else:
+            try:
+                ret = _import("." + name)
+            except ImportError as e:
+                if e.name != modname + "." + name:
+                    raise
+                raise AttributeError("module '%s' has no attribute '%s'" %
+                                     (modname, name))
+        modglobals[name] = ret
+        return ret
+
+    if sys.version_info < (3, 7):
+        # No module __getattr__ support, import everything up front
+        for name in attrmap:
+            __getattr__(name)
+    return __getattr__
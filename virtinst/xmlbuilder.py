@@ -120,6 +120,9 @@ class XMLChildProperty(_XMLPropertyBase):
         want to track ./foo/bar/baz instances, set relative_xpath=./bar
     @is_single: If True, this represents an XML node that is only expected
         to appear once, like <domain><cpu>
+
+    Child objects are only instantiated from the parsed XML the first
+    time the property is accessed.
     """
     def __init__(self, child_class, relative_xpath=".", is_single=False):
         self.child_class = child_class
@@ -132,9 +135,32 @@ class XMLChildProperty(_XMLPropertyBase):
         return "<XMLChildProperty %s %s>" % (str(self.child_class), id(self))
 
 
+    def _parse_children(self, xmlbuilder):
+        """
+        Instantiate child objects for every matching node in the
+        xmlbuilder's XML document
+        """
+        xmlstate = xmlbuilder._xmlstate
+        prop_path = self.get_prop_xpath(xmlbuilder, self.child_class)
+
+        if self.is_single:
+            return self.child_class(xmlbuilder.conn,
+                parentxmlstate=xmlstate,
+                relative_object_xpath=prop_path)
+
+        ret = []
+        nodecount = xmlstate.xmlapi.count(xmlstate.make_abs_xpath(prop_path))
+        for idx in range(nodecount):
+            idxstr = "[%d]" % (idx + 1)
+            ret.append(self.child_class(xmlbuilder.conn,
+                parentxmlstate=xmlstate,
+                relative_object_xpath=(prop_path + idxstr)))
+        return ret
+
     def _get(self, xmlbuilder):
-        if self.propname not in xmlbuilder._propstore and not self.is_single:
-            xmlbuilder._propstore[self.propname] = []
+        if self.propname not in xmlbuilder._propstore:
+            xmlbuilder._propstore[self.propname] = (
+                self._parse_children(xmlbuilder))
         return xmlbuilder._propstore[self.propname]
 
     def _fget(self, xmlbuilder):
@@ -157,8 +183,6 @@ class XMLChildProperty(_XMLPropertyBase):
         self._get(xmlbuilder).append(newobj)
     def remove(self, xmlbuilder, obj):
         self._get(xmlbuilder).remove(obj)
-    def set(self, xmlbuilder, obj):
-        xmlbuilder._propstore[self.propname] = obj
 
     def get_prop_xpath(self, _xmlbuilder, obj):
         return self.relative_xpath + "/" + obj.XML_NAME
@@ -451,7 +475,6 @@ class XMLBuilder(object):
                                    relative_object_xpath)
 
         self._validate_xmlbuilder()
-        self._initial_child_parse()
 
     def _validate_xmlbuilder(self):
         # This is one time validation we run once per XMLBuilder class
@@ -475,29 +498,6 @@ class XMLBuilder(object):
 
         setattr(self.__class__, cachekey, True)
 
-    def _initial_child_parse(self):
-        # Walk the XML tree and hand of parsing to any registered
-        # child classes
-        for xmlprop in list(self._all_child_props().values()):
-            child_class = xmlprop.child_class
-            prop_path = xmlprop.get_prop_xpath(self, child_class)
-
-            if xmlprop.is_single:
-                obj = child_class(self.conn,
-                    parentxmlstate=self._xmlstate,
-                    relative_object_xpath=prop_path)
-                xmlprop.set(self, obj)
-                continue
-
-            nodecount = self._xmlstate.xmlapi.count(
-                self._xmlstate.make_abs_xpath(prop_path))
-            for idx in range(nodecount):
-                idxstr = "[%d]" % (idx + 1)
-                obj = child_class(self.conn,
-                    parentxmlstate=self._xmlstate,
-                    relative_object_xpath=(prop_path + idxstr))
-                xmlprop.append(self, obj)
-
     def __repr__(self):
         return "<%s %s %s>" % (self.__class__.__name__.split(".")[-1],
                                self.XML_NAME, id(self))
@@ -511,6 +511,7 @@ class XMLBuilder(object):
         """
         Return XML string of the object
         """
+        self._parse_all_children()
         xmlapi = self._xmlstate.xmlapi
         if self._xmlstate.is_build:
             xmlapi = xmlapi.copy_api()
@@ -529,6 +530,7 @@ class XMLBuilder(object):
         :param leave_stub: if True, don't unlink the top stub node,
             see virtinst/cli usage for an explanation
         """
+        self._parse_all_children()
         props = list(self._all_xml_props().values())
         props += list(self._all_child_props().values())
         for prop in props:
@@ -606,16 +608,34 @@ class XMLBuilder(object):
                            "Didn't find child property for child_class=%s" %
                            child_class)
 
+    def _get_all_children(self):
+        """
+        Return a list of every child object, parsing them if needed
+        """
+        ret = []
+        for propname in self._all_child_props():
+            ret += util.listify(getattr(self, propname))
+        return ret
+
+    def _parse_all_children(self):
+        """
+        Make sure the whole child object hierarchy is instantiated. This
+        must be called before the backing XML is altered, since the
+        lazy child parsing maps objects to XML nodes by position.
+        """
+        for obj in self._get_all_children():
+            obj._parse_all_children()
+
     def _set_xpaths(self, parent_xpath, relative_object_xpath=-1):
         """
         Change the object hierarchy's cached xpaths
         """
+        children = self._get_all_children()
         self._xmlstate.set_parent_xpath(parent_xpath)
         if relative_object_xpath != -1:
             self._xmlstate.set_relative_object_xpath(relative_object_xpath)
-        for propname in self._all_child_props():
-            for p in util.listify(getattr(self, propname, [])):
-                p._set_xpaths(self._xmlstate.abs_xpath())
+        for p in children:
+            p._set_xpaths(self._xmlstate.abs_xpath())
 
     def _set_child_xpaths(self):
         """
@@ -642,16 +662,17 @@ class XMLBuilder(object):
         """
         Set new backing XML objects in ourselves and all our child props
         """
+        children = self._get_all_children()
         self._xmlstate.parse(*args, **kwargs)
-        for propname in self._all_child_props():
-            for p in util.listify(getattr(self, propname, [])):
-                p._parse_with_children(None, self._xmlstate)
+        for p in children:
+            p._parse_with_children(None, self._xmlstate)
 
     def add_child(self, obj, idx=None):
         """
         Insert the passed XMLBuilder object into our XML document. The
         object needs to have an associated mapping via XMLChildProperty
         """
+        self._parse_all_children()
         xmlprop = self._find_child_prop(obj.__class__)
         xml = obj.get_xml()
         if idx is None:
@@ -676,6 +697,7 @@ class XMLBuilder(object):
         Remove the passed XMLBuilder object from our XML document, but
         ensure its data isn't altered.
         """
+        self._parse_all_children()
         xmlprop = self._find_child_prop(obj.__class__)
         xmlprop.remove(self, obj)
 